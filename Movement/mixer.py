@@ -0,0 +1,280 @@
+import queue
+import re
+import shutil
+import subprocess
+import threading
+import time
+
+DEFAULT_CONTROL = "Master"
+MIN_WRITE_INTERVAL = 0.1   # Como máximo una escritura al mezclador cada 100 ms mientras se arrastra el slider.
+REFRESH_INTERVAL = 30.0    # Cada cuánto se vuelve a leer el volumen real (por si otro programa lo cambió).
+WRITE_CONFIRM_TIMEOUT = 1.0  # Espera máxima de la respuesta de amixer a cada escritura.
+
+
+class AmixerBackend:
+    """
+    Habla con ALSA a través de una sola sesión 'amixer -s' que queda abierta: cada escritura es una línea
+    en su stdin, sin crear un proceso nuevo. Las lecturas (poco frecuentes, ver MixerService) usan 'amixer sget'.
+    amixer responde cada sset con el estado del control en stdout, o con un error en stderr: write() espera
+    esa respuesta y lanza OSError si amixer rechazó el cambio, así MixerService no da por aplicado un error.
+    """
+
+    def __init__(self, control=DEFAULT_CONTROL, executable="amixer"):
+        self.control = control
+        self.executable = executable
+        self._process = None
+        self._output = None   # (flujo, línea) de la sesión actual; None marca el fin de un flujo.
+
+    def read(self):
+        result = subprocess.run([self.executable, "-M", "sget", self.control], capture_output=True, text=True, check=True)
+        match = re.search(r"\[(\d{1,3})%\]", result.stdout)
+        if not match:
+            raise ValueError("No se pudo encontrar el porcentaje de volumen en la salida de amixer.")
+        return int(match.group(1))
+
+    def write(self, volume):
+        line = f"sset {self.control} {volume}%\n"
+        for attempt in range(2):
+            if self._process is None or self._process.poll() is not None:
+                self._open()
+            self._discard_output()
+            try:
+                self._process.stdin.write(line)
+                self._process.stdin.flush()
+            except (BrokenPipeError, OSError):
+                # La sesión murió (p. ej. se reinició ALSA): se abre otra y se reintenta una vez.
+                self._process = None
+                if attempt:
+                    raise
+                continue
+            self._confirm()
+            return
+
+    def close(self):
+        if self._process is not None and self._process.poll() is None:
+            self._process.stdin.close()
+            try:
+                self._process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+        self._process = None
+
+    def _open(self):
+        command = [self.executable, "-M", "-s"]
+        # Con stdout en un pipe amixer no vacía su salida tras cada orden; stdbuf la deja por líneas.
+        stdbuf = shutil.which("stdbuf")
+        if stdbuf:
+            command = [stdbuf, "-oL"] + command
+        self._process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                         stderr=subprocess.PIPE, text=True)
+        self._output = queue.Queue()
+        for name, stream in (("out", self._process.stdout), ("err", self._process.stderr)):
+            threading.Thread(target=self._pump, args=(name, stream, self._output), daemon=True).start()
+
+    @staticmethod
+    def _pump(name, stream, output):
+        for text in stream:
+            output.put((name, text.rstrip("\n")))
+        output.put((name, None))
+
+    def _discard_output(self):
+        """Descarta lo que quedó de órdenes anteriores (p. ej. el resto de las líneas de estado)."""
+        while True:
+            try:
+                self._output.get_nowait()
+            except queue.Empty:
+                return
+
+    def _confirm(self):
+        deadline = time.monotonic() + WRITE_CONFIRM_TIMEOUT
+        header = False
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                # Sin respuesta no se sabe en qué estado quedó la sesión: se abre otra en la próxima escritura.
+                self._process.kill()
+                self._process = None
+                raise OSError("amixer no confirmó el cambio de volumen.")
+            try:
+                stream, text = self._output.get(timeout=remaining)
+            except queue.Empty:
+                continue
+            if text is None:
+                self._process = None
+                raise OSError("La sesión de amixer terminó.")
+            if stream == "err":
+                raise OSError(text.strip())
+            # Solo cuenta una respuesta completa a esta orden: encabezado y luego una línea con el porcentaje.
+            if text.startswith("Simple mixer control"):
+                header = True
+            elif header and "%]" in text:
+                return
+
+
+class FakeMixerBackend:
+    """Mezclador en memoria para pruebas sin ALSA; guarda cada escritura en 'writes'."""
+
+    def __init__(self, volume=50):
+        self.volume = volume
+        self.reads = 0
+        self.writes = []
+
+    def read(self):
+        self.reads += 1
+        return self.volume
+
+    def write(self, volume):
+        self.writes.append(volume)
+        self.volume = volume
+
+    def close(self):
+        pass
+
+
+class MixerService:
+    """
+    Volumen del sistema con valor en caché y escrituras agrupadas.
+    get() responde desde la caché (relee el mezclador solo si pasaron 'refresh_interval' segundos sin escribir).
+    set() actualiza la caché y vuelve de inmediato; un hilo escribe solo el último valor pedido, como mucho
+    una vez cada 'min_write_interval' segundos, así una ráfaga de movimientos del slider son pocas escrituras.
+    Si una escritura falla, la caché vuelve al último valor aplicado y write_status() informa el error.
+    """
+
+    def __init__(self, backend, min_write_interval=MIN_WRITE_INTERVAL, refresh_interval=REFRESH_INTERVAL):
+        self.backend = backend
+        self.min_write_interval = min_write_interval
+        self.refresh_interval = refresh_interval
+        self._cond = threading.Condition()
+        self._volume = None
+        self._applied = None      # Último valor confirmado en el mezclador (leído o escrito con éxito).
+        self._write_error = None  # Error de la última escritura; None si se aplicó.
+        self._read_at = None
+        self._pending = None
+        self._writing = False
+        self._thread = None
+        self._running = False
+        self._stats = {"set_requests": 0, "writes": 0, "reads": 0, "errors": 0, "last_error": None}
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._write_loop, name="mixer-writer", daemon=True)
+            self._thread.start()
+
+    def shutdown(self, timeout=1.0):
+        self.flush(timeout)
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.backend.close()
+
+    def get(self):
+        """Volumen (0-100) o None si el mezclador no se pudo leer y no hay valor en caché."""
+        with self._cond:
+            fresh = self._read_at is not None and time.monotonic() - self._read_at < self.refresh_interval
+            if fresh or self._pending is not None or self._writing:
+                return self._volume
+        try:
+            volume = self.backend.read()
+        except (subprocess.CalledProcessError, OSError, ValueError) as e:
+            self._record_error(f"ERROR al obtener el volumen del sistema: {e}")
+            return self._volume
+        with self._cond:
+            self._stats["reads"] += 1
+            self._applied = volume
+            # Si entre tanto llegó un set(), ese valor es más nuevo que lo leído.
+            if self._pending is None and not self._writing:
+                self._volume = volume
+            self._read_at = time.monotonic()
+            return self._volume
+
+    def set(self, volume):
+        if not 0 <= volume <= 100:
+            raise ValueError(f"El volumen debe estar entre 0 y 100. Se recibió: {volume}")
+        with self._cond:
+            self._stats["set_requests"] += 1
+            self._volume = volume
+            self._pending = volume
+            self._cond.notify_all()
+
+    def flush(self, timeout=1.0):
+        """Espera a que se escriba el último valor pedido. Devuelve False si no terminó a tiempo."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._pending is not None or self._writing:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._running:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def write_status(self):
+        """{'volume': último valor aplicado, 'error': error de la última escritura o None}."""
+        with self._cond:
+            return {"volume": self._applied, "error": self._write_error}
+
+    def stats(self):
+        with self._cond:
+            return dict(self._stats, volume=self._volume, applied=self._applied, pending=self._pending)
+
+    def _record_error(self, message):
+        print(message)
+        with self._cond:
+            self._stats["errors"] += 1
+            self._stats["last_error"] = message
+
+    def _write_loop(self):
+        last_write = 0.0
+        while True:
+            with self._cond:
+                while self._running and self._pending is None:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                wait = last_write + self.min_write_interval - time.monotonic()
+                if wait > 0:
+                    # Los set() que lleguen durante la espera reemplazan a 'pending'.
+                    self._cond.wait(wait)
+                    continue
+                volume, self._pending = self._pending, None
+                self._writing = True
+            try:
+                self.backend.write(volume)
+                with self._cond:
+                    self._stats["writes"] += 1
+                    self._applied = volume
+                    self._write_error = None
+                    self._read_at = time.monotonic()
+            except (subprocess.CalledProcessError, OSError) as e:
+                message = f"ERROR al establecer el volumen del sistema: {e}"
+                self._record_error(message)
+                with self._cond:
+                    self._write_error = message
+                    # La caché no puede quedar con un valor que no se aplicó: se vuelve al último conocido
+                    # y el próximo get() relee el mezclador.
+                    if self._pending is None:
+                        self._volume = self._applied
+                    self._read_at = None
+            last_write = time.monotonic()
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+
+if __name__ == "__main__":
+    # Simula arrastrar el slider contra el mezclador falso: python3 mixer.py
+    backend = FakeMixerBackend(volume=30)
+    mixer = MixerService(backend)
+    mixer.start()
+    print("Volumen inicial:", mixer.get())
+    for volume in range(30, 91):
+        mixer.set(volume)
+        time.sleep(0.01)
+    mixer.flush()
+    print("Volumen final:", mixer.get(), "| escrituras:", backend.writes)
+    print(mixer.stats())
+    mixer.shutdown()
@@ -0,0 +1,180 @@
+import collections
+import threading
+import time
+
+LATENCY_WINDOW = 500  # Pasos recientes guardados para las estadísticas de puntualidad.
+
+
+class MotionExecutor:
+    """
+    Único hilo que toca los pines de los motores.
+    Las rutas no mueven los motores directamente: encolan órdenes y este hilo las aplica en orden.
+    Reglas de prioridad:
+      - stop gana a todo: vacía la cola y cancela lo que se esté ejecutando.
+      - el joystick gana a las secuencias: cancela la secuencia en curso, y una secuencia que llega
+        mientras el joystick está activo se descarta.
+      - una secuencia nueva reemplaza a la anterior en lugar de ejecutarse encima de ella.
+    Cada paso de una secuencia tiene un plazo absoluto (time.monotonic() al iniciar + desplazamiento),
+    así los retrasos de un paso no se acumulan en los siguientes.
+    Si una acción falla (p. ej. se perdió la conexión con pigpiod) se cancela la secuencia y se intenta
+    detener los motores; el hilo sigue vivo para atender el próximo stop.
+    """
+
+    def __init__(self, actions, stop_action):
+        self.actions = dict(actions)   # nombre -> función que deja los pines en ese estado
+        self.stop_action = stop_action
+        self._cond = threading.Condition()
+        self._commands = collections.deque()
+        self._plan = collections.deque()  # (plazo, nombre de la acción) pendientes de la secuencia en curso
+        self._mode = "idle"               # "idle", "joystick" o "sequence"
+        self._current = "stop"
+        self._lateness = collections.deque(maxlen=LATENCY_WINDOW)
+        self._errors = 0
+        self._last_error = None
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="motion-executor", daemon=True)
+            self._thread.start()
+
+    def shutdown(self, timeout=2.0):
+        with self._cond:
+            self._running = False
+            self._commands.clear()
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.stop_action()
+
+    def stop(self):
+        with self._cond:
+            # Lo que estuviera encolado ya no importa.
+            self._commands.clear()
+            self._commands.append(("stop", None))
+            self._cond.notify_all()
+
+    def drive(self, action):
+        """
+        Orden del joystick: aplica 'action' de inmediato y la mantiene hasta la próxima orden.
+        Las órdenes de joystick que aún no se aplicaron se reemplazan por la más nueva.
+        """
+        if action != "stop" and action not in self.actions:
+            raise ValueError(f"Acción desconocida: {action}")
+        with self._cond:
+            if self._commands and self._commands[-1][0] == "joystick":
+                self._commands.pop()
+            self._commands.append(("joystick", action))
+            self._cond.notify_all()
+
+    def run_sequence(self, steps):
+        """
+        Encola una secuencia: lista de (desplazamiento en segundos desde el inicio, nombre de la acción).
+        Devuelve False si se descartó porque el joystick está activo.
+        """
+        for _, action in steps:
+            if action != "stop" and action not in self.actions:
+                raise ValueError(f"Acción desconocida: {action}")
+        with self._cond:
+            if self._pending_mode() == "joystick":
+                print("MOTION: Secuencia descartada, el joystick tiene prioridad.")
+                return False
+            # Orden estable por desplazamiento: si un stop y el movimiento siguiente caen en el mismo instante
+            # (delay_between=0), se aplican en el orden en que los generó el llamador.
+            self._commands.append(("sequence", sorted(steps, key=lambda step: step[0])))
+            self._cond.notify_all()
+        return True
+
+    def status(self):
+        with self._cond:
+            lateness = sorted(self._lateness)
+            status = {"mode": self._mode, "current": self._current, "pending_steps": len(self._plan),
+                      "errors": self._errors, "last_error": self._last_error}
+        if lateness:
+            status["lateness_ms"] = {
+                "steps": len(lateness),
+                "avg": round(1000 * sum(lateness) / len(lateness), 2),
+                "p95": round(1000 * lateness[min(len(lateness) - 1, int(len(lateness) * 0.95))], 2),
+                "max": round(1000 * lateness[-1], 2),
+            }
+        return status
+
+    def _pending_mode(self):
+        """Modo en que quedará el ejecutor tras procesar las órdenes ya encoladas (con el lock tomado)."""
+        mode = self._mode
+        for kind, value in self._commands:
+            if kind == "stop" or (kind == "joystick" and value == "stop"):
+                mode = "idle"
+            elif kind == "joystick":
+                mode = "joystick"
+            elif mode != "joystick":
+                mode = "sequence"
+        return mode
+
+    def _apply(self, action):
+        try:
+            if action == "stop":
+                self.stop_action()
+            else:
+                self.actions[action]()
+            self._current = action
+        except Exception as e:
+            self._errors += 1
+            self._last_error = f"{action}: {e}"
+            print(f"MOTION ERROR: No se pudo aplicar '{action}': {e}. Deteniendo motores.")
+            self._plan.clear()
+            self._mode = "idle"
+            try:
+                self.stop_action()
+                self._current = "stop"
+            except Exception as e:
+                self._current = "unknown"
+                print(f"MOTION ERROR: Tampoco se pudieron detener los motores: {e}")
+
+    def _handle(self, kind, value):
+        if kind == "stop":
+            self._plan.clear()
+            self._mode = "idle"
+            self._apply("stop")
+        elif kind == "joystick":
+            self._plan.clear()
+            was_joystick = self._mode == "joystick"
+            self._mode = "idle" if value == "stop" else "joystick"
+            # Repetir la misma dirección no vuelve a escribir los pines.
+            if not (was_joystick and value == self._current):
+                self._apply(value)
+        elif kind == "sequence":
+            if self._mode == "joystick":
+                print("MOTION: Secuencia descartada, el joystick tiene prioridad.")
+                return
+            if self._mode == "sequence":
+                print("MOTION: Nueva secuencia, se cancela la anterior.")
+                self._apply("stop")
+            start = time.monotonic()
+            self._plan = collections.deque((start + offset, action) for offset, action in value)
+            self._mode = "sequence" if self._plan else "idle"
+
+    def _run(self):
+        with self._cond:
+            while self._running:
+                while self._commands:
+                    self._handle(*self._commands.popleft())
+                if not self._plan:
+                    self._cond.wait()
+                    continue
+                deadline, action = self._plan[0]
+                now = time.monotonic()
+                if now < deadline:
+                    # Se despierta antes si llega una orden (p. ej. stop o joystick).
+                    self._cond.wait(deadline - now)
+                    continue
+                self._plan.popleft()
+                self._lateness.append(now - deadline)
+                self._apply(action)
+                if not self._plan:
+                    self._mode = "idle"
+
@@ -1,12 +1,19 @@
 from flask import Flask, request, jsonify, render_template
 from gpiozero import LED
-from gpiozero.pins.pigpio import PiGPIOFactory
+import json
+import os
 import time
 import threading
-import subprocess
-import re
+from motion_executor import MotionExecutor
+from mixer import AmixerBackend, FakeMixerBackend, MixerService
 
-factory = PiGPIOFactory()
+# MOVEMENT_PIN_FACTORY=mock usa los pines simulados de gpiozero (pruebas sin Raspberry Pi ni pigpiod).
+if os.environ.get("MOVEMENT_PIN_FACTORY") == "mock":
+    from gpiozero.pins.mock import MockFactory
+    factory = MockFactory()
+else:
+    from gpiozero.pins.pigpio import PiGPIOFactory
+    factory = PiGPIOFactory()
 app = Flask(__name__)
 
 # --- Configuración de Pines GPIO ---
@@ -20,6 +27,11 @@ motorA_rev = LED(REV_A, pin_factory=factory)
 motorB_fwd = LED(FWD_B, pin_factory=factory)
 motorB_rev = LED(REV_B, pin_factory=factory)
 
+# --- Canal WebSocket del joystick ---
+JOYSTICK_WS_PORT = 5003
+JOYSTICK_DEADMAN_SECONDS = 0.5   # Sin mensajes del operador durante este tiempo mientras se mueve -> stop.
+joystick_server = None
+
 # --- Configuración del evento especial (Ahora solo son valores por defecto/fallback) ---
 special_event_config = {
     "enabled": False,
@@ -30,46 +42,10 @@ special_event_config = {
 
 # --- Funciones para el Control de Volumen ---
 
-def get_system_volume():
-    """
-    Obtiene el volumen actual del sistema usando 'amixer'.
-    Devuelve: El nivel de volumen (0-100) o None si hay un error.
-    """
-    try:
-        result = subprocess.run(
-            ["amixer", "sget", "Master"],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        match = re.search(r"\[(\d{1,3})%\]", result.stdout)
-        if match:
-            return int(match.group(1))
-        print("ERROR: No se pudo encontrar el porcentaje de volumen en la salida de amixer.")
-        return None
-    except (subprocess.CalledProcessError, FileNotFoundError) as e:
-        print(f"ERROR al obtener el volumen del sistema: {e}")
-        return None
-
-def set_system_volume(volume):
-    """
-    Establece el volumen del sistema usando 'amixer'.
-    Args: volume (int): El nivel de volumen deseado (0-100).
-    """
-    if not 0 <= volume <= 100:
-        print(f"ERROR: El volumen debe estar entre 0 y 100. Se recibió: {volume}")
-        return False
-    try:
-        subprocess.run(
-            ["amixer", "-M", "sset", "Master", f"{volume}%"],
-            check=True,
-            capture_output=True
-        )
-        print(f"Volumen del sistema establecido en: {volume}%")
-        return True
-    except (subprocess.CalledProcessError, FileNotFoundError) as e:
-        print(f"ERROR al establecer el volumen del sistema: {e}")
-        return False
+# MOVEMENT_MIXER=fake usa un mezclador en memoria (pruebas sin ALSA).
+# Una sola sesión 'amixer -s' para todas las escrituras; el volumen se sirve desde caché.
+mixer = MixerService(FakeMixerBackend() if os.environ.get("MOVEMENT_MIXER") == "fake" else AmixerBackend())
+SET_VOLUME_WAIT = 0.5   # Segundos que /set_volume espera la escritura antes de responder "pending".
 
 # --- Funciones de Control de Movimiento ---
 
@@ -108,43 +84,49 @@ def move_forward():
     motorB_fwd.on()
     print("Girando a la DERECHA")
 
-# --- ### CAMBIO 1: La función ahora recibe la configuración como parámetro ### ---
-def run_special_event_movement(config):
-    print(f"--- INICIANDO SECUENCIA DE MOVIMIENTO ESPECIAL CON CONFIG: {config} ---")
-    
-    # Usa la configuración recibida, no la global
+# Único hilo que mueve los motores; las rutas solo le envían órdenes (ver motion_executor.py).
+motion_executor = MotionExecutor(
+    {"move_backward": move_backward, "move_forward": move_forward, "turn_left": turn_left, "turn_right": turn_right},
+    stop_all
+)
+
+# Comando del joystick -> acción. Los nombres no coinciden por cómo están cableados los motores.
+CONTROL_COMMANDS = {
+    "forward": "turn_left",
+    "backward": "turn_right",
+    "left": "move_backward",
+    "right": "move_forward"
+}
+
+# --- ### CAMBIO 1: La secuencia ahora recibe la configuración como parámetro ### ---
+def special_event_steps(config):
+    """
+    Traduce la configuración del evento especial a pasos (segundos desde el inicio, acción) para el ejecutor.
+    Orden: atrás, adelante, izquierda, derecha; cada movimiento dura 'move_duration' y entre uno y otro
+    hay 'delay_between' de pausa.
+    """
     initial_delay_s = config["initial_delay"] / 1000.0
     move_duration_s = config["move_duration"] / 1000.0
     delay_between_s = config["delay_between"] / 1000.0
-    
-    time.sleep(initial_delay_s)
-    
-    moves = [
-        ("atrás", move_backward),
-        ("adelante", move_forward),
-        ("izquierda", turn_left),
-        ("derecha", turn_right)
-    ]
-    
-    for i, (name, move_func) in enumerate(moves):
-        move_func()
-        time.sleep(move_duration_s)
-        stop_all()
-        if i < len(moves) - 1:
-            time.sleep(delay_between_s)
-            
-    print("--- FIN DE SECUENCIA DE MOVIMIENTO ESPECIAL ---")
+
+    steps = []
+    t = initial_delay_s
+    for action in ("move_backward", "move_forward", "turn_left", "turn_right"):
+        steps.append((t, action))
+        steps.append((t + move_duration_s, "stop"))
+        t += move_duration_s + delay_between_s
+    return steps
 
 # --- Rutas Flask ---
 
 @app.route("/")
 def index():
-    return render_template("index.html")
+    return render_template("index.html", joystick_ws_port=JOYSTICK_WS_PORT if joystick_server else None)
 
 # --- Rutas para el Control de Volumen ---
 @app.route("/get_volume", methods=["GET"])
 def get_volume_route():
-    volume = get_system_volume()
+    volume = mixer.get()
     if volume is not None:
         return jsonify({"status": "ok", "volume": volume})
     else:
@@ -157,34 +139,43 @@ def set_volume_route():
     if volume is None:
         return jsonify({"status": "error", "message": "Falta el parámetro de volumen."}), 400
     
-    if set_system_volume(int(volume)):
-        return jsonify({"status": "ok", "message": f"Volumen establecido en {volume}%."})
-    else:
-        return jsonify({"status": "error", "message": "No se pudo establecer el volumen."}), 500
+    try:
+        mixer.set(int(volume))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    # La escritura es asíncrona: se espera un momento para informar lo que realmente quedó en el mezclador.
+    if not mixer.flush(SET_VOLUME_WAIT):
+        return jsonify({"status": "pending", "message": f"Volumen {volume}% en cola."}), 202
+    result = mixer.write_status()
+    if result["error"]:
+        return jsonify({"status": "error", "message": result["error"], "volume": result["volume"]}), 500
+    return jsonify({"status": "ok", "message": f"Volumen establecido en {result['volume']}%.", "volume": result["volume"]})
+
+@app.route("/mixer_status", methods=["GET"])
+def mixer_status_route():
+    return jsonify(mixer.stats())
 
 # --- Rutas de Control de Movimiento y Eventos ---
 @app.route("/control", methods=["POST"])
 def control():
     data = request.json
     command = data.get("command")
-    if command == "forward":
-        turn_left()
-    elif command == "backward":
-        turn_right()
-    elif command == "left":
-        move_backward()
-    elif command == "right":
-        move_forward()
-    else:
-        stop_all()
+    if command not in CONTROL_COMMANDS:
+        motion_executor.stop()
         return jsonify({"status": "error", "message": "Comando no reconocido"}), 400
+    motion_executor.drive(CONTROL_COMMANDS[command])
     return jsonify({"status": "ok", "command": command})
 
 @app.route("/stop", methods=["POST"])
 def stop_command():
-    stop_all()
+    motion_executor.stop()
     return jsonify({"status": "stopped"})
 
+@app.route("/motion_status", methods=["GET"])
+def motion_status():
+    """Modo actual del ejecutor y puntualidad de los últimos pasos de secuencia."""
+    return jsonify(motion_executor.status())
+
 @app.route("/config_special_event", methods=["POST"])
 def config_special_event():
     global special_event_config
@@ -204,20 +195,98 @@ def trigger_special_event_movement():
         "delay_between": data.get("delay_between", special_event_config["delay_between"])
     }
     
-    # Pasa la configuración recibida a la función de movimiento
-    thread = threading.Thread(target=run_special_event_movement, args=(current_config,))
-    thread.start()
+    # Pasa la configuración recibida al ejecutor; reemplaza cualquier secuencia anterior en curso.
+    print(f"--- SECUENCIA DE MOVIMIENTO ESPECIAL ENCOLADA CON CONFIG: {current_config} ---")
+    if not motion_executor.run_sequence(special_event_steps(current_config)):
+        return jsonify({"status": "ignored", "message": "El joystick está en uso; secuencia descartada."}), 409
     return jsonify({"status": "ok", "message": "Secuencia de movimiento especial iniciada con config específica."})
 
+# --- Canal persistente del joystick ---
+def joystick_session(websocket):
+    """
+    Una conexión WebSocket por panel de operador. Cada mensaje es {"command": ..., "seq": n}; si llegan varios
+    juntos solo se aplica el último. El panel repite la orden actual mientras el botón está presionado;
+    si deja de llegar cualquier mensaje durante JOYSTICK_DEADMAN_SECONDS se detienen los motores.
+    """
+    from websockets.exceptions import ConnectionClosed
+    applied = "stop"
+    print("JOYSTICK: Operador conectado.")
+    try:
+        while True:
+            try:
+                message = websocket.recv(timeout=JOYSTICK_DEADMAN_SECONDS)
+            except TimeoutError:
+                if applied != "stop":
+                    print("JOYSTICK: Sin señal del operador, deteniendo motores (deadman).")
+                    motion_executor.stop()
+                    applied = "stop"
+                continue
+            # Se descartan las órdenes intermedias que ya llegaron: solo importa la más reciente.
+            while True:
+                try:
+                    message = websocket.recv(timeout=0)
+                except TimeoutError:
+                    break
+            try:
+                data = json.loads(message)
+            except ValueError:
+                continue
+            command = data.get("command")
+            # Cada repetición va al ejecutor, que la ignora si esa dirección sigue aplicada: así una dirección
+            # mantenida vuelve a moverse tras un /stop externo o un stop de la secuencia.
+            if command == "stop":
+                motion_executor.drive("stop")
+            elif command in CONTROL_COMMANDS:
+                motion_executor.drive(CONTROL_COMMANDS[command])
+            else:
+                continue
+            applied = command
+            websocket.send(json.dumps({"ack": data.get("seq")}))
+    except ConnectionClosed:
+        pass
+    finally:
+        if applied != "stop":
+            motion_executor.stop()
+        print("JOYSTICK: Operador desconectado.")
+
+def start_joystick_server():
+    global joystick_server
+    try:
+        from websockets.sync.server import serve
+    except ImportError:
+        print("JOYSTICK: 'websockets' no está instalado; el panel usará POST /control.")
+        return
+    joystick_server = serve(joystick_session, "0.0.0.0", JOYSTICK_WS_PORT)
+    threading.Thread(target=joystick_server.serve_forever, daemon=True).start()
+    print(f"JOYSTICK: Canal WebSocket escuchando en el puerto {JOYSTICK_WS_PORT}.")
+
+@app.route("/healthz")
+def healthz():
+    """Chequeo de disponibilidad para el supervisor (serve.py)."""
+    return jsonify({"status": "ok"})
+
 # --- Inicio de la Aplicación ---
+def start_background_tasks():
+    stop_all()
+    motion_executor.start()
+    mixer.start()
+    start_joystick_server()
+
+def shutdown():
+    """Detiene los motores y libera los pines; se llama siempre al salir, también desde serve.py."""
+    if joystick_server:
+        joystick_server.shutdown()
+    motion_executor.shutdown()
+    mixer.shutdown()
+    motorA_fwd.close()
+    motorA_rev.close()
+    motorB_fwd.close()
+    motorB_rev.close()
+    print("GPIO limpiado.")
+
 if __name__ == "__main__":
     try:
-        stop_all()
+        start_background_tasks()
         app.run(host="0.0.0.0", port=5001)
     finally:
-        stop_all()
-        motorA_fwd.close()
-        motorA_rev.close()
-        motorB_fwd.close()
-        motorB_rev.close()
-        print("GPIO limpiado.")
\ No newline at end of file
+        shutdown()
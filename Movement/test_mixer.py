@@ -0,0 +1,124 @@
+import os
+import stat
+import sys
+import tempfile
+import textwrap
+import unittest
+
+from mixer import AmixerBackend, FakeMixerBackend, MixerService
+
+# Imita 'amixer -s': responde cada sset con el estado del control, o con un error si el control no existe.
+FAKE_AMIXER = textwrap.dedent('''\
+    import re, sys
+    for line in sys.stdin:
+        match = re.match(r"sset (\\S+) (\\d+)%", line)
+        if not match or match.group(1) != "Master":
+            print(f"amixer: Unable to find simple control '{match.group(1) if match else line.strip()}',0", file=sys.stderr, flush=True)
+            continue
+        print("Simple mixer control 'Master',0")
+        print("  Capabilities: pvolume pswitch")
+        print(f"  Front Left: Playback 100 [{match.group(2)}%] [on]")
+        print(f"  Front Right: Playback 100 [{match.group(2)}%] [on]", flush=True)
+''')
+
+
+class FailingMixerBackend(FakeMixerBackend):
+    """Mezclador falso cuyas escrituras fallan mientras 'fail' sea True."""
+
+    def __init__(self, volume=50):
+        super().__init__(volume)
+        self.fail = True
+
+    def write(self, volume):
+        if self.fail:
+            raise OSError("amixer no responde")
+        super().write(volume)
+
+
+class MixerServiceTest(unittest.TestCase):
+    def start(self, backend, **kwargs):
+        mixer = MixerService(backend, **kwargs)
+        mixer.start()
+        self.addCleanup(mixer.shutdown)
+        return mixer
+
+    def test_get_reads_once_and_then_uses_cache(self):
+        backend = FakeMixerBackend(volume=30)
+        mixer = self.start(backend)
+        self.assertEqual(mixer.get(), 30)
+        self.assertEqual(mixer.get(), 30)
+        self.assertEqual(backend.reads, 1)
+
+    def test_burst_of_sets_writes_only_latest_value(self):
+        backend = FakeMixerBackend(volume=30)
+        mixer = self.start(backend, min_write_interval=0.2)
+        for volume in range(30, 91):
+            mixer.set(volume)
+        self.assertEqual(mixer.get(), 90)
+        self.assertTrue(mixer.flush(2.0))
+        self.assertEqual(backend.volume, 90)
+        self.assertLessEqual(len(backend.writes), 2)
+        self.assertEqual(mixer.write_status(), {"volume": 90, "error": None})
+
+    def test_set_rejects_out_of_range(self):
+        mixer = self.start(FakeMixerBackend())
+        with self.assertRaises(ValueError):
+            mixer.set(101)
+
+    def test_failed_write_is_reported_and_cache_reverts(self):
+        backend = FailingMixerBackend(volume=40)
+        mixer = self.start(backend)
+        self.assertEqual(mixer.get(), 40)
+        mixer.set(80)
+        self.assertTrue(mixer.flush(2.0))
+        status = mixer.write_status()
+        self.assertEqual(status["volume"], 40)
+        self.assertIn("amixer no responde", status["error"])
+        self.assertEqual(mixer.get(), 40)
+        self.assertEqual(mixer.stats()["errors"], 1)
+
+        backend.fail = False
+        mixer.set(60)
+        self.assertTrue(mixer.flush(2.0))
+        self.assertEqual(mixer.write_status(), {"volume": 60, "error": None})
+        self.assertEqual(backend.volume, 60)
+
+
+class AmixerBackendTest(unittest.TestCase):
+    def setUp(self):
+        fd, self.script = tempfile.mkstemp(suffix=".py")
+        with os.fdopen(fd, "w") as f:
+            f.write(f"#!{sys.executable}\n" + FAKE_AMIXER)
+        os.chmod(self.script, os.stat(self.script).st_mode | stat.S_IEXEC)
+        self.addCleanup(os.remove, self.script)
+
+    def backend(self, control):
+        backend = AmixerBackend(control, executable=self.script)
+        self.addCleanup(backend.close)
+        return backend
+
+    def test_write_waits_for_amixer_confirmation(self):
+        backend = self.backend("Master")
+        backend.write(40)
+        backend.write(45)
+        process = backend._process
+        backend.write(50)
+        self.assertIs(backend._process, process)  # una sola sesión para todas las escrituras
+
+    def test_rejected_write_raises(self):
+        backend = self.backend("Bogus")
+        with self.assertRaises(OSError) as error:
+            backend.write(40)
+        self.assertIn("Unable to find simple control", str(error.exception))
+
+    def test_rejected_write_is_reported_by_service(self):
+        mixer = MixerService(self.backend("Bogus"))
+        mixer.start()
+        self.addCleanup(mixer.shutdown)
+        mixer.set(70)
+        self.assertTrue(mixer.flush(2.0))
+        self.assertIn("Unable to find simple control", mixer.write_status()["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import time
+
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("gpiozero")
+os.environ["MOVEMENT_PIN_FACTORY"] = "mock"
+os.environ["MOVEMENT_MIXER"] = "fake"
+
+import movement  # noqa: E402  (las variables de entorno deben estar antes de importarlo)
+from motion_executor import MotionExecutor  # noqa: E402
+
+# (FWD_A, REV_A, FWD_B, REV_B) que deja cada acción de movement.py, según el cableado del robot.
+EXPECTED_PINS = {
+    "stop": (0, 0, 0, 0),
+    "turn_left": (1, 0, 1, 0),
+    "turn_right": (1, 1, 1, 1),
+    "move_backward": (1, 1, 1, 0),
+    "move_forward": (1, 0, 1, 1),
+}
+
+
+def pins():
+    return tuple(int(led.value) for led in (movement.motorA_fwd, movement.motorA_rev,
+                                            movement.motorB_fwd, movement.motorB_rev))
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+@pytest.fixture(scope="module")
+def executor():
+    movement.motion_executor.start()
+    yield movement.motion_executor
+    movement.motion_executor.shutdown()
+
+
+@pytest.mark.parametrize("action", ["turn_left", "turn_right", "move_backward", "move_forward"])
+def test_drive_sets_pins_and_stop_clears_them(executor, action):
+    executor.drive(action)
+    assert wait_for(lambda: executor.status()["current"] == action)
+    assert pins() == EXPECTED_PINS[action]
+    executor.stop()
+    assert wait_for(lambda: executor.status()["mode"] == "idle" and executor.status()["current"] == "stop")
+    assert pins() == EXPECTED_PINS["stop"]
+
+
+def test_held_direction_is_reapplied_after_external_stop(executor):
+    executor.drive("move_forward")
+    assert wait_for(lambda: pins() == EXPECTED_PINS["move_forward"])
+    executor.stop()  # p. ej. POST /stop desde otro cliente
+    assert wait_for(lambda: pins() == EXPECTED_PINS["stop"])
+    executor.drive("move_forward")  # el panel repite la orden mientras el botón sigue presionado
+    assert wait_for(lambda: pins() == EXPECTED_PINS["move_forward"])
+    executor.stop()
+    assert wait_for(lambda: executor.status()["mode"] == "idle")
+
+
+def test_special_event_sequence_runs_on_time(executor):
+    config = {"initial_delay": 50, "move_duration": 60, "delay_between": 20}
+    steps = movement.special_event_steps(config)
+    before = executor.status().get("lateness_ms", {}).get("steps", 0)
+    start = time.monotonic()
+    assert executor.run_sequence(steps)
+
+    # A mitad de cada movimiento los pines deben coincidir con la acción de ese paso.
+    for (offset, action), (stop_offset, _) in zip(steps[::2], steps[1::2]):
+        time.sleep(max(0, start + (offset + stop_offset) / 2 - time.monotonic()))
+        assert pins() == EXPECTED_PINS[action]
+
+    assert wait_for(lambda: executor.status()["mode"] == "idle")
+    assert pins() == EXPECTED_PINS["stop"]
+    lateness = executor.status()["lateness_ms"]
+    assert lateness["steps"] == before + len(steps)
+    assert lateness["max"] < 20
+
+
+def test_failing_action_stops_motors_and_keeps_thread_alive():
+    calls = []
+
+    def broken():
+        raise OSError("pigpiod no responde")
+
+    executor = MotionExecutor({"go": lambda: calls.append("go"), "broken": broken}, lambda: calls.append("stop"))
+    executor.start()
+    try:
+        executor.run_sequence([(0.0, "go"), (0.01, "broken"), (0.5, "go")])
+        assert wait_for(lambda: executor.status()["errors"] == 1)
+        status = executor.status()
+        assert status["mode"] == "idle" and status["current"] == "stop" and status["pending_steps"] == 0
+        assert calls == ["go", "stop"]
+
+        executor.drive("go")
+        assert wait_for(lambda: calls[-1] == "go")
+        executor.stop()
+        assert wait_for(lambda: calls[-1] == "stop")
+    finally:
+        executor.shutdown()
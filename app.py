@@ -1,29 +1,66 @@
+from boot_timing import BootTimer
 from flask import Flask, render_template, Response, jsonify, request
 from flask_cors import CORS
-import cv2
+import atexit
+import json
+import multiprocessing
 import time
 import threading
 import os
 import random
-import numpy as np
-import tflite_runtime.interpreter as tflite
 import sys
-import requests
+from pipeline import LatestValue, FrameBroadcaster
+from detection_config import MOTION_GATE_CONFIG_RULES, TRACKING_CONFIG_RULES, validate_config
+from detection_engine import (
+    DetectionChannels, run_worker, emotion_labels,
+    CAMERA_MJPEG_PASSTHROUGH, FACE_BOX_MAX_AGE, FACE_SELECTION_POLICIES
+)
+from events import EventLog, format_sse
+from media_catalog import MediaCatalog
+from media_prefetch import MediaPrefetcher
+from media_server import MediaServer
+from transcoder import RENDITIONS_FOLDER, rendition_relpath
+from movement_client import MovementClient, MovementUnavailable
+
+# OpenCV, numpy, TFLite y la cámara se cargan en el proceso de detección, en paralelo con este;
+# el servidor web queda listo sin esperarlos y /detection_status informa "warming_up" mientras tanto.
+boot_timer = BootTimer("web")
+boot_timer.mark("imports")
 
 app = Flask(__name__)
 CORS(app)
+# Índice de static/ compartido con upload_server.py; evita un os.listdir por petición.
+media_catalog = MediaCatalog(app.static_folder)
+# /static con ETags por contenido, URLs versionadas cacheables y rangos 206 para los MP4.
+media_server = MediaServer(app.static_folder)
+app.view_functions['static'] = media_server.send
 
 # --- Configuración y Estado ---
 MOVEMENT_SERVER_URL = "http://localhost:5001"
+# Sesión persistente con timeouts; las órdenes de movimiento se envían desde un hilo de fondo con reintentos.
+movement_client = MovementClient(MOVEMENT_SERVER_URL)
 CAROUSEL_IMG_FOLDER = os.path.join(os.path.dirname(__file__), 'static', 'carousel_images')
-
-# --- Configuración de la Detección de Emociones ---
-EMOTION_CONFIRMATION_TIME = 1.5  # Segundos que una emoción debe ser detectada consistentemente para ser válida.
+CAROUSEL_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif')
+AUDIO_EMOTION_FOLDERS = ["angry", "fear", "happy", "neutral", "no_face", "sad", "surprise"]
+# Con MEDIA_X_SENDFILE=1 el proxy delante de Flask (nginx/apache) envía los archivos sin copiarlos por Python.
+MEDIA_X_SENDFILE = os.environ.get("MEDIA_X_SENDFILE", "0") == "1"
+MEDIA_REWARM_SECONDS = 30  # Con el robot en reposo, cada cuánto se vuelven a precargar los próximos clips.
+app.config['USE_X_SENDFILE'] = MEDIA_X_SENDFILE
+
+# --- Eventos push (SSE) hacia el navegador ---
+SSE_HEARTBEAT_SECONDS = 15  # Comentario periódico para mantener viva la conexión /events.
+EVENT_LOG_RETENTION = 1000  # Eventos que se conservan para consumidores que se reconectan.
+LONG_POLL_MAX_SECONDS = 30
 
 # -- Estado de la aplicación --
-frame_lock = threading.Lock()
-current_frame = None
-detection_complete = False
+# Registro de eventos de detección, videos forzados, reinicios y cambios de configuración.
+# Los consumidores leen con su propio cursor; ninguna lectura borra eventos para los demás.
+interaction_events = EventLog(max_events=EVENT_LOG_RETENTION)
+# Lock para los globales de estado que se escriben desde rutas Flask y desde los hilos de fondo.
+state_lock = threading.RLock()
+video_broadcaster = FrameBroadcaster()  # Última parte MJPEG de la vista previa, repartida a los clientes de /video_feed.
+face_box_slot = LatestValue()    # (x, y, w, h, timestamp) o None, según el último estado del proceso de detección.
+preview_frame_size = (320, 240)  # (ancho, alto) real de los frames, para escalar el recuadro en el navegador.
 detected_emotion = "neutral"
 predete_emotion = "neutral"
 
@@ -32,12 +69,10 @@ looping_videos_camera = False
 url_camera = "random"
 
 detected_snapshot = None
-forced_video_to_play = None
-restart_requested = False
-
-# --- Estado para el proceso de confirmación de emoción ---
-confirming_emotion = None
-emotion_confirmation_start_time = None
+restart_requested = False  # Reinicio pedido y aún no atendido (se limpia cuando el kiosco recarga '/').
+interaction_started_at = None  # Última detección o video forzado publicado; se limpia cuando el kiosco recarga '/'.
+INTERACTION_MAX_SECONDS = 300  # Sin recarga del kiosco (p. ej. pantalla cerrada) la interacción se da por terminada.
+legacy_status_cursor = 0   # Cursor propio de /detection_status, que mantiene su contrato de "leer y limpiar".
 
 # --- Configuración del evento especial ---
 special_event_config = {
@@ -51,116 +86,212 @@ special_event_config = {
 special_event_thread = None
 special_event_timer_event = threading.Event()
 
-# --- Carga de Modelos ---
-try:
-    face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
-    if face_cascade.empty():
-        print("CRITICAL ERROR: Cascade Classifier not loaded.")
-except Exception as e:
-    print(f"CRITICAL ERROR loading Cascade Classifier: {e}")
-    face_cascade = None
-
-emotion_labels = ["angry", "disgust", "fear", "happy", "sad", "surprise", "neutral"]
-interpreter = None
-try:
-    model_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "emotion_model.tflite")
-    interpreter = tflite.Interpreter(model_path=model_path)
-    interpreter.allocate_tensors()
-    input_details = interpreter.get_input_details()
-    output_details = interpreter.get_output_details()
-    print("TFLite model loaded successfully.")
-except Exception as e:
-    print(f"CRITICAL ERROR: Failed to load TFLite model: {e}")
-    interpreter = None
+# Los videos se eligen entre los originales pero se entregan en su versión para el kiosco (H.264 a la
+# resolución de la pantalla, faststart) que upload_server.py genera en static/renditions/. Mientras esa
+# versión no existe (recién subido, o conversión inicial en curso) se entrega el original si el navegador
+# lo puede reproducir.
+VIDEO_EXTENSIONS = ('.mp4', '.webm', '.mov', '.avi')
+PLAYABLE_ORIGINAL_EXTENSIONS = ('.mp4', '.webm')
+SPECIAL_EVENT_VIDEO = "special/event.mp4"
+
+def kiosk_video(folder, filename):
+    """Ruta (relativa a static/) a entregar para 'folder/filename', o None si todavía no hay nada reproducible."""
+    if not filename:
+        return None
+    rendition = rendition_relpath(f"{folder}/{filename}")
+    if media_catalog.exists(*rendition.rsplit("/", 1)):
+        return rendition
+    if filename.lower().endswith(PLAYABLE_ORIGINAL_EXTENSIONS) and media_catalog.exists(folder, filename):
+        return f"{folder}/{filename}"
+    return None
+
+# Próximo audio por emoción y próximo video, elegidos y precargados antes de que se confirme una emoción.
+media_prefetcher = MediaPrefetcher(
+    media_catalog,
+    {**{f"audio/{e}": ('.mp3',) for e in AUDIO_EMOTION_FOLDERS}, "video": VIDEO_EXTENSIONS, "video_upload": VIDEO_EXTENSIONS},
+    is_idle=lambda: latest_detection_state.get("motion_gate", {}).get("state") == "idle",
+    # Se precarga lo que realmente se va a entregar: la versión para el kiosco si existe.
+    resolve=lambda folder, filename: kiosk_video(folder, filename) if folder in ("video", "video_upload") else f"{folder}/{filename}",
+    rewarm_interval=MEDIA_REWARM_SECONDS
+)
+
+# --- Proceso de detección ---
+# La cámara, el cascade, TFLite y la codificación JPEG corren en otro proceso (detection_engine.py).
+# Este proceso solo lee lo que publica en memoria compartida y le envía órdenes por una cola.
+detection_channels = DetectionChannels()
+detection_commands = multiprocessing.Queue()
+detection_process = None
+latest_detection_state = {}  # Último estado publicado por el proceso de detección.
+atexit.register(detection_channels.close, unlink=True)
+boot_timer.mark("app_setup")
 
 # --- Lógica de la Aplicación ---
-def get_carousel_images():
-    if not os.path.exists(CAROUSEL_IMG_FOLDER): return []
+carousel_data_cache = {"mtime": None, "items": {}}
+
+def load_carousel_items():
+    """Derivados por imagen de carousel_data.json (lo genera upload_server.py); se relee solo si cambió."""
+    path = os.path.join(CAROUSEL_IMG_FOLDER, 'carousel_data.json')
     try:
-        files = sorted([f for f in os.listdir(CAROUSEL_IMG_FOLDER) if f.lower().endswith(('.png', '.jpg', '.jpeg', '.gif'))])
-        return [f"/static/carousel_images/{f}" for f in files]
-    except Exception as e:
-        print(f"ERROR al leer la carpeta del carrusel: {e}")
-        return []
-
-def predict_emotion_tflite(face_roi):
-    if interpreter is None or face_roi is None or face_roi.size == 0: return "neutral"
-    gray_face = cv2.cvtColor(face_roi, cv2.COLOR_BGR2GRAY)
-    h, w = input_details[0]['shape'][1:3]
-    gray_face_resized = cv2.resize(gray_face, (w, h))
-    input_data = np.expand_dims(np.expand_dims(gray_face_resized.astype("float32") / 255.0, axis=-1), axis=0)
-    interpreter.set_tensor(input_details[0]['index'], input_data)
-    interpreter.invoke()
-    preds = interpreter.get_tensor(output_details[0]['index'])[0]
-    return emotion_labels[np.argmax(preds)]
-
-def detection_loop():
-    global current_frame, detection_complete, detected_emotion, detected_snapshot, forced_video_to_play, restart_requested
-    global confirming_emotion, emotion_confirmation_start_time
-    
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
-        print("CRITICAL: Camera not accessible.")
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {}
+    if mtime != carousel_data_cache["mtime"]:
+        try:
+            with open(path) as f:
+                items = {item["name"]: item for item in json.load(f).get("items", [])}
+        except (OSError, ValueError, KeyError) as e:
+            print(f"CAROUSEL WARNING: No se pudo leer {path}: {e}")
+            items = {}
+        carousel_data_cache.update(mtime=mtime, items=items)
+    return carousel_data_cache["items"]
+
+def get_carousel_images():
+    """
+    Una entrada por imagen del carrusel: WebP y JPEG a la altura de la pantalla con sus dimensiones y un
+    marcador de posición. Las imágenes sin derivados (aún no procesadas o GIF) usan el original como JPEG.
+    """
+    items = load_carousel_items()
+    images = []
+    for f in media_catalog.files("carousel_images", CAROUSEL_EXTENSIONS):
+        item = items.get(f)
+        if item is None:
+            images.append({"jpeg": media_server.url(f"carousel_images/{f}")})
+            continue
+        derived = item.get("webp") or item.get("jpeg") or item["source"]
+        images.append({
+            "webp": item["webp"]["url"] if "webp" in item else None,
+            "jpeg": item["jpeg"]["url"] if "jpeg" in item else media_server.url(f"carousel_images/{f}"),
+            "width": derived["width"],
+            "height": derived["height"],
+            "placeholder": item.get("placeholder"),
+        })
+    return images
+
+def special_event_video_url():
+    """URL del video del evento especial (su versión para el kiosco si ya está lista), o None si no hay."""
+    relpath = kiosk_video(*SPECIAL_EVENT_VIDEO.split("/"))
+    return media_server.url(relpath) if relpath else None
+
+def take_kiosk_video(folder):
+    """Saca la próxima elección de 'folder' que ya se pueda reproducir (un .mov sin convertir se salta)."""
+    for _ in range(len(media_catalog.files(folder, VIDEO_EXTENSIONS))):
+        relpath = kiosk_video(folder, media_prefetcher.take(folder))
+        if relpath:
+            return relpath
+    return None
+
+def engine_status():
+    """'starting' hasta recibir el primer estado del proceso de detección, luego 'warming_up' o 'ready'."""
+    return latest_detection_state.get("engine", {}).get("status", "starting")
+
+def send_detection_command(command, value=None):
+    detection_commands.put((command, value))
+
+last_published_face_box = None
+
+def publish_face_box(box):
+    """En modo passthrough envía el recuadro al navegador solo cuando cambia."""
+    global last_published_face_box
+    if not CAMERA_MJPEG_PASSTHROUGH or box == last_published_face_box:
         return
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 320)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 240)
-    
+    last_published_face_box = box
+    # Cambia en casi cada frame: se guarda solo el último valor, fuera del registro de eventos.
+    interaction_events.publish_latest("face_box", face_box_payload(box))
+
+def face_box_payload(box):
+    return {"box": [int(v) for v in box] if box else None, "width": preview_frame_size[0], "height": preview_frame_size[1]}
+
+def current_face_box():
+    """Devuelve (x, y, w, h) de la cara que guía la interacción si es reciente, o None."""
+    _, box = face_box_slot.peek()
+    if box is None or time.time() - box[4] > FACE_BOX_MAX_AGE:
+        return None
+    return tuple(int(v) for v in box[:4])
+
+def detection_reader_loop():
+    """Lee el estado que publica el proceso de detección y lo convierte en eventos de interacción."""
+    global latest_detection_state, detected_emotion, detected_snapshot, preview_frame_size
+    last_seq = 0
+    last_detection_seq = 0
     while True:
-        if forced_video_to_play or restart_requested:
-            time.sleep(0.1)
+        last_seq, raw = detection_channels.state.get(last_seq, timeout=1.0)
+        if raw is None:
             continue
-        
-        ret, frame = cap.read()
-        if not ret:
-            with frame_lock: current_frame = None
-            time.sleep(1)
+        state = json.loads(raw)
+        previous_engine = engine_status()
+        latest_detection_state = state
+        if engine_status() != previous_engine:
+            interaction_events.publish("engine", {"status": engine_status()})
+        preview_frame_size = tuple(state["frame_size"])
+        box = state["face_box"]
+        face_box_slot.put((*box, state["face_box_time"]) if box else None)
+        publish_face_box(tuple(box) if box else None)
+
+        if state["detection_seq"] > last_detection_seq:
+            last_detection_seq = state["detection_seq"]
+            _, snapshot = detection_channels.snapshot.peek()
+            with state_lock:
+                detected_emotion = state["emotion"]
+                detected_snapshot = snapshot or None
+                start_interaction("detection", {"emotion": detected_emotion})
+
+def start_interaction(event_type, data):
+    """Publica un evento que inicia una interacción en el kiosco (reacción a una emoción o video forzado)."""
+    global interaction_started_at
+    with state_lock:
+        interaction_started_at = time.monotonic()
+        interaction_events.publish(event_type, data)
+
+def interaction_in_progress():
+    """True mientras el kiosco atiende una interacción o tiene un reinicio pendiente (hasta que recarga '/')."""
+    with state_lock:
+        return restart_requested or (interaction_started_at is not None
+                                     and time.monotonic() - interaction_started_at < INTERACTION_MAX_SECONDS)
+
+def trigger_special_event():
+    """Lanza el video del evento especial salvo que haya otra interacción en curso. Devuelve si se lanzó."""
+    with state_lock:
+        if interaction_in_progress():
+            return False
+        start_interaction("forced_video", {"video": special_event_video_url() or SPECIAL_EVENT_VIDEO})
+    return True
+
+def preview_reader_loop():
+    """Reparte a los clientes de /video_feed las partes MJPEG que codifica el proceso de detección."""
+    last_seq = 0
+    viewers = 0
+    while True:
+        # El proceso de detección solo codifica la vista previa mientras haya clientes.
+        if video_broadcaster.subscribers != viewers:
+            viewers = video_broadcaster.subscribers
+            send_detection_command("viewers", viewers)
+        if viewers == 0:
+            time.sleep(0.2)
             continue
-
-        processed_frame = frame.copy()
-        if not detection_complete:
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(60, 60))
-            
-            if len(faces) > 0:
-                (x, y, w, h) = faces[0]
-                cv2.rectangle(processed_frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
-                
-                current_emotion_reading = predict_emotion_tflite(frame[y:y+h, x:x+w])
-
-                if current_emotion_reading == confirming_emotion:
-                    if time.time() - emotion_confirmation_start_time >= EMOTION_CONFIRMATION_TIME:
-                        print(f"DETECTION: Emotion '{confirming_emotion}' confirmed for {EMOTION_CONFIRMATION_TIME}s.")
-                        detection_complete = True
-                        detected_emotion = confirming_emotion
-                        _, snap_jpeg = cv2.imencode('.jpg', frame)
-                        detected_snapshot = snap_jpeg.tobytes()
-                        confirming_emotion = None
-                        emotion_confirmation_start_time = None
-                else:
-                    print(f"DETECTION: New candidate emotion: '{current_emotion_reading}'. Starting timer...")
-                    confirming_emotion = current_emotion_reading
-                    emotion_confirmation_start_time = time.time()
-            else:
-                if confirming_emotion is not None:
-                    print("DETECTION: Face lost. Resetting confirmation state.")
-                confirming_emotion = None
-                emotion_confirmation_start_time = None
-        
-        ret_jpeg, jpeg_frame = cv2.imencode('.jpg', processed_frame)
-        if ret_jpeg:
-            with frame_lock: current_frame = jpeg_frame.tobytes()
-        time.sleep(0.05)
+        last_seq, part = detection_channels.preview.get(last_seq, timeout=0.5)
+        if part is not None:
+            video_broadcaster.put(part)
+
+def start_detection_worker():
+    global detection_process
+    detection_process = multiprocessing.Process(
+        target=run_worker, args=(detection_channels.names, detection_commands), name="detection", daemon=True
+    )
+    detection_process.start()
+    print(f"Detection worker started (pid {detection_process.pid}).")
 
 def gen_video():
-    while True:
-        with frame_lock:
-            frame = current_frame
-        if frame:
-            yield (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-        time.sleep(0.05)
+    yield from video_broadcaster.subscribe()
+
+def special_event_movement_params():
+    return {
+        "initial_delay": special_event_config.get("initial_delay"),
+        "move_duration": special_event_config.get("move_duration"),
+        "delay_between": special_event_config.get("delay_between")
+    }
 
 def special_event_scheduler():
-    global forced_video_to_play, special_event_config, special_event_timer_event
+    global special_event_config, special_event_timer_event
     while True:
         special_event_timer_event.clear()
         
@@ -174,54 +305,121 @@ def special_event_scheduler():
                 print("SCHEDULER: Config changed, restarting timer.")
                 continue
             
-            if special_event_config["enabled"] and forced_video_to_play is None:
-                print("SCHEDULER: Triggering special event!")
-                forced_video_to_play = "special/event.mp4"
-                try:
-                    # ### CAMBIO 1 ###
-                    # Ahora se envía la configuración de movimiento al servidor de movimiento.
-                    event_movement_params = {
-                        "initial_delay": special_event_config.get("initial_delay"),
-                        "move_duration": special_event_config.get("move_duration"),
-                        "delay_between": special_event_config.get("delay_between")
-                    }
-                    requests.post(
-                        f"{MOVEMENT_SERVER_URL}/trigger_special_event_movement",
-                        json=event_movement_params
-                    )
-                except requests.exceptions.RequestException as e:
-                    print(f"SCHEDULER ERROR: Could not contact movement server: {e}")
-            elif forced_video_to_play is not None:
-                print("SCHEDULER: Skipping event, another interaction is active.")
+            if special_event_config["enabled"]:
+                if trigger_special_event():
+                    print("SCHEDULER: Triggering special event!")
+                    # Se envía la configuración de movimiento sin esperar respuesta: video y movimiento arrancan juntos.
+                    movement_client.send("/trigger_special_event_movement", special_event_movement_params())
+                else:
+                    print("SCHEDULER: Skipping event, another interaction is in progress.")
         else:
             time.sleep(5)
 
 # --- Rutas Flask ---
 @app.route('/')
 def route_index():
-    global forced_video_to_play, detection_complete, detected_emotion, detected_snapshot, restart_requested
-    global confirming_emotion, emotion_confirmation_start_time
+    global detected_emotion, detected_snapshot, restart_requested, legacy_status_cursor, interaction_started_at
     
-    detection_complete, detected_emotion, detected_snapshot = False, "happy", None
-    forced_video_to_play, restart_requested = None, False
-    confirming_emotion, emotion_confirmation_start_time = None, None
+    with state_lock:
+        detected_emotion, detected_snapshot, restart_requested = "happy", None, False
+        interaction_started_at = None
+        # Los eventos anteriores a la recarga ya no aplican para el consumidor de /detection_status.
+        legacy_status_cursor = interaction_events.last_seq
+    send_detection_command("paused", False)
+    send_detection_command("reset")
     
-    return render_template('index.html', image_files=get_carousel_images())
+    return render_template('index.html', image_files=get_carousel_images(), camera_passthrough=CAMERA_MJPEG_PASSTHROUGH)
 
 @app.route('/video_feed')
 def video_feed_route():
     return Response(gen_video(), mimetype='multipart/x-mixed-replace; boundary=frame')
 
+@app.route('/face_box')
+def face_box_route():
+    return jsonify(face_box_payload(current_face_box()))
+
+def status_from_events(events):
+    """Resume una lista de eventos en el formato de /detection_status."""
+    status = {"detected": False, "emotion": detected_emotion, "restart_requested": False, "engine": engine_status()}
+    for event in events:
+        if event["type"] == "detection":
+            status["detected"] = True
+            status["emotion"] = event["data"]["emotion"]
+        elif event["type"] == "forced_video":
+            status["forced_video"] = event["data"]["video"]
+        elif event["type"] == "restart":
+            status["restart_requested"] = True
+    return status
+
 @app.route('/detection_status')
 def detection_status_route():
-    global forced_video_to_play, detection_complete, detected_emotion, restart_requested
-    status = {"detected": detection_complete, "emotion": detected_emotion, "restart_requested": restart_requested}
-    if forced_video_to_play:
-        status["forced_video"] = forced_video_to_play
-        forced_video_to_play = None
-    if restart_requested: restart_requested = False
-    if detection_complete: detection_complete = False
-    return jsonify(status)
+    # Contrato anterior: devuelve lo ocurrido desde la última llamada. Solo avanza su propio cursor,
+    # así que no le quita eventos a /events ni a /events/since.
+    global legacy_status_cursor
+    with state_lock:
+        events, legacy_status_cursor, _ = interaction_events.read_after(legacy_status_cursor)
+    return jsonify(status_from_events(events))
+
+def config_snapshot():
+    with state_lock:
+        return {
+            "predete_emotion": {"emotion": predete_emotion},
+            "video_loop": {"looping": looping_videos, "url": url_camera},
+            "video_loop_camera": {"looping": looping_videos_camera},
+            "special_event_config": dict(special_event_config),
+            "engine": {"status": engine_status()},
+        }
+
+@app.route('/events')
+def events_route():
+    """
+    Canal Server-Sent Events para el navegador del kiosco. Cada evento lleva su número de secuencia
+    como 'id', así que al reconectar EventSource envía Last-Event-ID y se reanuda donde quedó.
+    Si es una conexión nueva (o el cursor ya no está retenido) primero se envía el estado actual.
+    """
+    last_event_id = request.headers.get('Last-Event-ID')
+    cursor = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+
+    def stream(cursor):
+        if cursor is not None:
+            _, _, gap = interaction_events.read_after(cursor)
+        if cursor is None or gap:
+            cursor = interaction_events.last_seq
+            for event_type, data in config_snapshot().items():
+                yield format_sse(event_type, data, cursor)
+        latest_cursor = 0
+        while True:
+            interaction_events.wait(cursor, latest_cursor, SSE_HEARTBEAT_SECONDS)
+            events, last_seq, gap = interaction_events.read_after(cursor)
+            latest, latest_cursor = interaction_events.latest_after(latest_cursor)
+            if gap:
+                for event_type, data in config_snapshot().items():
+                    yield format_sse(event_type, data, last_seq)
+            elif not events and not latest:
+                yield ": keepalive\n\n"
+            for event in events:
+                yield format_sse(event["type"], event["data"], event["seq"])
+            # Sin 'id': no mueven el Last-Event-ID con el que el navegador reanuda la conexión.
+            for event_type, data in latest.items():
+                yield format_sse(event_type, data)
+            cursor = last_seq
+    return Response(stream(cursor), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/events/since')
+def events_since_route():
+    """
+    Long-poll para otros consumidores (segunda pantalla, panel de operador):
+    /events/since?after=N&timeout=S devuelve los eventos posteriores a N sin modificar nada.
+    'latest' trae el valor actual de lo que se publica con publish_latest() (p. ej. face_box).
+    """
+    after = request.args.get('after', default=0, type=int)
+    timeout = min(request.args.get('timeout', default=0, type=float), LONG_POLL_MAX_SECONDS)
+    events, last_seq, gap = interaction_events.read_after(after, timeout=timeout or None)
+    response = {"events": events, "last_seq": last_seq, "gap": gap,
+                "latest": interaction_events.latest_after(0)[0]}
+    if gap:
+        response["state"] = config_snapshot()
+    return jsonify(response)
 
 @app.route('/snapshot')
 def snapshot_route():
@@ -229,85 +427,161 @@ def snapshot_route():
 
 @app.route('/get_random_audio')
 def get_random_audio_route():
-    emotion = detected_emotion if detected_emotion in emotion_labels else "neutral"
-    path = os.path.join(app.static_folder, "audio", emotion)
-    if not os.path.exists(path): path = os.path.join(app.static_folder, "audio", "neutral")
-    files = [f for f in os.listdir(path) if f.lower().endswith('.mp3')]
-    if not files: return jsonify({'error': 'No audio files'}), 404
-    return jsonify({'audio_url': f"/static/audio/{os.path.basename(path)}/{random.choice(files)}"})
+    emotion = detected_emotion if f"audio/{detected_emotion}" in media_prefetcher.slots else "neutral"
+    folder = f"audio/{emotion}"
+    choice = media_prefetcher.take(folder)
+    if not choice:
+        folder = "audio/neutral"
+        choice = media_prefetcher.take(folder)
+    if not choice: return jsonify({'error': 'No audio files'}), 404
+    return jsonify({'audio_url': media_server.url(f"{folder}/{choice}")})
 
 @app.route('/get_random_video')
 def get_random_video_route():
-    path = os.path.join(app.static_folder, "video")
-    files = [f for f in os.listdir(path) if f.lower().endswith('.mp4')]
-    if not files: return jsonify({'error': 'No video files'}), 404
-    return jsonify({'video_url': f"/static/video/{random.choice(files)}"})
+    relpath = take_kiosk_video("video")
+    if not relpath: return jsonify({'error': 'No video files'}), 404
+    return jsonify({'video_url': media_server.url(relpath)})
 
 
 @app.route('/get_random_video_camera')
 def get_random_video_route_camera():
-    path = os.path.join(app.static_folder, "video_upload")
-    files = [f for f in os.listdir(path) if f.lower().endswith('.mp4')]
-    if not files: return jsonify({'error': 'No video files'}), 404
-    return jsonify({'video_url': f"/static/video_upload/{random.choice(files)}"})
+    relpath = take_kiosk_video("video_upload")
+    if not relpath: return jsonify({'error': 'No video files'}), 404
+    return jsonify({'video_url': media_server.url(relpath)})
+
+def next_media_payload():
+    picks = media_prefetcher.snapshot()
+    def url(folder):
+        return media_server.url(f"{folder}/{picks[folder]}") if picks.get(folder) else None
+    def video_url(folder):
+        relpath = kiosk_video(folder, picks.get(folder))
+        return media_server.url(relpath) if relpath else None
+    return {
+        "audio": {e: url(f"audio/{e}") or url("audio/neutral") for e in AUDIO_EMOTION_FOLDERS},
+        "video": video_url("video"),
+        "video_camera": video_url("video_upload"),
+        "special": special_event_video_url(),
+    }
+
+@app.route('/next_media', methods=['GET', 'POST'])
+def next_media_route():
+    """
+    Próximos clips ya elegidos (audio por emoción, video y video de cámara) para que el kiosco los precargue.
+    Con POST {"used": ["audio/happy", "video", ...]} el navegador avisa qué elecciones ya reprodujo por su
+    cuenta; se sortean las siguientes y se devuelve la lista actualizada.
+    """
+    if request.method == 'POST':
+        for folder in (request.json or {}).get('used', []):
+            # Un video entregado en su versión convertida llega como 'renditions/video'.
+            folder = folder.removeprefix(f"{RENDITIONS_FOLDER}/")
+            if folder in media_prefetcher.slots:
+                media_prefetcher.take(folder)
+    return jsonify(next_media_payload())
 
 # --- Rutas de Control Externo ---
 @app.route('/list_videos')
 def list_videos_route():
-    path = os.path.join(app.static_folder, "video")
-    return jsonify({'videos': sorted([f for f in os.listdir(path) if f.lower().endswith('.mp4')])})
+    return jsonify({'videos': media_catalog.files("video", VIDEO_EXTENSIONS)})
 
 @app.route('/play_specific_video', methods=['POST'])
 def play_specific_video_route():
-    global forced_video_to_play
-    forced_video_to_play = request.json.get('video_file')
+    relpath = kiosk_video("video", os.path.basename(request.json.get('video_file') or ''))
+    if relpath is None:
+        return jsonify({'status': 'error', 'message': 'El video no existe o todavía se está convirtiendo.'}), 404
+    # Orden explícita del operador: se reproduce aunque haya otra interacción en curso.
+    start_interaction("forced_video", {"video": media_server.url(relpath)})
     return jsonify({'status': 'ok'})
 
 @app.route('/restart')
 def restart_route():
     global restart_requested
-    restart_requested = True
+    with state_lock:
+        restart_requested = True
+        interaction_events.publish("restart")
+    send_detection_command("paused", True)
     return jsonify({"status": "restarted"})
     
+@app.route('/interaction_done', methods=['POST'])
+def interaction_done_route():
+    """El kiosco terminó una interacción que no recarga la página (el video del evento especial)."""
+    global interaction_started_at
+    with state_lock:
+        interaction_started_at = None
+    return jsonify({"status": "ok"})
+
 @app.route('/trigger_special_event_manually', methods=['POST'])
 def trigger_special_event_manually_route():
-    global forced_video_to_play
-    if forced_video_to_play is not None:
+    if not trigger_special_event():
         return jsonify({"status": "error", "message": "Otra interacción ya está en curso."}), 409
     print("MANUAL TRIGGER: ¡Activando evento especial manualmente!")
-    forced_video_to_play = "special/event.mp4"
+    # También se envía la configuración al activar el evento manualmente. El video ya se publicó, así que
+    # esperar aquí (con los timeouts del cliente) no lo retrasa y la respuesta refleja este envío.
     try:
-        # ### CAMBIO 2 ###
-        # También se envía la configuración al activar el evento manualmente.
-        event_movement_params = {
-            "initial_delay": special_event_config.get("initial_delay"),
-            "move_duration": special_event_config.get("move_duration"),
-            "delay_between": special_event_config.get("delay_between")
-        }
-        requests.post(
-            f"{MOVEMENT_SERVER_URL}/trigger_special_event_movement",
-            json=event_movement_params
-        )
-    except requests.exceptions.RequestException as e:
+        response = movement_client.post("/trigger_special_event_movement", special_event_movement_params())
+    except MovementUnavailable as e:
         print(f"MANUAL TRIGGER ERROR: No se pudo contactar al servidor de movimiento: {e}")
         return jsonify({"status": "warning", "message": "Video triggered, but could not contact movement server."}), 503
+    if response.status_code >= 400:
+        print(f"MANUAL TRIGGER WARNING: El servidor de movimiento rechazó la secuencia ({response.status_code}).")
+        return jsonify({"status": "warning", "message": "Video triggered, but the movement server ignored the sequence."})
     return jsonify({"status": "ok", "message": "Evento especial activado manualmente."})
 
+@app.route('/movement_client_stats', methods=['GET'])
+def movement_client_stats():
+    return jsonify(movement_client.stats())
+
 @app.route('/config_special_event', methods=['POST'])
 def config_special_event():
     global special_event_config, special_event_timer_event
     new_config = request.json
-    special_event_config.update(new_config)
+    with state_lock:
+        special_event_config.update(new_config)
     print(f"CONFIG: Nueva configuración de evento recibida: {special_event_config}")
     # No es necesario enviar la configuración al servidor de movimiento aquí,
     # ya que se enviará en el momento de la activación del evento.
     special_event_timer_event.set() # Reinicia el temporizador del evento con la nueva config.
+    interaction_events.publish("special_event_config", dict(special_event_config))
     return jsonify({"status": "ok", "message": "Configuración actualizada."})
 
 @app.route('/get_special_event_config', methods=['GET'])
 def get_special_event_config():
     return jsonify(special_event_config)
 
+@app.route('/config_face_tracking', methods=['POST'])
+def config_face_tracking():
+    # Se valida aquí para poder responder 400; el proceso de detección aplica la configuración.
+    try:
+        new_config = validate_config(request.json or {}, TRACKING_CONFIG_RULES)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    send_detection_command("face_tracking", new_config)
+    return jsonify({"status": "ok", "config": {**latest_detection_state.get("face_tracking", {}), **new_config}})
+
+@app.route('/get_face_tracking_config', methods=['GET'])
+def get_face_tracking_config():
+    return jsonify(latest_detection_state.get("face_tracking", {}))
+
+@app.route('/config_motion_gate', methods=['POST'])
+def config_motion_gate():
+    try:
+        new_config = validate_config(request.json or {}, MOTION_GATE_CONFIG_RULES)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    send_detection_command("motion_gate", new_config)
+    return jsonify({"status": "ok", "config": {**latest_detection_state.get("motion_gate", {}).get("config", {}), **new_config}})
+
+@app.route('/get_motion_gate_status', methods=['GET'])
+def get_motion_gate_status():
+    return jsonify(latest_detection_state.get("motion_gate", {}))
+
+@app.route('/set_face_selection_policy', methods=['POST'])
+def set_face_selection_policy():
+    policy = request.args.get('policy')
+    if policy not in FACE_SELECTION_POLICIES:
+        return jsonify({"status": "error", "message": f"Política inválida. Permitidas: {', '.join(FACE_SELECTION_POLICIES)}"}), 400
+    send_detection_command("face_selection_policy", policy)
+    return jsonify({"status": "ok", "policy": policy})
+
 
 # --------------------- Cambio de cara predeterminada ---------
 @app.route('/get_predete_emotion', methods=['GET'])
@@ -318,7 +592,9 @@ def get_predete_emotion_route():
 @app.route("/set_predete_emotion", methods=['POST'])
 def set_predete_emotion():
     global predete_emotion
-    predete_emotion = request.args.get('emotion')
+    with state_lock:
+        predete_emotion = request.args.get('emotion')
+        interaction_events.publish("predete_emotion", {"emotion": predete_emotion})
     return jsonify({"emotion": predete_emotion})
 
 #------------------------- Videos automáticos -----------------
@@ -327,9 +603,11 @@ def set_video_loop_state():
     global looping_videos, url_camera
     state_param = request.args.get('state')
     url_param = request.args.get('url')
-    url_camera = "/static/video/" + url_param
-
-    looping_videos = state_param == 'true' if state_param is not None else False
+    with state_lock:
+        # "random" es el valor que el kiosco reconoce como "sin video fijo" ('/static/video/random').
+        url_camera = "/static/video/random" if url_param in (None, "random") else f"/static/{kiosk_video('video', url_param) or 'video/' + url_param}"
+        looping_videos = state_param == 'true' if state_param is not None else False
+        interaction_events.publish("video_loop", {"looping": looping_videos, "url": url_camera})
     return jsonify({"looping": looping_videos, 'url' : url_camera})
 
 
@@ -342,7 +620,9 @@ def get_video_loop_state():
 def set_video_loop_camera_state():
     global looping_videos_camera
     state_param = request.args.get('state')
-    looping_videos_camera = state_param == 'true' if state_param is not None else False
+    with state_lock:
+        looping_videos_camera = state_param == 'true' if state_param is not None else False
+        interaction_events.publish("video_loop_camera", {"looping": looping_videos_camera})
     return jsonify({"looping": looping_videos_camera})
 
 
@@ -350,12 +630,36 @@ def set_video_loop_camera_state():
 def get_video_loop_camera_state():
     return jsonify({"looping": looping_videos_camera})
 
+@app.route('/healthz')
+def healthz_route():
+    """Chequeo de disponibilidad para el supervisor (serve.py). La UI responde aunque el motor siga cargando."""
+    return jsonify({"status": "ok", "engine": engine_status()})
 
+@app.route('/boot_report')
+def boot_report_route():
+    """Desglose de tiempos de arranque del proceso web y del proceso de detección."""
+    return jsonify({"web": boot_timer.report(), "detection": latest_detection_state.get("engine", {}).get("boot", {})})
 
 
-if __name__ == '__main__':
-    threading.Thread(target=detection_loop, daemon=True).start()
+
+
+def start_background_tasks():
+    """Arranca el proceso de detección y los hilos de fondo. Lo usan __main__ y el lanzador serve.py."""
+    global special_event_thread
+    # El proceso de detección se crea antes que cualquier hilo de este proceso (fork).
+    start_detection_worker()
+    threading.Thread(target=detection_reader_loop, daemon=True).start()
+    threading.Thread(target=preview_reader_loop, daemon=True).start()
     special_event_thread = threading.Thread(target=special_event_scheduler, daemon=True)
     special_event_thread.start()
-    print("Flask app starting... Main detection and event scheduler are running.")
-    app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=False)
\ No newline at end of file
+    media_prefetcher.start()
+    media_server.prime(list(media_prefetcher.slots) + [f"{RENDITIONS_FOLDER}/{f}" for f in ("video", "video_upload", "special")]
+                       + ["special", "carousel_images"], media_catalog)
+    boot_timer.mark("background_tasks")
+    print("Detection worker, preview/state readers and event scheduler are running.")
+    print(boot_timer.summary())
+
+if __name__ == '__main__':
+    start_background_tasks()
+    print("Flask app starting (development server; use serve.py in production).")
+    app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=False)
@@ -0,0 +1,188 @@
+"""
+Optimización de los clips de audio de static/audio/<emoción>: recorta el silencio del inicio y del final,
+normaliza la sonoridad y los recodifica a MP3 mono compacto. El original de cada clip se guarda en
+audio_originals/<emoción>/<clip>.mp3/, con su nombre de siempre.
+
+    python3 audio_processing.py                 # procesa todos los clips que aún no se optimizaron
+    python3 audio_processing.py happy sad       # solo esas emociones
+    python3 audio_processing.py --force         # vuelve a procesar desde los originales guardados
+
+upload_server.py usa AudioOptimizer para procesar cada audio subido en segundo plano.
+"""
+import argparse
+import os
+import queue
+import shutil
+import subprocess
+import threading
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+AUDIO_FOLDER = os.path.join(BASE_DIR, "static", "audio")
+BACKUP_FOLDER = os.path.join(BASE_DIR, "audio_originals")   # Fuera de static/: nunca se sirve al kiosco.
+AUDIO_EXTENSIONS = (".mp3", ".wav")
+
+SILENCE_THRESHOLD = "-45dB"   # Lo que esté por debajo al inicio o al final se considera silencio.
+SILENCE_KEEP = 0.05           # Segundos de silencio que se dejan para no cortar el ataque de la voz.
+PAUSE_KEEP = 0.3              # Silencio más largo que se deja al final (y en las pausas entre frases).
+LOUDNESS = "I=-16:TP=-1.5:LRA=11"
+BITRATE = "64k"               # Voz mono: suficiente para TTS y ~10 veces menos que un WAV.
+SAMPLE_RATE = 44100
+
+
+def audio_filter():
+    # stop_periods=-1 recorta el silencio final sin invertir el clip (areverse lo cargaba entero en memoria);
+    # como efecto, una pausa intermedia de más de PAUSE_KEEP también queda en PAUSE_KEEP.
+    trim = (f"silenceremove=start_periods=1:start_threshold={SILENCE_THRESHOLD}:start_silence={SILENCE_KEEP}"
+            f":stop_periods=-1:stop_threshold={SILENCE_THRESHOLD}:stop_duration={PAUSE_KEEP}"
+            f":stop_silence={PAUSE_KEEP}")
+    return f"{trim},loudnorm={LOUDNESS}"
+
+
+def backup_dir(clip, audio_folder=AUDIO_FOLDER, backup_folder=BACKUP_FOLDER):
+    """Carpeta con el original del clip optimizado 'clip': audio_originals/<emoción>/<nombre completo del clip>/."""
+    return os.path.join(backup_folder, os.path.relpath(clip, audio_folder))
+
+
+def find_backup(clip, audio_folder=AUDIO_FOLDER, backup_folder=BACKUP_FOLDER):
+    """
+    Original guardado del clip 'clip' o None si ese archivo nunca se optimizó. Se busca por el nombre completo:
+    el original de 'hola.mp3' no dice nada de un 'hola.wav' recién subido.
+    """
+    directory = backup_dir(clip, audio_folder, backup_folder)
+    if not os.path.isdir(directory):
+        return None
+    names = sorted(os.listdir(directory))
+    return os.path.join(directory, names[0]) if names else None
+
+
+def optimize_clip(path, ffmpeg, audio_folder=AUDIO_FOLDER, backup_folder=BACKUP_FOLDER, from_backup=False):
+    """
+    Procesa 'path' y devuelve la ruta del MP3 resultante (mismo nombre base, misma carpeta).
+    'path' pasa a ser el original guardado en 'backup_folder'; con from_backup=True se vuelve a procesar a
+    partir del original ya guardado (p. ej. tras cambiar los parámetros).
+    """
+    output = os.path.splitext(path)[0] + ".mp3"
+    previous = find_backup(output, audio_folder, backup_folder)
+    # Solo el propio clip optimizado se rehace desde su original; otro archivo que genere el mismo MP3 lo reemplaza.
+    source = previous if from_backup and previous and path == output else path
+    partial = output + ".part"
+    command = [
+        ffmpeg, "-hide_banner", "-nostdin", "-loglevel", "error", "-y", "-i", source,
+        "-af", audio_filter(), "-ac", "1", "-ar", str(SAMPLE_RATE), "-c:a", "libmp3lame", "-b:a", BITRATE,
+        "-f", "mp3", partial,
+    ]
+    try:
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip()[-500:] or f"ffmpeg terminó con {result.returncode}")
+        if source == path:
+            # El archivo subido es el nuevo original; con un enlace duro no se copia nada.
+            directory = backup_dir(output, audio_folder, backup_folder)
+            if os.path.isdir(directory):
+                shutil.rmtree(directory)
+            os.makedirs(directory)
+            backup = os.path.join(directory, os.path.basename(path))
+            try:
+                os.link(path, backup)
+            except OSError:
+                shutil.copy2(path, backup)
+        os.replace(partial, output)
+        if output != path and os.path.exists(path):
+            os.remove(path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return output
+
+
+class AudioOptimizer:
+    """
+    Procesa en segundo plano, de a uno, los audios que se suben. 'on_done(folder, old_name, new_name)'
+    se llama al terminar para actualizar el catálogo (un WAV se convierte en un MP3 con otro nombre).
+    """
+
+    def __init__(self, audio_folder=AUDIO_FOLDER, backup_folder=BACKUP_FOLDER, on_done=None, max_pending=64):
+        self.audio_folder = audio_folder
+        self.backup_folder = backup_folder
+        self.on_done = on_done
+        self.ffmpeg = shutil.which("ffmpeg")
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        if self.ffmpeg is None:
+            print("AUDIO WARNING: ffmpeg no está instalado; los audios subidos se guardan sin optimizar.")
+            return
+        self._thread = threading.Thread(target=self._worker_loop, name="audio-optimizer", daemon=True)
+        self._thread.start()
+
+    def submit(self, path):
+        if self._thread is None:
+            return False
+        try:
+            self._queue.put_nowait(path)
+            return True
+        except queue.Full:
+            print(f"AUDIO WARNING: Cola llena, {os.path.basename(path)} queda sin optimizar.")
+            return False
+
+    def _worker_loop(self):
+        while True:
+            path = self._queue.get()
+            if not os.path.isfile(path):
+                continue
+            try:
+                output = optimize_clip(path, self.ffmpeg, self.audio_folder, self.backup_folder)
+            except (OSError, RuntimeError) as e:
+                print(f"AUDIO ERROR: No se pudo optimizar {path}: {e}")
+                continue
+            print(f"AUDIO: {os.path.relpath(output, self.audio_folder)} optimizado "
+                  f"({os.path.getsize(find_backup(output, self.audio_folder, self.backup_folder)) // 1024} KB -> "
+                  f"{os.path.getsize(output) // 1024} KB).")
+            if self.on_done:
+                self.on_done(os.path.dirname(path), os.path.basename(path), os.path.basename(output))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recorta silencios, normaliza y recodifica los audios de static/audio.")
+    parser.add_argument("emotions", nargs="*", help="Carpetas de emoción a procesar (por defecto todas).")
+    parser.add_argument("--force", action="store_true", help="Vuelve a procesar también los ya optimizados.")
+    args = parser.parse_args()
+
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        parser.error("ffmpeg no está instalado.")
+    available = sorted(d for d in os.listdir(AUDIO_FOLDER) if os.path.isdir(os.path.join(AUDIO_FOLDER, d)))
+    unknown = [emotion for emotion in args.emotions if emotion not in available]
+    if unknown:
+        parser.error(f"No existe la carpeta de emoción {', '.join(unknown)} en {AUDIO_FOLDER}. "
+                     f"Disponibles: {', '.join(available)}.")
+    emotions = args.emotions or available
+    before = after = processed = failed = 0
+    for emotion in emotions:
+        folder = os.path.join(AUDIO_FOLDER, emotion)
+        for filename in sorted(os.listdir(folder)):
+            path = os.path.join(folder, filename)
+            if not filename.lower().endswith(AUDIO_EXTENSIONS):
+                continue
+            if not args.force and find_backup(path):
+                continue
+            size = os.path.getsize(path)
+            try:
+                output = optimize_clip(path, ffmpeg, from_backup=args.force)
+            except (OSError, RuntimeError) as e:
+                print(f"ERROR {emotion}/{filename}: {e}")
+                failed += 1
+                continue
+            before += size
+            after += os.path.getsize(output)
+            processed += 1
+            print(f"{emotion}/{filename} -> {os.path.basename(output)} ({size // 1024} KB -> {os.path.getsize(output) // 1024} KB)")
+    print(f"{processed} clips optimizados, {failed} con error; {before // 1024} KB -> {after // 1024} KB. "
+          f"Originales en {BACKUP_FOLDER}.")
+
+
+if __name__ == "__main__":
+    main()
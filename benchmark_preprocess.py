@@ -0,0 +1,59 @@
+import time
+import tracemalloc
+import cv2
+import numpy as np
+from emotion_preprocess import EmotionPreprocessor
+
+# Micro-benchmark del preprocesamiento del modelo de emociones.
+# Compara el camino anterior (cvtColor por cara, resize, astype, /255, expand_dims x2)
+# con EmotionPreprocessor (gris compartido con el cascade y buffer preasignado).
+
+FRAMES = 2000
+INPUT_H, INPUT_W = 48, 48
+FACE_BOX = (100, 60, 120, 120)
+
+
+def legacy_preprocess(frame, box):
+    x, y, w, h = box
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)  # Conversión para el cascade.
+    face_roi = frame[y:y+h, x:x+w]
+    gray_face = cv2.cvtColor(face_roi, cv2.COLOR_BGR2GRAY)  # Segunda conversión dentro de predict_emotion_tflite.
+    gray_face_resized = cv2.resize(gray_face, (INPUT_W, INPUT_H))
+    return gray, np.expand_dims(np.expand_dims(gray_face_resized.astype("float32") / 255.0, axis=-1), axis=0)
+
+
+def make_new_preprocess():
+    pre = EmotionPreprocessor(INPUT_H, INPUT_W, max_batch=1)
+
+    def new_preprocess(frame, box):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return gray, pre.fill(gray, [box])
+    return new_preprocess
+
+
+def run(name, fn, frame):
+    for _ in range(50):
+        fn(frame, FACE_BOX)
+
+    start = time.perf_counter()
+    for _ in range(FRAMES):
+        fn(frame, FACE_BOX)
+    elapsed = time.perf_counter() - start
+
+    # numpy registra sus buffers en tracemalloc, así que el pico refleja los temporales por frame.
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    fn(frame, FACE_BOX)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{name:<10} {elapsed / FRAMES * 1e6:8.1f} us/frame   asignado por frame (pico) {(peak - base) / 1024:8.1f} KiB")
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, size=(240, 320, 3), dtype=np.uint8)
+    print(f"Preprocesamiento de 1 cara en frame 320x240, {FRAMES} iteraciones")
+    run("anterior", legacy_preprocess, frame)
+    run("nuevo", make_new_preprocess(), frame)
@@ -0,0 +1,49 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Momento en que el proceso importó este módulo; app.py lo importa primero para medir sus propios imports.
+PROCESS_STARTED = time.monotonic()
+
+
+class BootTimer:
+    """
+    Registra cuánto tarda cada fase del arranque de un proceso, incluidas fases que corren en paralelo
+    en distintos hilos, y las resume en una línea para el log.
+    """
+
+    def __init__(self, name, origin=None):
+        self.name = name
+        self.origin = PROCESS_STARTED if origin is None else origin
+        self._lock = threading.Lock()
+        self._phases = []  # (etiqueta, inicio relativo al origen, duración)
+
+    @contextmanager
+    def phase(self, label):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(label, start, time.monotonic())
+
+    def record(self, label, start, end):
+        with self._lock:
+            self._phases.append((label, start - self.origin, end - start))
+
+    def mark(self, label):
+        """Registra un instante (fase de duración cero), p. ej. 'ready'."""
+        now = time.monotonic()
+        self.record(label, now, now)
+
+    def elapsed(self):
+        return time.monotonic() - self.origin
+
+    def report(self):
+        with self._lock:
+            phases = sorted(self._phases, key=lambda p: p[1])
+        return {label: {"start": round(start, 3), "duration": round(duration, 3)} for label, start, duration in phases}
+
+    def summary(self):
+        parts = [f"{label} {p['duration']:.2f}s (@{p['start']:.2f}s)" if p["duration"] else f"{label} @{p['start']:.2f}s"
+                 for label, p in self.report().items()]
+        return f"BOOT [{self.name}]: " + ", ".join(parts) + f" | total {self.elapsed():.2f}s"
@@ -0,0 +1,137 @@
+import base64
+import hashlib
+import os
+
+DERIVED_FOLDER = "_derived"     # static/carousel_images/_derived/: el catálogo solo lista archivos, no subcarpetas.
+DISPLAY_HEIGHT = int(os.environ.get("CAROUSEL_IMAGE_HEIGHT", 256))  # El carrusel las muestra a 12vh.
+PLACEHOLDER_HEIGHT = 12
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+PLACEHOLDER_QUALITY = 40
+BACKGROUND_BGR = (240, 242, 245)  # Fondo del carrusel (rgba(245, 242, 240)): las transparencias del JPEG se funden con él.
+
+
+def content_hash(data):
+    """Mismo hash que MediaServer.content_hash, así '?v=' coincide con el ETag que sirve media_server.py."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def derived_name(filename, source_hash, height, ext):
+    """
+    'logo.png' -> 'logo.png-<hash>-256.webp'. El nombre completo del original evita choques (a.b.png y a_b.png,
+    logo.png y logo.jpg) y el hash del original separa las versiones de un archivo reemplazado.
+    """
+    return f"{filename}-{source_hash[:12]}-{height}.{ext}"
+
+
+def _load(cv2, np, path):
+    with open(path, "rb") as f:
+        data = f.read()
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_UNCHANGED)
+    if image is None:
+        return data, None
+    if image.dtype != np.uint8:
+        image = (image / 257).astype(np.uint8)
+    if image.ndim == 2:
+        image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    return data, image
+
+
+def _flatten(np, image):
+    if image.shape[2] < 4:
+        return image
+    alpha = image[:, :, 3:4].astype(np.float32) / 255.0
+    background = np.empty_like(image[:, :, :3])
+    background[:] = BACKGROUND_BGR
+    return (image[:, :, :3] * alpha + background * (1.0 - alpha)).astype(np.uint8)
+
+
+def _resize(cv2, image, height):
+    h, w = image.shape[:2]
+    if h <= height:
+        return image
+    return cv2.resize(image, (max(1, round(w * height / h)), height), interpolation=cv2.INTER_AREA)
+
+
+def _write(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def build_derivatives(source_path, derived_dir, url_prefix):
+    """
+    Genera para una imagen del carrusel una versión WebP y una JPEG a la altura de la pantalla, más un
+    marcador de posición diminuto en base64. Devuelve la entrada para carousel_data.json. Si OpenCV no puede
+    leer el formato (p. ej. GIF animado) la entrada lleva 'skipped' y se sirve el original; así no se vuelve a
+    intentar hasta que el archivo cambie. Devuelve None si OpenCV no está instalado.
+    """
+    # cv2 se importa al usarlo: upload_server.py no lo necesita para nada más.
+    try:
+        import cv2
+        import numpy as np
+    except ImportError as e:
+        print(f"CAROUSEL WARNING: Sin OpenCV no se generan derivados ({e}).")
+        return None
+
+    st = os.stat(source_path)
+    data, image = _load(cv2, np, source_path)
+    filename = os.path.basename(source_path)
+    source = {"url": f"{url_prefix}/{filename}", "hash": content_hash(data), "mtime_ns": st.st_mtime_ns,
+              "size": st.st_size}
+    if image is None:
+        return {"name": filename, "source": source, "skipped": "OpenCV no puede leer el formato"}
+    src_h, src_w = image.shape[:2]
+    source.update(width=src_w, height=src_h)
+    entry = {"name": filename, "source": source}
+
+    os.makedirs(derived_dir, exist_ok=True)
+    resized = _resize(cv2, image, DISPLAY_HEIGHT)
+    height, width = resized.shape[:2]
+    encodings = {
+        "webp": cv2.imencode(".webp", resized, [cv2.IMWRITE_WEBP_QUALITY, WEBP_QUALITY]),
+        "jpeg": cv2.imencode(".jpg", _flatten(np, resized), [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY,
+                                                             cv2.IMWRITE_JPEG_PROGRESSIVE, 1]),
+    }
+    for kind, (ok, encoded) in encodings.items():
+        if not ok:
+            continue
+        name = derived_name(filename, source["hash"], height, 'jpg' if kind == 'jpeg' else kind)
+        payload = encoded.tobytes()
+        _write(os.path.join(derived_dir, name), payload)
+        value = content_hash(payload)
+        entry[kind] = {"url": f"{url_prefix}/{DERIVED_FOLDER}/{name}?v={value[:12]}",
+                       "width": width, "height": height, "hash": value, "bytes": len(payload)}
+
+    tiny = _flatten(np, _resize(cv2, image, PLACEHOLDER_HEIGHT))
+    ok, encoded = cv2.imencode(".jpg", tiny, [cv2.IMWRITE_JPEG_QUALITY, PLACEHOLDER_QUALITY])
+    if ok:
+        entry["placeholder"] = "data:image/jpeg;base64," + base64.b64encode(encoded.tobytes()).decode("ascii")
+    return entry
+
+
+def is_current(entry, source_path, derived_dir):
+    """True si 'entry' (de un carousel_data.json anterior) sigue correspondiendo al archivo y sus derivados existen."""
+    try:
+        st = os.stat(source_path)
+    except OSError:
+        return False
+    source = entry.get("source", {})
+    if (source.get("mtime_ns"), source.get("size")) != (st.st_mtime_ns, st.st_size):
+        return False
+    return all(os.path.isfile(os.path.join(derived_dir, name)) for name in derived_files(entry))
+
+
+def derived_files(entry):
+    """Nombres (dentro de DERIVED_FOLDER) de los derivados de una entrada."""
+    return [entry[kind]["url"].split("?")[0].rsplit("/", 1)[1] for kind in ("webp", "jpeg") if kind in entry]
+
+
+def prune_derivatives(derived_dir, keep):
+    """Borra los derivados que ya no usa ninguna entrada (imágenes eliminadas o reemplazadas)."""
+    if not os.path.isdir(derived_dir):
+        return
+    for name in os.listdir(derived_dir):
+        if name not in keep:
+            os.remove(os.path.join(derived_dir, name))
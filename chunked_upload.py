@@ -0,0 +1,250 @@
+import errno
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+MAX_UPLOAD_BYTES = 1 << 30      # Tamaño máximo de un archivo subido (1 GiB).
+CHUNK_BYTES = 8 << 20           # Tamaño de trozo que se sugiere al cliente.
+MAX_CHUNK_BYTES = 32 << 20      # Un PUT nunca puede traer más que esto.
+READ_BLOCK = 1 << 20            # Se copia del socket al disco en bloques de 1 MiB.
+EXPIRE_AFTER = 24 * 3600        # Subidas sin actividad durante este tiempo se descartan.
+
+
+class UploadError(Exception):
+    """Error de una subida por trozos; 'status' es el código HTTP que debe devolver la ruta."""
+
+    def __init__(self, status, message, **extra):
+        super().__init__(message)
+        self.status = status
+        self.extra = extra
+
+
+class ChunkedUploads:
+    """
+    Subidas por trozos y reanudables.
+    Cada subida escribe en 'work_dir/<id>.part' (mismo sistema de archivos que static/) y guarda su estado en
+    '<id>.json'. Los trozos se copian del cuerpo de la petición directo al archivo mientras se calcula el SHA-256,
+    sin pasar por el archivo temporal de Werkzeug. Si la conexión se corta a mitad de un trozo, lo ya escrito
+    cuenta: el cliente pregunta el offset actual y continúa desde ahí. Al completarse, el archivo se mueve con
+    os.replace() a su carpeta final, así nunca se ve un archivo a medio subir.
+    """
+
+    def __init__(self, work_dir, max_size=MAX_UPLOAD_BYTES, expire_after=EXPIRE_AFTER):
+        self.work_dir = work_dir
+        self.max_size = max_size
+        self.expire_after = expire_after
+        self._lock = threading.Lock()
+        self._uploads = {}   # id -> estado (dict); '_hasher' y '_busy' no se guardan en disco
+        os.makedirs(work_dir, exist_ok=True)
+        self._load()
+
+    def create(self, target_dir, filename, size, fingerprint=None, sha256=None, meta=None):
+        """
+        Inicia una subida, o devuelve la existente con la misma huella (mismo archivo del cliente hacia el mismo
+        destino) para reanudarla. 'meta' es un dict libre que se devuelve tal cual con el estado de la subida.
+        """
+        if size < 0:
+            raise UploadError(400, "Tamaño inválido.")
+        if size > self.max_size:
+            raise UploadError(413, f"El archivo excede el máximo de {self.max_size // (1 << 20)} MB.")
+        with self._lock:
+            self._expire()
+            if fingerprint:
+                for upload in self._uploads.values():
+                    if (upload["fingerprint"] == fingerprint and upload["target_dir"] == target_dir
+                            and upload["filename"] == filename and upload["size"] == size):
+                        return self._public(upload)
+            upload = {
+                "id": uuid.uuid4().hex,
+                "target_dir": target_dir,
+                "filename": filename,
+                "size": size,
+                "offset": 0,
+                "fingerprint": fingerprint,
+                "expected_sha256": sha256,
+                "meta": meta or {},
+                "updated": time.time(),
+            }
+            open(self._part_path(upload["id"]), "wb").close()
+            upload["_hasher"] = hashlib.sha256()
+            upload["_busy"] = False
+            self._uploads[upload["id"]] = upload
+            self._save(upload)
+            return self._public(upload)
+
+    def status(self, upload_id):
+        with self._lock:
+            return self._public(self._get(upload_id))
+
+    def write_chunk(self, upload_id, offset, stream, length):
+        """
+        Copia 'length' bytes de 'stream' a partir de 'offset'. Devuelve el estado de la subida; si con este
+        trozo quedó completa, incluye 'path' (ruta final) y 'sha256'.
+        """
+        with self._lock:
+            upload = self._get(upload_id)
+            if upload["_busy"]:
+                raise UploadError(409, "Ya hay un trozo de esta subida en curso.", offset=upload["offset"])
+            if offset != upload["offset"]:
+                raise UploadError(409, "El offset no coincide con lo recibido.", offset=upload["offset"])
+            if length is None or length < 0 or length > MAX_CHUNK_BYTES:
+                raise UploadError(400, f"Cada trozo debe indicar su tamaño y no superar {MAX_CHUNK_BYTES >> 20} MB.")
+            if offset + length > upload["size"]:
+                raise UploadError(413, "El trozo excede el tamaño declarado del archivo.", offset=upload["offset"])
+            upload["_busy"] = True
+            hasher = upload["_hasher"]
+
+        part_path = self._part_path(upload_id)
+        written = 0
+        try:
+            if hasher is None:
+                hasher = self._rehash(part_path, offset)
+            with open(part_path, "r+b") as f:
+                f.seek(offset)
+                while written < length:
+                    block = stream.read(min(READ_BLOCK, length - written))
+                    if not block:
+                        break
+                    f.write(block)
+                    hasher.update(block)
+                    written += len(block)
+                f.truncate()
+        finally:
+            with self._lock:
+                upload["offset"] = offset + written
+                upload["_hasher"] = hasher
+                upload["updated"] = time.time()
+                upload["_busy"] = False
+                # abort() durante el trozo ya la quitó y borró sus archivos: guardarla dejaría un .json huérfano.
+                aborted = self._uploads.get(upload_id) is not upload
+                if not aborted:
+                    self._save(upload)
+            if aborted:
+                # También reemplaza el error de escritura si abort() borró el .part antes de abrirlo.
+                self._discard(upload_id)
+                raise UploadError(410, "La subida se canceló.")
+
+        if written < length:
+            raise UploadError(400, "La conexión se cortó a mitad del trozo.", offset=upload["offset"])
+        if upload["offset"] < upload["size"]:
+            return self._public(upload)
+        return self._finish(upload)
+
+    def abort(self, upload_id):
+        with self._lock:
+            upload = self._uploads.pop(upload_id, None)
+        if upload is not None:
+            self._discard(upload_id)
+
+    def _finish(self, upload):
+        """
+        Publica el archivo completo. La subida sigue registrada (y ocupada) hasta que el os.replace() terminó:
+        si falla, se borran sus archivos y el cliente recibe el error en vez de una subida a medio publicar.
+        """
+        digest = upload["_hasher"].hexdigest()
+        part_path = self._part_path(upload["id"])
+        with self._lock:
+            if self._uploads.get(upload["id"]) is not upload:
+                raise UploadError(410, "La subida se canceló.")
+            if upload["_busy"]:
+                raise UploadError(409, "La subida ya se está completando.", offset=upload["offset"])
+            upload["_busy"] = True
+        if upload["expected_sha256"] and upload["expected_sha256"].lower() != digest:
+            self._forget(upload)
+            raise UploadError(422, "El SHA-256 del archivo recibido no coincide; súbelo de nuevo.", sha256=digest)
+        final_path = os.path.join(upload["target_dir"], upload["filename"])
+        try:
+            with open(part_path, "rb") as f:
+                os.fsync(f.fileno())
+            os.replace(part_path, final_path)
+        except OSError as e:
+            aborted = not self._forget(upload)
+            if aborted:
+                raise UploadError(410, "La subida se canceló.")
+            status = 507 if e.errno == errno.ENOSPC else 500
+            raise UploadError(status, f"No se pudo guardar el archivo recibido: {e.strerror or e}")
+        self._forget(upload)
+        result = self._public(upload)
+        result.update({"complete": True, "path": final_path, "sha256": digest})
+        return result
+
+    def _forget(self, upload):
+        """Quita la subida y borra sus archivos; devuelve False si abort() ya lo había hecho."""
+        with self._lock:
+            registered = self._uploads.get(upload["id"]) is upload
+            if registered:
+                del self._uploads[upload["id"]]
+        self._discard(upload["id"])
+        return registered
+
+    def _get(self, upload_id):
+        upload = self._uploads.get(upload_id)
+        if upload is None:
+            raise UploadError(404, "Subida desconocida o expirada.")
+        return upload
+
+    def _public(self, upload):
+        return {"upload_id": upload["id"], "filename": upload["filename"], "size": upload["size"],
+                "offset": upload["offset"], "chunk_size": CHUNK_BYTES, "meta": upload["meta"], "complete": False}
+
+    def _part_path(self, upload_id):
+        return os.path.join(self.work_dir, f"{upload_id}.part")
+
+    def _meta_path(self, upload_id):
+        return os.path.join(self.work_dir, f"{upload_id}.json")
+
+    def _save(self, upload):
+        meta = {key: value for key, value in upload.items() if not key.startswith("_")}
+        tmp_path = self._meta_path(upload["id"]) + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._meta_path(upload["id"]))
+
+    def _discard(self, upload_id):
+        for path in (self._part_path(upload_id), self._meta_path(upload_id)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _rehash(self, part_path, offset):
+        """Tras un reinicio del servidor el SHA-256 parcial se perdió: se recalcula leyendo lo ya recibido."""
+        hasher = hashlib.sha256()
+        with open(part_path, "rb") as f:
+            remaining = offset
+            while remaining:
+                block = f.read(min(READ_BLOCK, remaining))
+                if not block:
+                    break
+                hasher.update(block)
+                remaining -= len(block)
+        return hasher
+
+    def _load(self):
+        """Recupera las subidas pendientes de una ejecución anterior; el offset real es el tamaño del .part."""
+        for name in os.listdir(self.work_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.work_dir, name)) as f:
+                    upload = json.load(f)
+                upload["offset"] = min(os.path.getsize(self._part_path(upload["id"])), upload["size"])
+            except (OSError, ValueError, KeyError) as e:
+                print(f"UPLOADS WARNING: Se descarta el estado ilegible {name}: {e}")
+                self._discard(name[:-len(".json")])
+                continue
+            upload["_hasher"] = None
+            upload["_busy"] = False
+            self._uploads[upload["id"]] = upload
+        with self._lock:
+            self._expire()
+
+    def _expire(self):
+        cutoff = time.time() - self.expire_after
+        for upload_id, upload in list(self._uploads.items()):
+            if upload["updated"] < cutoff and not upload["_busy"]:
+                del self._uploads[upload_id]
+                self._discard(upload_id)
@@ -0,0 +1,52 @@
+"""
+Reglas de las configuraciones del proceso de detección que se cambian en caliente. Las usan las rutas de
+app.py, para responder 400, y los objetos del proceso de detección antes de aplicar un cambio: un valor
+inválido que llegara a la detección detendría su hilo. No importa OpenCV, así app.py la carga sin demora.
+"""
+
+FALLBACK_POLICIES = ("full_detect", "hold")
+
+# clave -> bool, (tipo, mínimo, máximo) para números, o la tupla de valores permitidos.
+TRACKING_CONFIG_RULES = {
+    "enabled": bool,
+    "full_detect_every": (int, 1, 1000),
+    "search_margin": (float, 0.0, 5.0),
+    "scale_tolerance": (float, 0.0, 0.95),
+    "fallback": FALLBACK_POLICIES,
+    "max_misses": (int, 0, 1000),
+}
+
+MOTION_GATE_CONFIG_RULES = {
+    "enabled": bool,
+    "active_fps": (float, 0.1, 60),      # 0 desactivaría el límite de frecuencia.
+    "idle_fps": (float, 0.1, 60),
+    "downscale_width": (int, 8, 640),
+    "pixel_threshold": (int, 0, 255),
+    "motion_threshold": (float, 0.0, 1.0),
+    "background_alpha": (float, 0.001, 1.0),
+    "idle_after": (float, 0.0, 3600),
+}
+
+
+def validate_config(new_config, rules):
+    """Devuelve una copia de 'new_config' o lanza ValueError si trae una clave desconocida o un valor inválido."""
+    if not isinstance(new_config, dict):
+        raise ValueError("La configuración debe ser un objeto JSON.")
+    for key, value in new_config.items():
+        if key not in rules:
+            raise ValueError(f"Parámetro desconocido: '{key}'.")
+        rule = rules[key]
+        if rule is bool:
+            if not isinstance(value, bool):
+                raise ValueError(f"'{key}' debe ser true o false.")
+        elif isinstance(rule, tuple) and len(rule) == 3 and isinstance(rule[0], type):
+            kind, low, high = rule
+            # bool es subclase de int: true no es un número válido aquí.
+            valid_type = int if kind is int else (int, float)
+            if isinstance(value, bool) or not isinstance(value, valid_type):
+                raise ValueError(f"'{key}' debe ser un número{' entero' if kind is int else ''}.")
+            if not low <= value <= high:
+                raise ValueError(f"'{key}' debe estar entre {low} y {high}.")
+        elif value not in rule:
+            raise ValueError(f"'{key}' inválido: {value}. Permitidos: {', '.join(map(str, rule))}.")
+    return dict(new_config)
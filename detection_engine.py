@@ -0,0 +1,498 @@
+import json
+import os
+import queue
+import threading
+import time
+
+from boot_timing import BootTimer
+from pipeline import LatestValue, RateLimiter, SharedLatestValue
+from face_tracker import FaceTracker
+
+# Motor de detección (cámara -> cascade/TFLite -> vista previa JPEG) que corre en su propio proceso.
+# El proceso web solo lee lo que este publica en memoria compartida (ver DetectionChannels) y le envía
+# órdenes por una multiprocessing.Queue; así la inferencia no compite por el GIL con las peticiones HTTP.
+# OpenCV, numpy y TFLite se importan recién dentro del proceso de detección (import_dependencies),
+# de modo que el proceso web que importa este módulo arranca sin cargarlos.
+
+# --- Configuración de la Detección de Emociones ---
+EMOTION_CONFIRMATION_TIME = 1.5  # Segundos que una emoción debe ser detectada consistentemente para ser válida.
+
+# --- Configuración del pipeline de video (captura -> detección -> codificación) ---
+CAPTURE_MAX_FPS = 30     # La captura drena el buffer V4L2 para que siempre tengamos el frame más nuevo.
+DETECTION_MAX_FPS = 20   # Límite de la etapa de detección (cascade + TFLite) con actividad frente al robot.
+IDLE_DETECTION_FPS = 2   # Frecuencia de detección cuando la escena está quieta (ver motion_gate.py).
+PREVIEW_MAX_FPS = 20     # Límite de la etapa que codifica JPEG para /video_feed.
+FACE_BOX_MAX_AGE = 0.5   # Segundos que el recuadro de la última cara se sigue dibujando en la vista previa.
+# Si es True la cámara se abre en MJPG y el JPEG de la cámara se reenvía tal cual a /video_feed;
+# el recuadro de la cara lo dibuja el navegador a partir de /face_box en lugar de quemarlo en el frame.
+CAMERA_MJPEG_PASSTHROUGH = os.environ.get("CAMERA_MJPEG_PASSTHROUGH", "0") == "1"
+
+# --- Modelo de emociones ---
+# Puede ser el modelo float, el de rango dinámico o el int8 completo generado con modelconvert.py;
+# el tipo de entrada/salida y los parámetros de cuantización se leen del propio modelo.
+EMOTION_MODEL_FILE = os.environ.get("EMOTION_MODEL_FILE", "emotion_model.tflite")
+# Backend de inferencia: "auto" elige hilos/XNNPACK con un auto-benchmark corto al arrancar.
+INFERENCE_NUM_THREADS = os.environ.get("INFERENCE_NUM_THREADS", "auto")
+INFERENCE_XNNPACK = os.environ.get("INFERENCE_XNNPACK", "auto")  # "auto", "1" o "0"
+INFERENCE_WARMUP_RUNS = 3
+
+# --- Configuración de grupos (varias caras frente al robot) ---
+MAX_FACES_PER_BATCH = 4            # Máximo de caras clasificadas en una sola invocación del modelo.
+FACE_SELECTION_POLICY = "largest"  # Qué cara guía la interacción: "largest", "central" o "majority".
+FACE_SELECTION_POLICIES = ("largest", "central", "majority")
+
+# --- Memoria compartida con el proceso web ---
+PREVIEW_SLOT_CAPACITY = 1 << 20    # Parte MJPEG de la vista previa.
+SNAPSHOT_SLOT_CAPACITY = 1 << 20   # JPEG del frame en que se confirmó la última emoción.
+STATE_SLOT_CAPACITY = 64 << 10     # Estado de detección serializado en JSON.
+STATE_HEARTBEAT_SECONDS = 1.0      # Se republica el estado aunque no cambie, para que el web vea al motor vivo.
+
+emotion_labels = ["angry", "disgust", "fear", "happy", "sad", "surprise", "neutral"]
+
+
+class DetectionChannels:
+    """
+    Los tres bloques de memoria compartida entre el proceso web y el de detección.
+    El proceso web los crea (names=None) y pasa 'names' al proceso hijo, que se conecta a los mismos.
+    """
+
+    def __init__(self, names=None):
+        create = names is None
+        names = names or {}
+        self.preview = SharedLatestValue(names.get("preview"), PREVIEW_SLOT_CAPACITY, create)
+        self.snapshot = SharedLatestValue(names.get("snapshot"), SNAPSHOT_SLOT_CAPACITY, create)
+        self.state = SharedLatestValue(names.get("state"), STATE_SLOT_CAPACITY, create)
+
+    @property
+    def names(self):
+        return {"preview": self.preview.name, "snapshot": self.snapshot.name, "state": self.state.name}
+
+    def close(self, unlink=False):
+        for slot in (self.preview, self.snapshot, self.state):
+            slot.close()
+            if unlink:
+                slot.unlink()
+
+
+# -- Estado del motor (solo existe dentro del proceso de detección) --
+raw_frame_slot = LatestValue()   # (frame BGR, timestamp) publicado por la etapa de captura.
+face_box_slot = LatestValue()    # (x, y, w, h, timestamp) o None, publicado por la etapa de detección.
+preview_frame_size = (320, 240)  # (ancho, alto) real de los frames, para escalar el recuadro en el navegador.
+paused = False                   # El proceso web pidió un reinicio y aún no recargó el kiosco.
+preview_viewers = 0              # Clientes de /video_feed en el proceso web; sin clientes no se codifica.
+detection_seq = 0                # Se incrementa en cada emoción confirmada.
+detected_emotion = "neutral"
+state_publish_lock = threading.Lock()
+# Las órdenes que tocan el seguidor de caras, el control por movimiento o la confirmación de emociones se
+# aplican en el propio hilo de detección, entre dos frames, para no cambiarlos a mitad de detect().
+pending_commands = queue.Queue()
+DETECTION_THREAD_COMMANDS = ("reset", "face_tracking", "motion_gate", "face_selection_policy")
+
+# --- Estado para el proceso de confirmación de emoción ---
+confirming_emotion = None
+emotion_confirmation_start_time = None
+
+face_cascade = None
+face_tracker = None
+motion_gate = None
+interpreter = None
+engine_ready = False             # Cascade y modelo cargados; hasta entonces el estado dice "warming_up".
+boot_timer = None
+
+
+def import_dependencies():
+    """Importa OpenCV, numpy y los módulos que dependen de ellos (solo en el proceso de detección)."""
+    global cv2, np, MotionGate, EmotionPreprocessor, dequantize
+    import cv2
+    import numpy as np
+    from motion_gate import MotionGate
+    from emotion_preprocess import EmotionPreprocessor, dequantize
+
+def load_cascade():
+    global face_cascade
+    try:
+        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+        if face_cascade.empty():
+            print("CRITICAL ERROR: Cascade Classifier not loaded.")
+    except Exception as e:
+        print(f"CRITICAL ERROR loading Cascade Classifier: {e}")
+        face_cascade = None
+    face_tracker.cascade = face_cascade
+
+def load_model():
+    global interpreter
+    global input_details, output_details, model_input_h, model_input_w
+    global emotion_preprocessor, output_quantization, emotion_batch_size, batched_inference_supported
+
+    interpreter = None
+    try:
+        # tflite_runtime se importa aquí, en paralelo con la apertura de la cámara y el cascade.
+        from inference_backend import load_interpreter
+        model_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), EMOTION_MODEL_FILE)
+        interpreter = load_interpreter(
+            model_path,
+            num_threads=INFERENCE_NUM_THREADS,
+            use_xnnpack=INFERENCE_XNNPACK if INFERENCE_XNNPACK == "auto" else INFERENCE_XNNPACK == "1",
+            warmup_runs=INFERENCE_WARMUP_RUNS
+        )
+        input_details = interpreter.get_input_details()
+        output_details = interpreter.get_output_details()
+        model_input_h, model_input_w = input_details[0]['shape'][1:3]
+        # Buffer de lote reutilizado entre frames; se usa una vista [:n] según cuántas caras haya.
+        emotion_preprocessor = EmotionPreprocessor(
+            model_input_h, model_input_w, MAX_FACES_PER_BATCH,
+            dtype=input_details[0]['dtype'], quantization=input_details[0]['quantization']
+        )
+        output_quantization = output_details[0]['quantization']
+        emotion_batch_size = 1
+        batched_inference_supported = True
+        print(f"TFLite model '{EMOTION_MODEL_FILE}' loaded successfully "
+              f"(input {input_details[0]['dtype'].__name__}, output {output_details[0]['dtype'].__name__}).")
+    except Exception as e:
+        print(f"CRITICAL ERROR: Failed to load TFLite model: {e}")
+        interpreter = None
+
+
+def resize_emotion_batch(n):
+    """Ajusta la dimensión de lote del tensor de entrada solo cuando cambia el número de caras."""
+    global emotion_batch_size, input_details, output_details
+    if n == emotion_batch_size:
+        return
+    # Si resize_tensor_input() o allocate_tensors() fallan, el tensor puede haber quedado con otro tamaño:
+    # con el tamaño desconocido, el próximo llamado (p. ej. la vuelta a 1) siempre redimensiona.
+    emotion_batch_size = None
+    interpreter.resize_tensor_input(input_details[0]['index'], [n, model_input_h, model_input_w, 1])
+    interpreter.allocate_tensors()
+    input_details = interpreter.get_input_details()
+    output_details = interpreter.get_output_details()
+    emotion_batch_size = n
+
+def predict_emotions_tflite(gray, faces):
+    """
+    Clasifica todas las caras en una sola invocación del intérprete.
+    Recibe el frame en gris ya usado por el cascade y las cajas (x, y, w, h). Devuelve una etiqueta por caja.
+    """
+    global batched_inference_supported
+    if interpreter is None or not len(faces): return ["neutral"] * len(faces)
+    faces = list(faces)[:MAX_FACES_PER_BATCH]
+    batch = emotion_preprocessor.fill(gray, faces)
+    n = len(batch)
+    if n == 0: return ["neutral"] * len(faces)
+
+    preds = None
+    if batched_inference_supported or n == 1:
+        try:
+            resize_emotion_batch(n)
+            interpreter.set_tensor(input_details[0]['index'], batch)
+            interpreter.invoke()
+            preds = dequantize(interpreter.get_tensor(output_details[0]['index']), output_quantization)
+        except (RuntimeError, ValueError) as e:
+            # Modelos con lote fijo en 1: a partir de aquí se clasifica cada cara por separado.
+            print(f"DETECTION WARNING: Batched inference not supported ({e}), using one invoke per face.")
+            batched_inference_supported = False
+    if preds is None:
+        resize_emotion_batch(1)
+        preds = []
+        for slot in range(n):
+            interpreter.set_tensor(input_details[0]['index'], batch[slot:slot+1])
+            interpreter.invoke()
+            preds.append(dequantize(interpreter.get_tensor(output_details[0]['index'])[0], output_quantization))
+
+    return [emotion_labels[int(np.argmax(p))] for p in preds]
+
+def predict_emotion_tflite(face_roi):
+    if face_roi is None or face_roi.size == 0: return "neutral"
+    gray_face = cv2.cvtColor(face_roi, cv2.COLOR_BGR2GRAY)
+    return predict_emotions_tflite(gray_face, [(0, 0, gray_face.shape[1], gray_face.shape[0])])[0]
+
+def select_interaction_face(faces, emotions, frame_shape):
+    """
+    Elige qué cara guía la interacción según FACE_SELECTION_POLICY.
+    Devuelve: ((x, y, w, h), emoción).
+    """
+    def area(i): return faces[i][2] * faces[i][3]
+
+    if FACE_SELECTION_POLICY == "central":
+        cx, cy = frame_shape[1] / 2, frame_shape[0] / 2
+        idx = min(range(len(faces)), key=lambda i: (faces[i][0] + faces[i][2] / 2 - cx) ** 2 + (faces[i][1] + faces[i][3] / 2 - cy) ** 2)
+    elif FACE_SELECTION_POLICY == "majority":
+        counts = {}
+        for emotion in emotions:
+            counts[emotion] = counts.get(emotion, 0) + 1
+        # En empate gana la emoción de la cara más grande.
+        winner = max(counts, key=lambda e: (counts[e], max(area(i) for i in range(len(faces)) if emotions[i] == e)))
+        idx = max((i for i in range(len(faces)) if emotions[i] == winner), key=area)
+    else:
+        idx = max(range(len(faces)), key=area)
+    return tuple(faces[idx]), emotions[idx]
+
+# En modo passthrough la captura entrega el JPEG comprimido de la cámara en lugar de un frame BGR.
+# El backend V4L2 lo devuelve como array uint8 de forma (1, N) y otros backends como (N,): cualquier
+# array con menos de 3 dimensiones es un JPEG.
+def is_compressed(frame):
+    return frame.ndim < 3
+
+def frame_to_gray(frame):
+    if is_compressed(frame):
+        return cv2.imdecode(frame.reshape(-1), cv2.IMREAD_GRAYSCALE)
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+def frame_to_jpeg(frame):
+    if is_compressed(frame):
+        return frame.tobytes()
+    ret_jpeg, jpeg_frame = cv2.imencode('.jpg', frame)
+    return jpeg_frame.tobytes() if ret_jpeg else None
+
+def current_face_box():
+    """Devuelve (x, y, w, h) de la cara que guía la interacción si es reciente, o None."""
+    _, box = face_box_slot.peek()
+    if box is None or time.time() - box[4] > FACE_BOX_MAX_AGE:
+        return None
+    return tuple(int(v) for v in box[:4])
+
+def capture_loop():
+    """Etapa 1: lee la cámara continuamente y publica solo el frame más reciente."""
+    with boot_timer.phase("camera"):
+        cap = cv2.VideoCapture(0)
+        if not cap.isOpened():
+            print("CRITICAL: Camera not accessible.")
+            return
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 320)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 240)
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        if CAMERA_MJPEG_PASSTHROUGH:
+            cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+            cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+            print("CAMERA: MJPEG passthrough enabled.")
+
+    limiter = RateLimiter(CAPTURE_MAX_FPS)
+    first_frame = True
+    while True:
+        limiter.wait()
+        ret, frame = cap.read()
+        if not ret:
+            time.sleep(1)
+            continue
+        if first_frame:
+            boot_timer.mark("first_frame")
+            first_frame = False
+        raw_frame_slot.put((frame, time.time()))
+
+def detection_state():
+    """Estado que el proceso web lee de la memoria compartida."""
+    _, box = face_box_slot.peek()
+    return {
+        "face_box": [int(v) for v in box[:4]] if box else None,
+        "face_box_time": box[4] if box else None,
+        "frame_size": list(preview_frame_size),
+        "detection_seq": detection_seq,
+        "emotion": detected_emotion,
+        "motion_gate": motion_gate.status(),
+        "face_tracking": dict(face_tracker.config),
+        "face_selection_policy": FACE_SELECTION_POLICY,
+        "model_loaded": interpreter is not None,
+        "engine": {"status": "ready" if engine_ready else "warming_up", "boot": boot_timer.report()},
+    }
+
+def publish_state(channels):
+    # SharedLatestValue admite un solo escritor: el hilo de detección y el de órdenes se turnan.
+    with state_publish_lock:
+        channels.state.put(json.dumps(detection_state()).encode())
+
+def detection_loop(channels):
+    """Etapa 2: detección de cara y emoción sobre el frame más reciente disponible."""
+    global detected_emotion, detection_seq
+    global confirming_emotion, emotion_confirmation_start_time, preview_frame_size
+
+    limiter = RateLimiter(DETECTION_MAX_FPS)
+    last_seq = 0
+    last_state_time = 0.0
+    while True:
+        if apply_pending_commands():
+            publish_state(channels)
+            last_state_time = time.monotonic()
+        limiter.set_rate(motion_gate.current_fps)
+        limiter.wait()
+        if time.monotonic() - last_state_time >= STATE_HEARTBEAT_SECONDS:
+            publish_state(channels)
+            last_state_time = time.monotonic()
+        if paused:
+            continue
+
+        last_seq, item = raw_frame_slot.get(last_seq, timeout=1.0)
+        if item is None:
+            continue
+        frame, _ = item
+
+        gray = frame_to_gray(frame)
+        if gray is None:
+            continue
+        preview_frame_size = (gray.shape[1], gray.shape[0])
+        motion_gate.update(gray)
+        faces = face_tracker.detect(gray)
+        motion_gate.report_faces(len(faces))
+        previous_box = current_face_box()
+
+        if len(faces) > 0:
+            faces = sorted(faces, key=lambda f: f[2] * f[3], reverse=True)[:MAX_FACES_PER_BATCH]
+            emotions = predict_emotions_tflite(gray, faces)
+            (x, y, w, h), current_emotion_reading = select_interaction_face(faces, emotions, gray.shape)
+            face_box_slot.put((x, y, w, h, time.time()))
+
+            if current_emotion_reading == confirming_emotion:
+                if time.time() - emotion_confirmation_start_time >= EMOTION_CONFIRMATION_TIME:
+                    print(f"DETECTION: Emotion '{confirming_emotion}' confirmed for {EMOTION_CONFIRMATION_TIME}s.")
+                    detected_emotion = confirming_emotion
+                    # El snapshot se publica antes que el estado: cuando el web ve el nuevo detection_seq
+                    # el JPEG correspondiente ya está disponible.
+                    channels.snapshot.put(frame_to_jpeg(frame) or b"")
+                    detection_seq += 1
+                    confirming_emotion = None
+                    emotion_confirmation_start_time = None
+            else:
+                print(f"DETECTION: New candidate emotion: '{current_emotion_reading}'. Starting timer...")
+                confirming_emotion = current_emotion_reading
+                emotion_confirmation_start_time = time.time()
+        else:
+            face_box_slot.put(None)
+            if confirming_emotion is not None:
+                print("DETECTION: Face lost. Resetting confirmation state.")
+            confirming_emotion = None
+            emotion_confirmation_start_time = None
+
+        # El recuadro cambia en casi todos los frames con cara; sin cara solo se publica la transición.
+        if len(faces) > 0 or previous_box is not None:
+            publish_state(channels)
+            last_state_time = time.monotonic()
+
+def encode_loop(channels):
+    """Etapa 3: codifica la vista previa JPEG con el último recuadro de cara conocido."""
+    limiter = RateLimiter(PREVIEW_MAX_FPS)
+    last_seq = 0
+    while True:
+        limiter.wait()
+        # Sin clientes en /video_feed no se codifica nada.
+        if paused or preview_viewers == 0:
+            continue
+
+        last_seq, item = raw_frame_slot.get(last_seq, timeout=1.0)
+        if item is None:
+            continue
+        frame, _ = item
+
+        if not is_compressed(frame):
+            box = current_face_box()
+            if box is not None:
+                x, y, w, h = box
+                frame = frame.copy()
+                cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
+
+        jpeg = frame_to_jpeg(frame)
+        if jpeg:
+            # La parte multipart se arma una sola vez y se comparte entre todos los clientes.
+            part = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n'
+            try:
+                channels.preview.put(part)
+            except ValueError as e:
+                print(f"PREVIEW WARNING: {e}")
+
+def apply_command(command, value):
+    """Órdenes del proceso web: ("paused", bool), ("viewers", n), ("reset", None), ("face_tracking", cfg),
+    ("motion_gate", cfg) y ("face_selection_policy", política)."""
+    global paused, preview_viewers, FACE_SELECTION_POLICY, confirming_emotion, emotion_confirmation_start_time
+    if command == "paused":
+        paused = value
+    elif command == "viewers":
+        preview_viewers = value
+    elif command == "reset":
+        confirming_emotion, emotion_confirmation_start_time = None, None
+        face_tracker.reset()
+    elif command == "face_tracking":
+        face_tracker.update_config(value)
+        print(f"CONFIG: Nueva configuración de seguimiento de caras: {face_tracker.config}")
+    elif command == "motion_gate":
+        motion_gate.update_config(value)
+        print(f"CONFIG: Nueva configuración del control por movimiento: {motion_gate.config}")
+    elif command == "face_selection_policy":
+        FACE_SELECTION_POLICY = value
+    else:
+        print(f"DETECTION WARNING: Orden desconocida '{command}'.")
+
+def apply_pending_commands():
+    """Aplica en el hilo de detección las órdenes encoladas por command_loop. Devuelve True si hubo alguna."""
+    applied = False
+    while True:
+        try:
+            command, value = pending_commands.get_nowait()
+        except queue.Empty:
+            return applied
+        applied = True
+        try:
+            apply_command(command, value)
+        except Exception as e:
+            # Una configuración inválida no puede detener la detección.
+            print(f"DETECTION WARNING: Orden '{command}' rechazada: {e}")
+
+def exit_worker(reason):
+    """Termina el proceso de detección de inmediato; el sistema libera la cámara y la memoria compartida."""
+    print(f"DETECTION WORKER: {reason} Saliendo.")
+    os._exit(0)
+
+def command_loop(commands, channels, parent_pid):
+    while True:
+        # Si el proceso web murió (SIGKILL, OOM) nadie más cierra este proceso, y seguiría ocupando
+        # /dev/video0: el proceso web que serve.py reinicia no podría abrir la cámara.
+        if os.getppid() != parent_pid:
+            exit_worker("El proceso web terminó.")
+        try:
+            command, value = commands.get(timeout=STATE_HEARTBEAT_SECONDS)
+        except queue.Empty:
+            continue
+        except (EOFError, BrokenPipeError, ConnectionResetError) as e:
+            exit_worker(f"Se cerró la cola de órdenes ({e!r}).")
+        if command in DETECTION_THREAD_COMMANDS:
+            # El hilo de detección publica el estado después de aplicarla.
+            pending_commands.put((command, value))
+            continue
+        apply_command(command, value)
+        publish_state(channels)
+
+def run_worker(channel_names, commands):
+    """Punto de entrada del proceso de detección."""
+    global boot_timer, face_tracker, motion_gate, engine_ready
+    boot_timer = BootTimer("detection", origin=time.monotonic())
+    parent_pid = os.getppid()
+    channels = DetectionChannels(channel_names)
+    with boot_timer.phase("imports"):
+        import_dependencies()
+
+    # Detecta con el cascade completo cada N frames y sigue las caras en una región reducida entre medio.
+    # El cascade se asigna en load_cascade().
+    face_tracker = FaceTracker(None, scale_factor=1.1, min_neighbors=5, min_size=(60, 60))
+    # Baja la frecuencia de detección cuando no hay movimiento ni caras frente al robot.
+    motion_gate = MotionGate({"active_fps": DETECTION_MAX_FPS, "idle_fps": IDLE_DETECTION_FPS})
+    publish_state(channels)
+
+    # Cámara, cascade y modelo se inicializan a la vez; la vista previa funciona antes de que carguen los modelos.
+    threading.Thread(target=command_loop, args=(commands, channels, parent_pid), daemon=True).start()
+    threading.Thread(target=capture_loop, daemon=True).start()
+    threading.Thread(target=encode_loop, args=(channels,), daemon=True).start()
+    loaders = []
+    for label, target in (("cascade", load_cascade), ("model", load_model)):
+        def run(label=label, target=target):
+            with boot_timer.phase(label):
+                target()
+        loader = threading.Thread(target=run, daemon=True)
+        loader.start()
+        loaders.append(loader)
+    for loader in loaders:
+        while loader.is_alive():
+            loader.join(STATE_HEARTBEAT_SECONDS)
+            publish_state(channels)
+
+    engine_ready = True
+    boot_timer.mark("ready")
+    print(boot_timer.summary())
+    publish_state(channels)
+    print("DETECTION WORKER: Capture/detection/encode pipeline running.")
+    detection_loop(channels)
@@ -0,0 +1,67 @@
+import cv2
+import numpy as np
+
+
+class EmotionPreprocessor:
+    """
+    Prepara las caras para el modelo de emociones sin crear arrays temporales por frame.
+    Reutiliza el frame en gris que ya se calculó para el cascade, redimensiona cada cara
+    directamente en un buffer fijo y normaliza con una sola operación en el lugar.
+    Si el modelo es cuantizado (int8/uint8), la normalización y la cuantización se combinan
+    en la misma escala: q = pixel / 255 / scale + zero_point.
+    """
+
+    def __init__(self, input_h, input_w, max_batch, dtype=np.float32, quantization=(0.0, 0)):
+        self.input_h = int(input_h)
+        self.input_w = int(input_w)
+        self.max_batch = max_batch
+        self.dtype = np.dtype(dtype)
+        self.batch = np.empty((max_batch, self.input_h, self.input_w, 1), dtype=self.dtype)
+        self._resized = np.empty((self.input_h, self.input_w), dtype=np.uint8)
+
+        scale, zero_point = quantization
+        self.quantized = self.dtype != np.float32 and scale > 0
+        if self.quantized:
+            info = np.iinfo(self.dtype)
+            self._q_min, self._q_max = info.min, info.max
+            self._q_factor = 1.0 / (255.0 * scale)
+            self._q_zero_point = float(zero_point)
+            self._scratch = np.empty((self.input_h, self.input_w), dtype=np.float32)
+
+    def fill(self, gray, boxes):
+        """
+        Copia hasta 'max_batch' caras (x, y, w, h) del frame gris al buffer, ya normalizadas
+        (o cuantizadas) en el formato de entrada del modelo.
+        Devuelve: la vista del buffer con las caras cargadas (sin copia).
+        """
+        n = 0
+        for (x, y, w, h) in boxes[:self.max_batch]:
+            face = gray[y:y+h, x:x+w]
+            if face.size == 0:
+                # Se mantiene la posición para que cada caja siga alineada con su predicción.
+                self.batch[n].fill(self._q_zero_point if self.quantized else 0.0)
+            else:
+                cv2.resize(face, (self.input_w, self.input_h), dst=self._resized)
+                if self.quantized:
+                    self._quantize_into(self.batch[n, :, :, 0])
+                else:
+                    # Conversión uint8 -> float32 y división en un solo paso, escribiendo en el buffer.
+                    np.multiply(self._resized, 1.0 / 255.0, out=self.batch[n, :, :, 0], casting="unsafe")
+            n += 1
+        return self.batch[:n]
+
+    def _quantize_into(self, out):
+        s = self._scratch
+        np.multiply(self._resized, self._q_factor, out=s, casting="unsafe")
+        s += self._q_zero_point
+        np.rint(s, out=s)
+        np.clip(s, self._q_min, self._q_max, out=s)
+        np.copyto(out, s, casting="unsafe")
+
+
+def dequantize(values, quantization):
+    """Convierte la salida int8/uint8 del modelo a float usando (scale, zero_point)."""
+    scale, zero_point = quantization
+    if scale <= 0:
+        return values
+    return (values.astype(np.float32) - zero_point) * scale
@@ -0,0 +1,77 @@
+import collections
+import itertools
+import json
+import threading
+import time
+
+
+class EventLog:
+    """
+    Registro en memoria de los eventos de interacción con números de secuencia crecientes.
+    Cada consumidor (pantalla del kiosco, panel de operador, petición reintentada) guarda su propio
+    cursor y lee "todo lo posterior a seq N"; leer nunca modifica el estado compartido.
+    Se retienen como máximo 'max_events' eventos; un consumidor que se quedó más atrás recibe gap=True
+    y debe resincronizarse con una foto del estado actual.
+    Los valores que solo importan en su versión más reciente (p. ej. el recuadro de la cara, que cambia en
+    casi cada frame) se publican con publish_latest(): no ocupan lugar en el registro ni avanzan la secuencia,
+    así no desplazan a los eventos de interacción; cada consumidor recibe solo el último valor.
+    """
+
+    def __init__(self, max_events=1000):
+        self._cond = threading.Condition()
+        self._events = collections.deque(maxlen=max_events)
+        self._seq = 0
+        self._latest = {}          # tipo -> (versión, dato)
+        self._latest_version = 0
+
+    @property
+    def last_seq(self):
+        with self._cond:
+            return self._seq
+
+    def publish(self, event_type, data=None):
+        with self._cond:
+            self._seq += 1
+            self._events.append({"seq": self._seq, "type": event_type, "data": data, "time": time.time()})
+            self._cond.notify_all()
+            return self._seq
+
+    def publish_latest(self, event_type, data=None):
+        with self._cond:
+            self._latest_version += 1
+            self._latest[event_type] = (self._latest_version, data)
+            self._cond.notify_all()
+
+    def latest_after(self, version):
+        """Devuelve ({tipo: dato}, versión actual) con los valores de publish_latest() posteriores a 'version'."""
+        with self._cond:
+            changed = {event_type: data for event_type, (v, data) in self._latest.items() if v > version}
+            return changed, self._latest_version
+
+    def wait(self, after, latest_after, timeout):
+        """Espera hasta que haya eventos posteriores a 'after' o valores más nuevos que 'latest_after'."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > after or self._latest_version > latest_after, timeout=timeout)
+
+    def read_after(self, after, timeout=None):
+        """
+        Devuelve (eventos, last_seq, gap) con los eventos de secuencia mayor que 'after'.
+        Si 'timeout' no es None, espera hasta ese tiempo a que llegue alguno (long-poll).
+        """
+        with self._cond:
+            if timeout:
+                self._cond.wait_for(lambda: self._seq > after, timeout=timeout)
+            if after >= self._seq:
+                # 'after' mayor que la secuencia actual: el cursor es de una ejecución anterior del servidor.
+                return [], self._seq, after > self._seq
+            oldest = self._events[0]["seq"] if self._events else self._seq + 1
+            if after + 1 < oldest:
+                return [], self._seq, True
+            # Las secuencias son contiguas, así que el primer evento pendiente se ubica por índice.
+            events = list(itertools.islice(self._events, after + 1 - oldest, None))
+            return events, self._seq, False
+
+
+def format_sse(event_type, data, event_id=None):
+    prefix = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{prefix}event: {event_type}\ndata: {json.dumps(data)}\n\n"
@@ -0,0 +1,109 @@
+from detection_config import TRACKING_CONFIG_RULES, validate_config
+
+# Valores por defecto del modo "detectar y seguir".
+DEFAULT_TRACKING_CONFIG = {
+    "enabled": True,
+    "full_detect_every": 5,      # Cada cuántos frames se corre el cascade sobre el frame completo.
+    "search_margin": 0.5,        # Margen alrededor de la última cara (fracción de su tamaño) donde se busca.
+    "scale_tolerance": 0.25,     # Variación de tamaño permitida respecto a la última cara (±25%).
+    "fallback": "full_detect",   # "full_detect": si se pierde la cara se corre el cascade completo en el mismo frame.
+                                 # "hold": se mantiene el último recuadro hasta 'max_misses' frames seguidos.
+    "max_misses": 3
+}
+
+
+class FaceTracker:
+    """
+    Sigue las caras entre detecciones completas del Haar cascade.
+    En lugar de correr detectMultiScale sobre todo el frame en cada iteración, busca cada cara
+    solo en una región alrededor de su última posición y en un rango estrecho de escalas.
+    El cascade completo se corre cada 'full_detect_every' frames o cuando el seguimiento falla.
+    """
+
+    def __init__(self, cascade, config=None, scale_factor=1.1, min_neighbors=5, min_size=(60, 60)):
+        self.cascade = cascade
+        self.config = dict(DEFAULT_TRACKING_CONFIG)
+        if config:
+            self.config.update(config)
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+        self.reset()
+
+    def reset(self):
+        self.boxes = []
+        self.frames_since_full = 0
+        self.misses = 0
+
+    def update_config(self, new_config):
+        self.config.update(validate_config(new_config, TRACKING_CONFIG_RULES))
+        self.reset()
+
+    def detect(self, gray):
+        """
+        Devuelve la lista de caras (x, y, w, h) para el frame en escala de grises.
+        """
+        self.frames_since_full += 1
+        if (not self.config["enabled"] or not self.boxes
+                or self.frames_since_full >= self.config["full_detect_every"]):
+            return self._full_detect(gray)
+
+        tracked = []
+        lost = []
+        for box in self.boxes:
+            found = self._search_around(gray, box)
+            if found is not None:
+                tracked.append(found)
+            else:
+                lost.append(box)
+
+        if not lost:
+            self.misses = 0
+            self.boxes = tracked
+            return tracked
+
+        if self.config["fallback"] == "full_detect":
+            return self._full_detect(gray)
+
+        self.misses += 1
+        if self.misses > self.config["max_misses"]:
+            return self._full_detect(gray)
+        self.boxes = tracked + lost
+        return self.boxes
+
+    def _full_detect(self, gray):
+        faces = self.cascade.detectMultiScale(
+            gray, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors, minSize=self.min_size
+        )
+        self.boxes = [tuple(int(v) for v in f) for f in faces]
+        self.frames_since_full = 0
+        self.misses = 0
+        return self.boxes
+
+    def _search_around(self, gray, box):
+        x, y, w, h = box
+        frame_h, frame_w = gray.shape[:2]
+        margin = int(self.config["search_margin"] * max(w, h))
+        x0, y0 = max(0, x - margin), max(0, y - margin)
+        x1, y1 = min(frame_w, x + w + margin), min(frame_h, y + h + margin)
+        roi = gray[y0:y1, x0:x1]
+
+        tol = self.config["scale_tolerance"]
+        min_side = max(self.min_size[0], int(min(w, h) * (1 - tol)))
+        max_side = int(max(w, h) * (1 + tol))
+        if roi.shape[0] < min_side or roi.shape[1] < min_side or max_side < min_side:
+            return None
+
+        faces = self.cascade.detectMultiScale(
+            roi, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors,
+            minSize=(min_side, min_side), maxSize=(max_side, max_side)
+        )
+        if len(faces) == 0:
+            return None
+
+        # Si hay varias candidatas, se queda con la más cercana al centro anterior.
+        cx, cy = x + w / 2, y + h / 2
+        fx, fy, fw, fh = min(
+            faces, key=lambda f: (x0 + f[0] + f[2] / 2 - cx) ** 2 + (y0 + f[1] + f[3] / 2 - cy) ** 2
+        )
+        return (int(x0 + fx), int(y0 + fy), int(fw), int(fh))
@@ -0,0 +1,101 @@
+import os
+import time
+import numpy as np
+import tflite_runtime.interpreter as tflite
+
+# Combinaciones que prueba el auto-ajuste: hilos x XNNPACK.
+AUTOTUNE_THREADS = (1, 2, 4)
+AUTOTUNE_XNNPACK = (True, False)
+AUTOTUNE_RUNS = 30
+
+
+def create_interpreter(model_path, num_threads=None, use_xnnpack=True, warmup_runs=0):
+    """
+    Crea el intérprete TFLite con el número de hilos y el delegado elegidos y hace
+    'warmup_runs' invocaciones de calentamiento para pagar la inicialización al arrancar.
+    """
+    kwargs = {"model_path": model_path}
+    if num_threads:
+        kwargs["num_threads"] = num_threads
+    try:
+        if not use_xnnpack:
+            # XNNPACK se aplica por defecto en tflite_runtime; este resolver lo desactiva.
+            kwargs["experimental_op_resolver_type"] = tflite.OpResolverType.BUILTIN_WITHOUT_DEFAULT_DELEGATES
+        interpreter = tflite.Interpreter(**kwargs)
+    except (TypeError, AttributeError) as e:
+        # Versiones antiguas de tflite_runtime sin 'num_threads' o sin selección de resolver.
+        dropped = [f"num_threads={num_threads}"] if num_threads else []
+        if not use_xnnpack:
+            dropped.append("xnnpack=False")
+        print(f"INFERENCE WARNING: This tflite_runtime ignores {', '.join(dropped) or 'the backend options'} ({e}); "
+              f"falling back to its defaults.")
+        interpreter = tflite.Interpreter(model_path=model_path)
+    interpreter.allocate_tensors()
+    warmup(interpreter, warmup_runs)
+    return interpreter
+
+
+def warmup(interpreter, runs):
+    if runs <= 0:
+        return
+    inp = interpreter.get_input_details()[0]
+    interpreter.set_tensor(inp['index'], np.zeros(inp['shape'], dtype=inp['dtype']))
+    for _ in range(runs):
+        interpreter.invoke()
+
+
+def benchmark(interpreter, runs=AUTOTUNE_RUNS):
+    """Devuelve la latencia media en ms de 'runs' invocaciones."""
+    start = time.perf_counter()
+    for _ in range(runs):
+        interpreter.invoke()
+    return (time.perf_counter() - start) / runs * 1000
+
+
+def clamp_threads(threads):
+    """Más hilos que núcleos solo agrega cambios de contexto: se limita a os.cpu_count()."""
+    max_threads = os.cpu_count() or 1
+    if threads > max_threads:
+        print(f"INFERENCE WARNING: threads={threads} exceeds the {max_threads} available CPUs, using {max_threads}.")
+        return max_threads
+    return threads
+
+
+def autotune(model_path, warmup_runs=3, threads_options=AUTOTUNE_THREADS, xnnpack_options=AUTOTUNE_XNNPACK):
+    """
+    Prueba cada combinación de hilos/XNNPACK con un auto-benchmark corto y devuelve
+    (intérprete, num_threads, use_xnnpack, ms) de la más rápida.
+    """
+    max_threads = os.cpu_count() or 1
+    best = None
+    for threads in sorted({min(t, max_threads) for t in threads_options}):
+        for xnnpack in xnnpack_options:
+            try:
+                interpreter = create_interpreter(model_path, threads, xnnpack, warmup_runs)
+            except Exception as e:
+                print(f"INFERENCE: threads={threads} xnnpack={xnnpack} failed: {e}")
+                continue
+            ms = benchmark(interpreter)
+            print(f"INFERENCE: threads={threads} xnnpack={xnnpack} -> {ms:.2f} ms/invoke")
+            if best is None or ms < best[3]:
+                best = (interpreter, threads, xnnpack, ms)
+    if best is None:
+        raise RuntimeError("Ninguna configuración del intérprete pudo crearse.")
+    return best
+
+
+def load_interpreter(model_path, num_threads="auto", use_xnnpack="auto", warmup_runs=3):
+    """
+    Punto de entrada para app.py. 'num_threads' y 'use_xnnpack' aceptan "auto" para elegir
+    la configuración más rápida con autotune(); cualquier otro valor se usa tal cual.
+    """
+    if num_threads == "auto" or use_xnnpack == "auto":
+        threads_options = AUTOTUNE_THREADS if num_threads == "auto" else (clamp_threads(int(num_threads)),)
+        xnnpack_options = AUTOTUNE_XNNPACK if use_xnnpack == "auto" else (bool(use_xnnpack),)
+        interpreter, threads, xnnpack, ms = autotune(model_path, warmup_runs, threads_options, xnnpack_options)
+        print(f"INFERENCE: Selected threads={threads} xnnpack={xnnpack} ({ms:.2f} ms/invoke).")
+        return interpreter
+    num_threads = clamp_threads(int(num_threads))
+    interpreter = create_interpreter(model_path, num_threads, bool(use_xnnpack), warmup_runs)
+    print(f"INFERENCE: Using threads={num_threads} xnnpack={use_xnnpack}, {warmup_runs} warm-up invokes.")
+    return interpreter
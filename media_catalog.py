@@ -0,0 +1,108 @@
+import os
+import random
+import threading
+import time
+
+
+class MediaCatalog:
+    """
+    Índice en memoria de las carpetas de medios dentro de static/ (video, video_upload, audio/<emoción>,
+    carousel_images, special), compartido por app.py y upload_server.py.
+    Cada carpeta se escanea una sola vez; después solo se comprueba el mtime del directorio como máximo
+    cada 'check_interval' segundos para detectar cambios hechos por otro proceso. El proceso que sube o
+    borra archivos actualiza el índice de forma incremental con add()/remove().
+    """
+
+    def __init__(self, static_folder, check_interval=2.0):
+        self.static_folder = static_folder
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._folders = {}
+
+    def files(self, folder, extensions=None):
+        """Lista ordenada de archivos de 'folder' (relativo a static/), opcionalmente filtrada por extensión."""
+        with self._lock:
+            entry = self._entry(folder)
+            return list(self._filtered(entry, extensions))
+
+    def random_choice(self, folder, extensions=None):
+        """Devuelve un archivo al azar de 'folder' o None si está vacía, sin recorrer el directorio."""
+        with self._lock:
+            entry = self._entry(folder)
+            candidates = self._filtered(entry, extensions)
+            return random.choice(candidates) if candidates else None
+
+    def exists(self, folder, filename):
+        with self._lock:
+            return filename in self._entry(folder)["names"]
+
+    def add(self, folder, filename):
+        with self._lock:
+            entry = self._folders.get(folder)
+            if entry is None:
+                return
+            if filename not in entry["names"]:
+                entry["names"].add(filename)
+                entry["sorted"] = tuple(sorted(entry["names"]))
+                entry["by_ext"] = {}
+            entry["mtime"] = self._dir_mtime(folder)
+
+    def remove(self, folder, filename):
+        with self._lock:
+            entry = self._folders.get(folder)
+            if entry is None:
+                return
+            if filename in entry["names"]:
+                entry["names"].discard(filename)
+                entry["sorted"] = tuple(sorted(entry["names"]))
+                entry["by_ext"] = {}
+            entry["mtime"] = self._dir_mtime(folder)
+
+    def invalidate(self, folder=None):
+        with self._lock:
+            if folder is None:
+                self._folders.clear()
+            else:
+                self._folders.pop(folder, None)
+
+    def _entry(self, folder):
+        entry = self._folders.get(folder)
+        now = time.monotonic()
+        if entry is not None:
+            if now - entry["checked"] < self.check_interval:
+                return entry
+            entry["checked"] = now
+            if self._dir_mtime(folder) == entry["mtime"]:
+                return entry
+        entry = self._scan(folder)
+        entry["checked"] = now
+        self._folders[folder] = entry
+        return entry
+
+    def _scan(self, folder):
+        path = os.path.join(self.static_folder, folder)
+        mtime = self._dir_mtime(folder)
+        names = set()
+        if mtime is not None:
+            try:
+                with os.scandir(path) as it:
+                    names = {e.name for e in it if e.is_file()}
+            except OSError as e:
+                print(f"ERROR al leer la carpeta {path}: {e}")
+        return {"names": names, "sorted": tuple(sorted(names)), "by_ext": {}, "mtime": mtime}
+
+    def _filtered(self, entry, extensions):
+        if not extensions:
+            return entry["sorted"]
+        key = tuple(sorted(ext.lower() for ext in extensions))
+        cached = entry["by_ext"].get(key)
+        if cached is None:
+            cached = tuple(f for f in entry["sorted"] if f.lower().endswith(key))
+            entry["by_ext"][key] = cached
+        return cached
+
+    def _dir_mtime(self, folder):
+        try:
+            return os.stat(os.path.join(self.static_folder, folder)).st_mtime_ns
+        except OSError:
+            return None
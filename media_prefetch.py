@@ -0,0 +1,111 @@
+import os
+import queue
+import random
+import threading
+
+WARM_CHUNK_SIZE = 1 << 20  # Lectura en bloques de 1 MiB cuando no hay posix_fadvise.
+
+
+def warm_file(path):
+    """
+    Pide al kernel que cargue 'path' en la caché de páginas para que la primera lectura del navegador
+    no espere a la tarjeta SD. Con posix_fadvise(WILLNEED) la lectura es asíncrona y no ocupa la CPU;
+    si no está disponible se lee el archivo completo descartando los datos.
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError as e:
+        print(f"PREFETCH WARNING: No se pudo abrir {path}: {e}")
+        return False
+    try:
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        else:
+            while os.read(fd, WARM_CHUNK_SIZE):
+                pass
+        return True
+    except OSError as e:
+        print(f"PREFETCH WARNING: No se pudo precargar {path}: {e}")
+        return False
+    finally:
+        os.close(fd)
+
+
+class MediaPrefetcher:
+    """
+    Elige por adelantado el próximo archivo de cada carpeta de medios (audio/<emoción>, video, video_upload)
+    para que el navegador pueda precargarlo y la reacción empiece sin viajes extra al servidor ni a la SD.
+    take() entrega la elección vigente y sortea la siguiente; un hilo de fondo precarga cada nueva elección
+    en la caché de páginas y, mientras el robot está en reposo, vuelve a precargar las vigentes por si el
+    kernel las desalojó.
+    """
+
+    def __init__(self, catalog, slots, is_idle=None, rewarm_interval=30.0, resolve=None):
+        self.catalog = catalog
+        self.slots = dict(slots)  # carpeta relativa a static/ -> extensiones permitidas
+        self.is_idle = is_idle or (lambda: True)
+        # (carpeta, archivo elegido) -> ruta relativa a static/ del archivo que se entregará (o None).
+        self.resolve = resolve or (lambda folder, filename: f"{folder}/{filename}")
+        self.rewarm_interval = rewarm_interval
+        self._lock = threading.Lock()
+        self._picks = {}
+        self._warm_queue = queue.Queue()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._warm_loop, daemon=True)
+            self._thread.start()
+        for folder in self.slots:
+            self.peek(folder)
+
+    def peek(self, folder):
+        """Archivo que entregará el próximo take(folder), sin consumirlo. None si la carpeta está vacía."""
+        with self._lock:
+            pick = self._picks.get(folder)
+            if pick is None or not self.catalog.exists(folder, pick):
+                pick = self._pick(folder, previous=pick)
+            return pick
+
+    def take(self, folder):
+        """Entrega la elección vigente de 'folder' y sortea (y precarga) la siguiente."""
+        with self._lock:
+            pick = self._picks.get(folder)
+            if pick is None or not self.catalog.exists(folder, pick):
+                pick = self._pick(folder, previous=pick)
+            if pick is not None:
+                self._pick(folder, previous=pick)
+            return pick
+
+    def snapshot(self):
+        """Elecciones vigentes de todas las carpetas: {carpeta: archivo o None}."""
+        return {folder: self.peek(folder) for folder in self.slots}
+
+    def _pick(self, folder, previous=None):
+        candidates = self.catalog.files(folder, self.slots.get(folder))
+        if len(candidates) > 1 and previous in candidates:
+            # Evita repetir el mismo clip dos veces seguidas.
+            candidates = [f for f in candidates if f != previous]
+        pick = random.choice(candidates) if candidates else None
+        self._picks[folder] = pick
+        if pick is not None:
+            self._warm_queue.put((folder, pick))
+        return pick
+
+    def _warm_loop(self):
+        while True:
+            try:
+                folder, filename = self._warm_queue.get(timeout=self.rewarm_interval)
+            except queue.Empty:
+                if self.is_idle():
+                    with self._lock:
+                        picks = [(f, p) for f, p in self._picks.items() if p is not None]
+                    for folder, filename in picks:
+                        self._warm(folder, filename)
+                continue
+            self._warm(folder, filename)
+
+    def _warm(self, folder, filename):
+        relpath = self.resolve(folder, filename)
+        if relpath:
+            warm_file(os.path.join(self.catalog.static_folder, relpath))
@@ -0,0 +1,108 @@
+import hashlib
+import os
+import threading
+
+from flask import abort, request, send_file
+from werkzeug.security import safe_join
+
+HASH_CHUNK_SIZE = 1 << 20
+VERSIONED_MAX_AGE = 365 * 24 * 3600  # Las URLs con ?v=<hash> nunca cambian de contenido.
+
+
+class MediaServer:
+    """
+    Sirve los archivos de static/ con ETags fuertes basados en el contenido (BLAKE2b), Cache-Control largo
+    para las URLs versionadas (?v=<hash>) y revalidación para las demás, y respuestas 206 para los rangos
+    que pide el navegador al buscar dentro de un MP4.
+    El hash de cada archivo se calcula una sola vez y se guarda junto a su (mtime, tamaño); si el archivo
+    se reemplaza, cambia la clave y se recalcula. Las peticiones nunca esperan a que se lea un archivo
+    grande: si el hash aún no está calculado se pide en segundo plano y mientras tanto se usa el ETag
+    por (mtime, tamaño) de Werkzeug y una URL sin versión.
+    """
+
+    def __init__(self, static_folder):
+        self.static_folder = static_folder
+        self._lock = threading.Lock()
+        self._hashes = {}
+        self._pending = set()
+
+    def cached_hash(self, path):
+        """Hash ya calculado de 'path', o None (y se calcula en segundo plano) si todavía no se conoce."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        with self._lock:
+            cached = self._hashes.get(path)
+            if cached and cached[0] == (st.st_mtime_ns, st.st_size):
+                return cached[1]
+            if path in self._pending:
+                return None
+            self._pending.add(path)
+        threading.Thread(target=self._hash_in_background, args=(path,), daemon=True).start()
+        return None
+
+    def _hash_in_background(self, path):
+        try:
+            self.content_hash(path)
+        finally:
+            with self._lock:
+                self._pending.discard(path)
+
+    def content_hash(self, path):
+        """Hash del contenido de 'path' (ruta absoluta), o None si no existe. Lee el archivo si hace falta."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        key = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            cached = self._hashes.get(path)
+        if cached and cached[0] == key:
+            return cached[1]
+        digest = hashlib.blake2b(digest_size=16)
+        try:
+            with open(path, 'rb') as f:
+                while chunk := f.read(HASH_CHUNK_SIZE):
+                    digest.update(chunk)
+        except OSError as e:
+            print(f"MEDIA WARNING: No se pudo calcular el hash de {path}: {e}")
+            return None
+        value = digest.hexdigest()
+        with self._lock:
+            self._hashes[path] = (key, value)
+        return value
+
+    def url(self, relpath):
+        """URL de 'relpath' (relativo a static/) con ?v=<hash> para que el navegador la guarde indefinidamente."""
+        path = safe_join(self.static_folder, relpath)
+        value = self.cached_hash(path) if path else None
+        return f"/static/{relpath}?v={value[:12]}" if value else f"/static/{relpath}"
+
+    def prime(self, folders, catalog):
+        """Calcula en segundo plano los hashes de las carpetas indicadas para que url() no lea archivos grandes."""
+        def run():
+            for folder in folders:
+                for filename in catalog.files(folder):
+                    self.content_hash(os.path.join(self.static_folder, folder, filename))
+        threading.Thread(target=run, daemon=True).start()
+
+    def send(self, filename):
+        """
+        Respuesta Flask para /static/<filename> (relativo a static/); send_file atiende If-None-Match (304)
+        y Range (206). Se registra como vista del endpoint 'static', que Flask llama con filename=.
+        """
+        path = safe_join(self.static_folder, filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        value = self.cached_hash(path)
+        versioned = value is not None and request.args.get('v') == value[:12]
+        response = send_file(path, conditional=True, etag=value or True,
+                             max_age=VERSIONED_MAX_AGE if versioned else 0)
+        if versioned:
+            response.cache_control.public = True
+            response.cache_control.immutable = True
+        else:
+            # Sin versión el contenido puede cambiar (p. ej. special/event.mp4): revalidar siempre con el ETag.
+            response.cache_control.no_cache = True
+        return response
@@ -0,0 +1,108 @@
+import argparse
+import glob
+import os
+import time
+import cv2
+import numpy as np
+import tflite_runtime.interpreter as tflite
+from emotion_preprocess import EmotionPreprocessor, dequantize
+
+# Compara precisión y latencia de las variantes TFLite del modelo de emociones
+# (float, rango dinámico e int8) usando el mismo preprocesamiento que app.py.
+# El conjunto de evaluación es una carpeta con una subcarpeta por emoción: dataset/<emoción>/*.png
+
+EMOTION_LABELS = ["angry", "disgust", "fear", "happy", "sad", "surprise", "neutral"]
+DEFAULT_MODELS = ["emotion_model_float.tflite", "emotion_model.tflite", "emotion_model_int8.tflite"]
+LATENCY_RUNS = 200
+ACCURACY_TOLERANCE = 0.02  # Pérdida de precisión aceptable frente al modelo float (fracción de aciertos).
+
+
+def load_dataset(folder):
+    samples = []
+    for label_idx, label in enumerate(EMOTION_LABELS):
+        for path in sorted(glob.glob(os.path.join(folder, label, "*"))):
+            img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+            if img is not None:
+                samples.append((img, label_idx))
+    return samples
+
+
+def evaluate(model_path, samples):
+    interpreter = tflite.Interpreter(model_path=model_path)
+    interpreter.allocate_tensors()
+    inp = interpreter.get_input_details()[0]
+    out = interpreter.get_output_details()[0]
+    input_h, input_w = inp['shape'][1:3]
+    pre = EmotionPreprocessor(input_h, input_w, 1, dtype=inp['dtype'], quantization=inp['quantization'])
+
+    def infer(gray):
+        batch = pre.fill(gray, [(0, 0, gray.shape[1], gray.shape[0])])
+        interpreter.set_tensor(inp['index'], batch)
+        interpreter.invoke()
+        return dequantize(interpreter.get_tensor(out['index'])[0], out['quantization'])
+
+    correct = 0
+    for img, label_idx in samples:
+        correct += int(np.argmax(infer(img)) == label_idx)
+    accuracy = correct / len(samples) if samples else float("nan")
+
+    probe = samples[0][0] if samples else np.zeros((input_h, input_w), dtype=np.uint8)
+    for _ in range(10):
+        infer(probe)
+    timings = []
+    for _ in range(LATENCY_RUNS):
+        start = time.perf_counter()
+        infer(probe)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "model": os.path.basename(model_path),
+        "size_kb": os.path.getsize(model_path) / 1024,
+        "input": inp['dtype'].__name__,
+        "accuracy": accuracy,
+        "latency_ms": float(np.mean(timings)),
+        "latency_p95_ms": float(np.percentile(timings, 95)),
+    }
+
+
+def recommend(results, baseline, tolerance=ACCURACY_TOLERANCE):
+    """
+    El modelo más rápido cuya precisión no cae más de 'tolerance' por debajo de 'baseline' (el modelo float).
+    Sin el modelo de referencia entre los resultados se compara contra el más preciso.
+    """
+    reference = next((r for r in results if r['model'] == os.path.basename(baseline)), None)
+    if reference is None:
+        reference = max(results, key=lambda r: r['accuracy'])
+    accepted = [r for r in results if r['accuracy'] >= reference['accuracy'] - tolerance]
+    return min(accepted, key=lambda r: r['latency_ms']), reference
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reporte de precisión y latencia de los modelos de emociones.")
+    parser.add_argument("dataset", help="Carpeta de evaluación con subcarpetas por emoción.")
+    parser.add_argument("--models", nargs="+", default=DEFAULT_MODELS)
+    parser.add_argument("--baseline", default=DEFAULT_MODELS[0], help="Modelo de referencia de precisión.")
+    parser.add_argument("--tolerance", type=float, default=ACCURACY_TOLERANCE,
+                        help="Pérdida de precisión aceptable frente a la referencia (p. ej. 0.02).")
+    args = parser.parse_args()
+
+    samples = load_dataset(args.dataset)
+    print(f"Evaluando con {len(samples)} imágenes de {args.dataset}\n")
+    print(f"{'Modelo':<30} {'KB':>8} {'Entrada':>8} {'Precisión':>10} {'ms medio':>9} {'ms p95':>8}")
+    results = []
+    for model_path in args.models:
+        if not os.path.exists(model_path):
+            print(f"{os.path.basename(model_path):<30} (no encontrado, se omite)")
+            continue
+        r = evaluate(model_path, samples)
+        results.append(r)
+        print(f"{r['model']:<30} {r['size_kb']:8.0f} {r['input']:>8} {r['accuracy']:10.3f} "
+              f"{r['latency_ms']:9.2f} {r['latency_p95_ms']:8.2f}")
+
+    if results:
+        best, reference = recommend(results, args.baseline, args.tolerance)
+        excluded = [r['model'] for r in results if r['accuracy'] < reference['accuracy'] - args.tolerance]
+        print(f"\nReferencia: {reference['model']} (precisión {reference['accuracy']:.3f}, tolerancia {args.tolerance:.3f})")
+        if excluded:
+            print(f"Descartados por precisión: {', '.join(excluded)}")
+        print(f"Recomendado: {best['model']} ({best['latency_ms']:.2f} ms, precisión {best['accuracy']:.3f})")
@@ -1,16 +1,79 @@
+import argparse
+import glob
+import os
+import cv2
+import numpy as np
 import tensorflow as tf
 
-# Load the pre-trained Keras model
-model = tf.keras.models.load_model("emotion_model.h5", compile=False)
+# Modos de conversión:
+#   float   -> sin optimizaciones (referencia de precisión).
+#   dynamic -> Optimize.DEFAULT, pesos int8 y activaciones float (comportamiento original).
+#   int8    -> cuantización entera completa; requiere un conjunto de calibración representativo.
+DEFAULT_OUTPUTS = {
+    "float": "emotion_model_float.tflite",
+    "dynamic": "emotion_model.tflite",
+    "int8": "emotion_model_int8.tflite",
+}
+CALIBRATION_SAMPLES = 300
 
-# Convert the model to TFLite
-converter = tf.lite.TFLiteConverter.from_keras_model(model)
-# Optionally, you can set optimization options:
-converter.optimizations = [tf.lite.Optimize.DEFAULT]
-tflite_model = converter.convert()
 
-# Save the TFLite model to a file
-with open("emotion_model.tflite", "wb") as f:
-    f.write(tflite_model)
+def load_face_images(folder, input_h, input_w, limit=None):
+    """
+    Carga caras en gris desde 'folder' (se buscan imágenes de forma recursiva, p. ej. dataset/<emoción>/*.png)
+    y las devuelve normalizadas a [0, 1] con la misma forma que usa app.py.
+    """
+    paths = sorted(
+        p for p in glob.glob(os.path.join(folder, "**", "*"), recursive=True)
+        if p.lower().endswith((".png", ".jpg", ".jpeg"))
+    )
+    if limit:
+        rng = np.random.default_rng(0)
+        paths = list(rng.permutation(paths)[:limit])
+    for path in paths:
+        img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            continue
+        img = cv2.resize(img, (input_w, input_h)).astype(np.float32) / 255.0
+        yield img[np.newaxis, :, :, np.newaxis]
 
-print("Conversion complete! TFLite model saved as emotion_model.tflite")
+
+def convert(model, mode, calibration_dir=None):
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if mode == "dynamic":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    elif mode == "int8":
+        if not calibration_dir:
+            raise ValueError("El modo int8 necesita --calibration-dir con imágenes de caras representativas.")
+        _, input_h, input_w, _ = model.input_shape
+
+        def representative_dataset():
+            for sample in load_face_images(calibration_dir, input_h, input_w, limit=CALIBRATION_SAMPLES):
+                yield [sample]
+
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+    return converter.convert()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convierte emotion_model.h5 a TFLite.")
+    parser.add_argument("--mode", choices=sorted(DEFAULT_OUTPUTS), default="dynamic")
+    parser.add_argument("--calibration-dir", help="Carpeta con caras para calibrar el modelo int8.")
+    parser.add_argument("--output", help="Archivo de salida (por defecto depende del modo).")
+    args = parser.parse_args()
+
+    # Load the pre-trained Keras model
+    model = tf.keras.models.load_model("emotion_model.h5", compile=False)
+    try:
+        tflite_model = convert(model, args.mode, args.calibration_dir)
+    except ValueError as e:
+        parser.error(str(e))
+
+    output = args.output or DEFAULT_OUTPUTS[args.mode]
+    with open(output, "wb") as f:
+        f.write(tflite_model)
+
+    print(f"Conversion complete! ({args.mode}) TFLite model saved as {output}")
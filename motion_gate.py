@@ -0,0 +1,100 @@
+import time
+import cv2
+import numpy as np
+from detection_config import MOTION_GATE_CONFIG_RULES, validate_config
+
+DEFAULT_MOTION_GATE_CONFIG = {
+    "enabled": True,
+    "active_fps": 20,           # Frecuencia de detección con gente frente al robot.
+    "idle_fps": 2,              # Frecuencia de detección con la escena quieta.
+    "downscale_width": 80,      # Ancho del frame reducido sobre el que se mide el movimiento.
+    "pixel_threshold": 25,      # Diferencia de intensidad (0-255) para contar un píxel como cambiado.
+    "motion_threshold": 0.01,   # Fracción de píxeles cambiados que se considera movimiento.
+    "background_alpha": 0.05,   # Velocidad con la que el fondo se adapta a cambios lentos de luz.
+    "idle_after": 10.0          # Segundos sin movimiento ni caras para pasar a modo reposo.
+}
+
+
+class MotionGate:
+    """
+    Controla la frecuencia de detección según la actividad de la escena.
+    Compara un frame muy reducido contra un fondo promediado: si la escena está quieta y no hay
+    caras, la detección baja a 'idle_fps'; en cuanto aparece movimiento o una cara vuelve a 'active_fps'.
+    """
+
+    def __init__(self, config=None):
+        self.config = dict(DEFAULT_MOTION_GATE_CONFIG)
+        if config:
+            self.config.update(config)
+        self.state = "active"
+        self.motion_score = 0.0
+        self.last_activity = time.monotonic()
+        self._background = None
+
+    def update_config(self, new_config):
+        self.config.update(validate_config(new_config, MOTION_GATE_CONFIG_RULES))
+        self._background = None
+        self._set_state("active", "config changed")
+
+    @property
+    def current_fps(self):
+        if not self.config["enabled"] or self.state == "active":
+            return self.config["active_fps"]
+        return self.config["idle_fps"]
+
+    def update(self, gray):
+        """Mide el movimiento en el frame gris y actualiza el estado. Devuelve True si hubo movimiento."""
+        if not self.config["enabled"]:
+            return True
+        small = self._downscale(gray)
+        if self._background is None:
+            self._background = small.astype(np.float32)
+            return False
+
+        cv2.convertScaleAbs(self._background, dst=self._background_u8)
+        cv2.absdiff(small, self._background_u8, dst=self._diff)
+        cv2.threshold(self._diff, self.config["pixel_threshold"], 255, cv2.THRESH_BINARY, dst=self._diff)
+        self.motion_score = cv2.countNonZero(self._diff) / self._diff.size
+        cv2.accumulateWeighted(small, self._background, self.config["background_alpha"])
+
+        moving = self.motion_score >= self.config["motion_threshold"]
+        if moving:
+            self._mark_activity(f"motion {self.motion_score:.1%}")
+        elif self.state == "active" and time.monotonic() - self.last_activity >= self.config["idle_after"]:
+            self._set_state("idle", "scene static")
+        return moving
+
+    def report_faces(self, count):
+        if count > 0:
+            self._mark_activity("face detected")
+
+    def status(self):
+        return {
+            "state": self.state,
+            "current_fps": self.current_fps,
+            "motion_score": round(self.motion_score, 4),
+            "seconds_since_activity": round(time.monotonic() - self.last_activity, 1),
+            "config": self.config
+        }
+
+    def _mark_activity(self, reason):
+        self.last_activity = time.monotonic()
+        if self.state != "active":
+            self._set_state("active", reason)
+
+    def _set_state(self, state, reason):
+        if state != self.state:
+            print(f"MOTION GATE: {self.state} -> {state} ({reason}), detection at {self.config[state + '_fps']} fps.")
+        self.state = state
+        self.last_activity = time.monotonic()
+
+    def _downscale(self, gray):
+        h, w = gray.shape[:2]
+        small_w = int(self.config["downscale_width"])
+        small_h = max(1, int(h * small_w / w))
+        if self._background is None or self._background.shape != (small_h, small_w):
+            self._small = np.empty((small_h, small_w), dtype=np.uint8)
+            self._background_u8 = np.empty((small_h, small_w), dtype=np.uint8)
+            self._diff = np.empty((small_h, small_w), dtype=np.uint8)
+            self._background = None
+        return cv2.resize(gray, (small_w, small_h), dst=self._small, interpolation=cv2.INTER_AREA)
@@ -0,0 +1,141 @@
+import collections
+import queue
+import threading
+import time
+
+DEFAULT_CONNECT_TIMEOUT = 0.5   # Segundos para abrir la conexión con el servidor de movimiento (localhost).
+DEFAULT_READ_TIMEOUT = 2.0      # Segundos para recibir la respuesta; las rutas de movimiento responden al instante.
+DEFAULT_RETRIES = 2             # Reintentos de cada envío en segundo plano (además del primer intento).
+DEFAULT_RETRY_DELAY = 0.25      # Espera antes del primer reintento; se duplica en cada uno.
+LATENCY_WINDOW = 200            # Latencias recientes guardadas por ruta para las estadísticas.
+
+
+class MovementUnavailable(Exception):
+    """No hubo respuesta del servidor de movimiento. 'retryable' indica que la petición seguro no llegó."""
+
+    def __init__(self, message, retryable=False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class MovementClient:
+    """
+    Cliente del servidor de movimiento (Movement/movement.py) para app.py.
+    Usa una sesión HTTP persistente (keep-alive, pool de conexiones) con timeouts estrictos de conexión
+    y lectura, así un servidor de movimiento colgado nunca bloquea un hilo de Flask ni el planificador.
+    send() encola la llamada y vuelve de inmediato; un hilo de fondo la envía con reintentos.
+    post() hace la llamada en el hilo actual, también con timeouts. Ambos registran latencias por ruta.
+    Las rutas de movimiento no son idempotentes (repetir /trigger_special_event_movement reinicia la secuencia
+    desfasada del video), así que solo se reintenta si la conexión no llegó a abrirse. Un timeout de lectura
+    o cualquier respuesta, incluidos 4xx (p. ej. 409 porque el joystick está en uso) y 5xx, es definitivo.
+    """
+
+    def __init__(self, base_url, connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT,
+                 retries=DEFAULT_RETRIES, retry_delay=DEFAULT_RETRY_DELAY, max_pending=16):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {}
+        self._worker = None
+        self.reachable = None  # None hasta el primer intento; luego si el servidor respondió (con cualquier código).
+
+    def session(self):
+        with self._session_lock:
+            if self._session is None:
+                # requests se importa al primer uso para no retrasar el arranque del proceso web.
+                import requests
+                from requests.adapters import HTTPAdapter
+                self._session = requests.Session()
+                self._session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+            return self._session
+
+    def post(self, path, payload=None):
+        """
+        Llamada síncrona. Devuelve la respuesta con cualquier código (4xx y 5xx quedan contados como error en
+        stats()). Lanza MovementUnavailable si no hubo respuesta.
+        """
+        import requests
+        start = time.monotonic()
+        try:
+            response = self.session().post(f"{self.base_url}{path}", json=payload, timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            self._record(path, time.monotonic() - start, error=e, reachable=False)
+            # ConnectionError (incluye ConnectTimeout): la petición no salió. Un ReadTimeout pudo haber llegado.
+            raise MovementUnavailable(str(e), retryable=isinstance(e, requests.exceptions.ConnectionError)) from e
+        error = f"{response.status_code} {response.reason}" if response.status_code >= 400 else None
+        self._record(path, time.monotonic() - start, error=error, reachable=True)
+        return response
+
+    def send(self, path, payload=None):
+        """Encola la llamada sin esperar la respuesta. Devuelve False si la cola está llena."""
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((path, payload, time.monotonic()))
+            return True
+        except queue.Full:
+            print(f"MOVEMENT CLIENT WARNING: Cola llena, se descarta {path}.")
+            return False
+
+    def stats(self):
+        """Resumen por ruta: llamadas, errores y latencias (ms) de los envíos recientes."""
+        with self._stats_lock:
+            result = {}
+            for path, entry in self._stats.items():
+                latencies = sorted(entry["latencies"])
+                summary = {"calls": entry["calls"], "errors": entry["errors"], "last_error": entry["last_error"]}
+                if latencies:
+                    summary.update({
+                        "avg_ms": round(1000 * sum(latencies) / len(latencies), 1),
+                        "p50_ms": round(1000 * latencies[len(latencies) // 2], 1),
+                        "p95_ms": round(1000 * latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 1),
+                        "max_ms": round(1000 * latencies[-1], 1),
+                    })
+                result[path] = summary
+            result["_pending"] = self._queue.qsize()
+            result["_reachable"] = self.reachable
+            return result
+
+    def _record(self, path, latency, error=None, reachable=True):
+        with self._stats_lock:
+            entry = self._stats.setdefault(
+                path, {"calls": 0, "errors": 0, "last_error": None, "latencies": collections.deque(maxlen=LATENCY_WINDOW)}
+            )
+            entry["calls"] += 1
+            if error is not None:
+                entry["errors"] += 1
+                entry["last_error"] = str(error)
+            if reachable:
+                entry["latencies"].append(latency)
+            self.reachable = reachable
+
+    def _ensure_worker(self):
+        with self._session_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._send_loop, daemon=True)
+                self._worker.start()
+
+    def _send_loop(self):
+        while True:
+            path, payload, queued_at = self._queue.get()
+            delay = self.retry_delay
+            for attempt in range(self.retries + 1):
+                try:
+                    response = self.post(path, payload)
+                    if response.status_code >= 400:
+                        print(f"MOVEMENT CLIENT WARNING: {path} rechazado: {response.status_code} {response.text[:200]}")
+                    break
+                except MovementUnavailable as e:
+                    if not e.retryable or attempt == self.retries:
+                        print(f"MOVEMENT CLIENT ERROR: {path} falló tras {attempt + 1} intentos: {e}")
+                        break
+                    time.sleep(delay)
+                    delay *= 2
+            waited = time.monotonic() - queued_at
+            if waited > 1.0:
+                print(f"MOVEMENT CLIENT WARNING: {path} tardó {waited:.2f}s desde que se encoló.")
+
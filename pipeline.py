@@ -0,0 +1,159 @@
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+
+
+class LatestValue:
+    """
+    Ranura de un solo elemento entre etapas del pipeline.
+    El productor sobrescribe siempre el valor anterior (nunca se acumulan frames viejos)
+    y cada consumidor espera solo por valores más nuevos que el último que ya procesó.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._value = None
+        self._seq = 0
+
+    def put(self, value):
+        with self._cond:
+            self._value = value
+            self._seq += 1
+            self._cond.notify_all()
+
+    def get(self, last_seq=0, timeout=None):
+        """
+        Espera hasta que exista un valor con secuencia mayor que 'last_seq'.
+        Devuelve: (seq, valor) o (last_seq, None) si se agota el timeout.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > last_seq, timeout=timeout):
+                return last_seq, None
+            return self._seq, self._value
+
+    def peek(self):
+        """Devuelve (seq, valor) actual sin bloquear."""
+        with self._cond:
+            return self._seq, self._value
+
+
+class RateLimiter:
+    """Limita un bucle a 'max_hz' iteraciones por segundo usando plazos monotónicos."""
+
+    def __init__(self, max_hz):
+        self.set_rate(max_hz)
+        self._next_deadline = time.monotonic()
+
+    def set_rate(self, max_hz):
+        self.period = 1.0 / max_hz if max_hz else 0.0
+
+    def wait(self):
+        if self.period <= 0:
+            return
+        now = time.monotonic()
+        if now < self._next_deadline:
+            time.sleep(self._next_deadline - now)
+            now = self._next_deadline
+        # Si la etapa se atrasó, no intentamos "recuperar" iteraciones perdidas.
+        self._next_deadline = max(self._next_deadline, now) + self.period
+
+
+class FrameBroadcaster(LatestValue):
+    """
+    Reparte cada frame JPEG codificado una sola vez a todos los clientes de /video_feed.
+    Cada cliente recibe cada frame nuevo exactamente una vez; si un cliente es lento,
+    salta directamente al frame más reciente en lugar de acumular un buffer.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._subscribers = 0
+
+    @property
+    def subscribers(self):
+        with self._cond:
+            return self._subscribers
+
+    def subscribe(self, timeout=1.0):
+        """Generador de frames para un cliente; registra la conexión y la desconexión."""
+        with self._cond:
+            self._subscribers += 1
+            count = self._subscribers
+        print(f"VIDEO FEED: Client connected ({count} viewers).")
+        try:
+            last_seq = 0
+            while True:
+                last_seq, frame = self.get(last_seq, timeout=timeout)
+                if frame is not None:
+                    yield frame
+        finally:
+            with self._cond:
+                self._subscribers -= 1
+                count = self._subscribers
+            print(f"VIDEO FEED: Client disconnected ({count} viewers).")
+
+
+class SharedLatestValue:
+    """
+    Equivalente de LatestValue entre procesos, sobre multiprocessing.shared_memory.
+    Un único proceso escribe; guarda cada valor (bytes) en el buffer que no está publicado (doble buffer)
+    y después incrementa el contador de secuencia. Los lectores copian el buffer publicado y descartan
+    la copia si la secuencia cambió mientras copiaban. Los lectores nunca bloquean al escritor.
+    """
+
+    HEADER = struct.Struct("<QQQ")  # secuencia, largo del buffer 0, largo del buffer 1
+
+    def __init__(self, name=None, capacity=1 << 20, create=False):
+        size = self.HEADER.size + 2 * capacity
+        self._shm = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0)
+        self.capacity = (self._shm.size - self.HEADER.size) // 2
+        self._buf = self._shm.buf
+        if create:
+            self.HEADER.pack_into(self._buf, 0, 0, 0, 0)
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def put(self, data):
+        if len(data) > self.capacity:
+            raise ValueError(f"Valor de {len(data)} bytes excede la capacidad de {self.capacity} bytes.")
+        seq, len0, len1 = self.HEADER.unpack_from(self._buf, 0)
+        slot = (seq + 1) % 2
+        offset = self.HEADER.size + slot * self.capacity
+        self._buf[offset:offset + len(data)] = data
+        lengths = (len(data), len1) if slot == 0 else (len0, len(data))
+        self.HEADER.pack_into(self._buf, 0, seq + 1, *lengths)
+
+    def peek(self):
+        """Devuelve (seq, bytes) del último valor publicado, o (0, None) si todavía no hay ninguno."""
+        while True:
+            seq, len0, len1 = self.HEADER.unpack_from(self._buf, 0)
+            if seq == 0:
+                return 0, None
+            slot = seq % 2
+            offset = self.HEADER.size + slot * self.capacity
+            data = bytes(self._buf[offset:offset + (len0 if slot == 0 else len1)])
+            if self.HEADER.unpack_from(self._buf, 0)[0] == seq:
+                return seq, data
+
+    def get(self, last_seq=0, timeout=None, poll_interval=0.005):
+        """
+        Espera (por sondeo) un valor con secuencia mayor que 'last_seq'.
+        Devuelve: (seq, bytes) o (last_seq, None) si se agota el timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if self.HEADER.unpack_from(self._buf, 0)[0] > last_seq:
+                return self.peek()
+            if deadline is not None and time.monotonic() >= deadline:
+                return last_seq, None
+            time.sleep(poll_interval)
+
+    def close(self):
+        self._buf = None
+        self._shm.close()
+
+    def unlink(self):
+        self._shm.unlink()
@@ -0,0 +1,199 @@
+"""
+Lanzador de producción para los tres servidores del robot.
+
+    python3 serve.py                    # supervisa app.py, Movement/movement.py y upload_server.py
+    python3 serve.py --service app      # corre un solo servicio (lo usa el supervisor para cada hijo)
+
+Cada servicio corre en su propio proceso bajo un servidor WSGI con hilos (waitress; si no está instalado,
+el servidor con hilos de Werkzeug sin modo debug). El supervisor espera a que cada uno responda en /healthz,
+informa el tiempo de arranque, reinicia con espera exponencial los que se caen y, al recibir SIGTERM/SIGINT,
+detiene los hijos en orden para que movement.py siempre ejecute stop_all().
+"""
+import argparse
+import importlib
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Hilos por servicio: app.py mantiene abiertas una conexión /events y una /video_feed por pantalla.
+SERVICES = {
+    "app": {"module": "app", "dir": BASE_DIR, "port": 5000, "threads": 16},
+    "movement": {"module": "movement", "dir": os.path.join(BASE_DIR, "Movement"), "port": 5001, "threads": 8},
+    "upload": {"module": "upload_server", "dir": BASE_DIR, "port": 5002, "threads": 6},
+}
+START_ORDER = ["movement", "app", "upload"]   # movement primero: app.py le envía órdenes desde el arranque.
+STOP_ORDER = ["upload", "app", "movement"]    # movement al final: sigue recibiendo el stop hasta el último momento.
+
+READY_TIMEOUT = 60.0         # Segundos máximos esperando /healthz antes de considerar fallido el arranque.
+READY_POLL_INTERVAL = 0.1
+RESTART_BACKOFF_INITIAL = 1.0
+RESTART_BACKOFF_MAX = 30.0
+STABLE_AFTER = 60.0          # Un hijo que dura más que esto vuelve a la espera inicial si se cae.
+SHUTDOWN_GRACE = 10.0        # Segundos que se espera a cada hijo tras SIGTERM antes de SIGKILL.
+
+
+def run_service(name):
+    """Corre un servicio en este proceso bajo el servidor WSGI de producción."""
+    service = SERVICES[name]
+    os.chdir(service["dir"])
+    sys.path.insert(0, service["dir"])
+    module = importlib.import_module(service["module"])
+
+    # SIGTERM se convierte en SystemExit para que se ejecuten los bloques finally (stop_all, atexit).
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        if hasattr(module, "start_background_tasks"):
+            module.start_background_tasks()
+        serve_wsgi(module.app, service["port"], service["threads"])
+    finally:
+        if hasattr(module, "shutdown"):
+            module.shutdown()
+
+
+def serve_wsgi(wsgi_app, port, threads):
+    try:
+        from waitress import serve
+    except ImportError:
+        from werkzeug.serving import make_server
+        print(f"SERVE: waitress no está instalado, usando el servidor con hilos de Werkzeug en :{port}.")
+        make_server("0.0.0.0", port, wsgi_app, threaded=True).serve_forever()
+        return
+    # channel_timeout alto: /events y /video_feed son respuestas que no terminan.
+    serve(wsgi_app, host="0.0.0.0", port=port, threads=threads, channel_timeout=3600, ident=None)
+
+
+def is_ready(port, timeout=1.0):
+    """True si el servicio responde 200 en /healthz."""
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/healthz", timeout=timeout) as response:
+            return response.status == 200
+    except OSError:
+        return False
+
+
+def wait_ready(port, process, timeout=READY_TIMEOUT, cancelled=lambda: False):
+    """Espera a que el servicio responda 200 en /healthz. Devuelve los segundos que tardó o None."""
+    start = time.monotonic()
+    while time.monotonic() - start < timeout and not cancelled():
+        if process.poll() is not None:
+            return None
+        if is_ready(port):
+            return time.monotonic() - start
+        time.sleep(READY_POLL_INTERVAL)
+    return None
+
+
+class Supervisor:
+    def __init__(self, names):
+        self.names = names
+        self.processes = {}
+        self.started_at = {}
+        self.backoff = {name: RESTART_BACKOFF_INITIAL for name in names}
+        self.restart_at = {}
+        self.ready_deadline = {}   # Hijos reiniciados que aún no respondieron /healthz -> plazo para hacerlo.
+        self.stopping = False
+
+    def spawn(self, name):
+        self.processes[name] = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--service", name])
+        self.started_at[name] = time.monotonic()
+        return self.processes[name]
+
+    def start_all(self):
+        boot_start = time.monotonic()
+        for name in self.names:
+            if self.stopping:
+                return
+            process = self.spawn(name)
+            elapsed = wait_ready(SERVICES[name]["port"], process, cancelled=lambda: self.stopping)
+            if elapsed is None:
+                print(f"SUPERVISOR: '{name}' no quedó listo (se reintentará si se cae).")
+            else:
+                print(f"SUPERVISOR: '{name}' listo en {elapsed:.2f}s (pid {process.pid}).")
+        print(f"SUPERVISOR: Arranque completo en {time.monotonic() - boot_start:.2f}s.")
+
+    def check(self):
+        """
+        Detecta hijos caídos y los reinicia respetando la espera exponencial. Nunca bloquea: la disponibilidad
+        de un hijo reiniciado se consulta una vez por vuelta, así los demás siguen supervisados y SIGTERM se
+        atiende enseguida.
+        """
+        now = time.monotonic()
+        for name, process in list(self.processes.items()):
+            if name in self.restart_at:
+                if now >= self.restart_at[name]:
+                    del self.restart_at[name]
+                    process = self.spawn(name)
+                    self.ready_deadline[name] = now + READY_TIMEOUT
+                    print(f"SUPERVISOR: '{name}' reiniciado (pid {process.pid}).")
+                continue
+            code = process.poll()
+            if code is None:
+                if name in self.ready_deadline:
+                    self.check_ready(name, process, now)
+                continue
+            self.ready_deadline.pop(name, None)
+            if now - self.started_at[name] >= STABLE_AFTER:
+                self.backoff[name] = RESTART_BACKOFF_INITIAL
+            delay = self.backoff[name]
+            self.backoff[name] = min(delay * 2, RESTART_BACKOFF_MAX)
+            self.restart_at[name] = now + delay
+            print(f"SUPERVISOR: '{name}' terminó con código {code}; reinicio en {delay:.0f}s.")
+
+    def check_ready(self, name, process, now):
+        if is_ready(SERVICES[name]["port"], timeout=READY_POLL_INTERVAL):
+            del self.ready_deadline[name]
+            print(f"SUPERVISOR: '{name}' listo en {now - self.started_at[name]:.2f}s (pid {process.pid}).")
+        elif now >= self.ready_deadline[name]:
+            del self.ready_deadline[name]
+            print(f"SUPERVISOR: '{name}' no quedó listo en {READY_TIMEOUT:.0f}s (se reintentará si se cae).")
+
+    def stop_all(self):
+        self.stopping = True
+        for name in STOP_ORDER:
+            process = self.processes.get(name)
+            if process is None or process.poll() is not None:
+                continue
+            print(f"SUPERVISOR: Deteniendo '{name}'...")
+            process.terminate()
+            try:
+                process.wait(timeout=SHUTDOWN_GRACE)
+            except subprocess.TimeoutExpired:
+                print(f"SUPERVISOR: '{name}' no respondió a SIGTERM, forzando cierre.")
+                process.kill()
+                process.wait()
+
+    def run(self):
+        def request_stop(signum, frame):
+            self.stopping = True
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+        try:
+            self.start_all()
+            while not self.stopping:
+                self.check()
+                time.sleep(0.5)
+        finally:
+            self.stop_all()
+            print("SUPERVISOR: Todos los servicios detenidos.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lanzador y supervisor de los servidores del robot.")
+    parser.add_argument("--service", choices=sorted(SERVICES), help="Corre un solo servicio en este proceso.")
+    parser.add_argument("--only", nargs="+", choices=sorted(SERVICES), help="Supervisa solo estos servicios.")
+    args = parser.parse_args()
+
+    if args.service:
+        run_service(args.service)
+    else:
+        names = [name for name in START_ORDER if not args.only or name in args.only]
+        Supervisor(names).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -31,25 +31,14 @@ fi
 echo "Cambiando al directorio $PROJECT_DIR" | tee -a "$LOG_FILE"
 cd "$PROJECT_DIR" || { echo "ERROR: No se pudo cambiar al directorio $PROJECT_DIR" | tee -a "$LOG_FILE"; exit 1; }
 
-# Iniciar servidor principal (app.py) en segundo plano
-echo "Iniciando app.py..." | tee -a "$LOG_FILE"
-python3 app.py >> "$LOG_FILE" 2>&1 &
-APP_PID=$!
-
-# Iniciar servidor de movimiento (movement.py) en segundo plano
-echo "Iniciando Movement/movement.py..." | tee -a "$LOG_FILE"
-python3 Movement/movement.py >> "$LOG_FILE" 2>&1 &
-MOVEMENT_PID=$!
-
-# Iniciar servidor de carga (upload_server.py) en segundo plano
-echo "Iniciando upload_server.py..." | tee -a "$LOG_FILE"
-python3 upload_server.py >> "$LOG_FILE" 2>&1 &
-UPLOAD_PID=$!
-
-echo "Servidores iniciados (ver $LOG_FILE para detalles):"
-echo "- Principal (app.py): PID $APP_PID"
-echo "- Movimiento (movement.py): PID $MOVEMENT_PID"
-echo "- Carga (upload_server.py): PID $UPLOAD_PID"
-echo "$(date): Servidores lanzados con PIDs $APP_PID, $MOVEMENT_PID, $UPLOAD_PID" >> "$LOG_FILE"
-
-echo "Puedes detenerlos manualmente usando 'kill <PID>' y 'sudo pkill pigpiod'"
\ No newline at end of file
+# Iniciar los tres servidores bajo el supervisor (serve.py): espera a que cada uno responda,
+# reinicia los que se caen y al detenerlo (kill <PID>) cierra los hijos en orden.
+echo "Iniciando serve.py (app.py, Movement/movement.py, upload_server.py)..." | tee -a "$LOG_FILE"
+python3 serve.py >> "$LOG_FILE" 2>&1 &
+SUPERVISOR_PID=$!
+
+echo "Servidores iniciados bajo el supervisor (ver $LOG_FILE para detalles y tiempos de arranque):"
+echo "- Supervisor (serve.py): PID $SUPERVISOR_PID"
+echo "$(date): Supervisor lanzado con PID $SUPERVISOR_PID" >> "$LOG_FILE"
+
+echo "Puedes detenerlos con 'kill $SUPERVISOR_PID' (detiene los tres servidores) y 'sudo pkill pigpiod'"
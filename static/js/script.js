@@ -10,6 +10,7 @@ document.addEventListener("DOMContentLoaded", function () {
     const interactionVideo = document.getElementById('interactionVideo');
     const randomEventVideo = document.getElementById('randomEventVideo');
     const ctx = faceCanvas.getContext('2d');
+    const faceBoxOverlay = document.getElementById('faceBoxOverlay');
 
     // --- Variables de Estado ---
     let currentEmotion = "neutral";
@@ -266,6 +267,95 @@ document.addEventListener("DOMContentLoaded", function () {
         }
 
     }
+    // --- Recuadro de la cara (modo passthrough MJPEG) ---
+    // El servidor reenvía el JPEG de la cámara sin dibujar; aquí se superpone el recuadro sobre la imagen.
+    function drawFaceBox(data) {
+        if (videoFeed.style.display === 'none' || !data.box) {
+            faceBoxOverlay.style.display = 'none';
+            return;
+        }
+        const imgWidth = videoFeed.clientWidth;
+        const imgHeight = videoFeed.clientHeight;
+        if (imgWidth === 0 || imgHeight === 0) return;
+
+        faceBoxOverlay.style.display = 'block';
+        faceBoxOverlay.style.left = (videoFeed.offsetLeft + videoFeed.clientLeft) + 'px';
+        faceBoxOverlay.style.top = (videoFeed.offsetTop + videoFeed.clientTop) + 'px';
+        faceBoxOverlay.width = imgWidth;
+        faceBoxOverlay.height = imgHeight;
+
+        // La imagen usa object-fit: contain, así que se escala manteniendo la proporción y se centra.
+        const scale = Math.min(imgWidth / data.width, imgHeight / data.height);
+        const offsetX = (imgWidth - data.width * scale) / 2;
+        const offsetY = (imgHeight - data.height * scale) / 2;
+        const [x, y, w, h] = data.box;
+
+        const overlayCtx = faceBoxOverlay.getContext('2d');
+        overlayCtx.clearRect(0, 0, imgWidth, imgHeight);
+        overlayCtx.strokeStyle = '#00ff00';
+        overlayCtx.lineWidth = 2;
+        overlayCtx.strokeRect(offsetX + x * scale, offsetY + y * scale, w * scale, h * scale);
+    }
+
+    function pollFaceBox() {
+        fetch('/face_box').then(res => res.ok ? res.json() : Promise.reject(res.status))
+            .then(drawFaceBox)
+            .catch(() => { faceBoxOverlay.style.display = 'none'; });
+    }
+
+    // --- Precarga de medios ---
+    // El servidor elige por adelantado el próximo audio de cada emoción y el próximo video (/next_media).
+    // Los audios se dejan cargados en elementos <audio> y el video se pide con <link rel=prefetch>, así al
+    // confirmar una emoción la reacción empieza sin esperar ninguna petición.
+    let nextMedia = null;
+    const preloadedAudio = {};
+
+    function preloadLink(url, rel, as) {
+        if (!url || document.head.querySelector(`link[href="${url}"]`)) return;
+        const link = document.createElement('link');
+        link.rel = rel;
+        link.as = as;
+        link.href = url;
+        document.head.appendChild(link);
+    }
+
+    function applyNextMedia(data) {
+        nextMedia = data;
+        Object.values(data.audio || {}).forEach(url => {
+            if (!url || preloadedAudio[url]) return;
+            const audio = new Audio();
+            audio.preload = 'auto';
+            audio.src = url;
+            preloadedAudio[url] = audio;
+        });
+        preloadLink(data.video, 'prefetch', 'video');
+        // El video del evento cambia de URL cuando termina su conversión o se sube uno nuevo.
+        if (randomEventVideo && data.special && randomEventVideo.getAttribute('src') !== data.special
+                && randomEventVideo.style.display !== 'block') {
+            randomEventVideo.src = data.special;
+            randomEventVideo.load();
+        }
+    }
+
+    function refreshNextMedia(usedUrls = []) {
+        // '/static/audio/happy/a.mp3' -> 'audio/happy': la carpeta identifica qué elección se consumió.
+        const used = usedUrls.map(url => url.replace(/^\/static\//, '').replace(/\/[^/]*$/, ''));
+        fetch('/next_media', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ used }) })
+            .then(res => res.ok ? res.json() : Promise.reject(res.status))
+            .then(applyNextMedia)
+            .catch(err => console.warn("No se pudo actualizar la precarga de medios:", err));
+    }
+
+    // Devuelve la URL precargada para 'kind' ('audio' o 'video') y avisa al servidor para que elija la siguiente.
+    function takeNextMedia(kind, emotion) {
+        if (!nextMedia) return null;
+        const url = kind === 'audio' ? (nextMedia.audio || {})[emotion] : nextMedia[kind];
+        if (!url) return null;
+        if (kind === 'audio') nextMedia.audio[emotion] = null; else nextMedia[kind] = null;
+        refreshNextMedia([url]);
+        return url;
+    }
+
     // --- Bucle de Animación ---
     function animateFace() {
         requestAnimationFrame(animateFace);
@@ -284,7 +374,8 @@ document.addEventListener("DOMContentLoaded", function () {
 
     async function playAudio(url) {
         return new Promise((resolve, reject) => {
-            const audio = new Audio(url);
+            const audio = preloadedAudio[url] || new Audio(url);
+            delete preloadedAudio[url];
             setupAudioAnalyser(audio);
             audio.onplay = () => isAudioPlaying = true;
             audio.onended = () => { isAudioPlaying = false; resolve(); };
@@ -293,92 +384,105 @@ document.addEventListener("DOMContentLoaded", function () {
         });
     }
 
-    // --- Lógica Principal de Interacción (Sin cambios) ---
-    function pollDetectionStatus() {
-
-    fetch('/get_video_loop_camera_state').then(res => res.ok ? res.json() : Promise.reject(res.status))
-            .then(data => {
-                if (data.looping) {
-                    if (cameraReplacementActiveFirst) {
-                    
-                        showReplacementVideo(true)
-                        cameraReplacementDesactiveFirst = true
-                        cameraReplacementActiveFirst = false
-                    }
-                }
-                else {
-                    if (cameraReplacementDesactiveFirst){
-                        enableCamera()
-                        cameraReplacementDesactiveFirst = false
-                        cameraReplacementActiveFirst = true
-                    }
-                }
-            })
-
-        fetch('/get_predete_emotion').then(res => res.ok ? res.json() : Promise.reject(res.status)).then((data) => {
-            // console.log(`Predetermined emotion: ${data.emotion}`);
-            if (data.emotion !== "neutral" && !isTalking) {
-                isShowingStaticEmotion = true;
-                drawStaticEmotionFace(ctx, data.emotion);
-
+    // --- Lógica Principal de Interacción ---
+    // Cada función aplica un tipo de evento del servidor. Las usa tanto el canal push (/events)
+    // como el sondeo de respaldo para navegadores sin EventSource.
+    function applyVideoLoopCameraState(data) {
+        if (data.looping) {
+            if (cameraReplacementActiveFirst) {
+                showReplacementVideo(true)
+                cameraReplacementDesactiveFirst = true
+                cameraReplacementActiveFirst = false
             }
-            else {
-                isShowingStaticEmotion = false;
-                drawAnimatedFace(0);
+        }
+        else {
+            if (cameraReplacementDesactiveFirst){
+                enableCamera()
+                cameraReplacementDesactiveFirst = false
+                cameraReplacementActiveFirst = true
             }
+        }
+    }
 
-        })
+    function applyPredeteEmotion(data) {
+        if (data.emotion !== "neutral" && !isTalking) {
+            isShowingStaticEmotion = true;
+            drawStaticEmotionFace(ctx, data.emotion);
+        }
+        else {
+            isShowingStaticEmotion = false;
+            drawAnimatedFace(0);
+        }
+    }
 
-        fetch('/get_video_loop_state').then(res => res.ok ? res.json() : Promise.reject(res.status))
-            .then(data => {
-                console.log('Loop state received:', data)
-                if (data.looping) {
-                    if (firstLoop) {
-                        looping = true
-                        firstLoop = false
-
-                        if (data.url !== '/static/video/random' && data.url !== null && data.url !== NaN){
-                            playSpecificVideo(data.url)
-                        }
-                        else{
-                            triggerVideo()
-                        }
-                    }
-                    // Asegurar que looping se mantenga true mientras el servidor lo indique
-                    looping = true
-                }
-                else {
+    function applyVideoLoopState(data) {
+        console.log('Loop state received:', data)
+        if (data.looping) {
+            if (firstLoop) {
+                looping = true
+                firstLoop = false
 
-                    firstLoop = true
-                    looping = false
+                if (data.url !== '/static/video/random' && data.url !== null && data.url !== NaN){
+                    playSpecificVideo(data.url)
                 }
-            })
-
-        fetch('/detection_status').then(res => res.ok ? res.json() : Promise.reject(res.status))
-            .then(data => {
-                if (data.restart_requested) {
-                    return restartInteraction();
+                else{
+                    triggerVideo()
                 }
+            }
+            // Asegurar que looping se mantenga true mientras el servidor lo indique
+            looping = true
+        }
+        else {
+            firstLoop = true
+            looping = false
+        }
+    }
 
-                if (data.forced_video && data.forced_video !== currentForcedVideoProcessed) {
-                    currentForcedVideoProcessed = data.forced_video;
-                    playSpecificVideo(data.forced_video);
-                    return;
-                }
+    function applyDetectionStatus(data) {
+        if (data.restart_requested) {
+            return restartInteraction();
+        }
 
-                if (!currentForcedVideoProcessed) {
-                    if(cameraReplacementDesactiveFirst === false && cameraReplacementActiveFirst === true){
-                                    if (data.detected && !isAudioPlaying && interactionVideo.paused && randomEventVideo.paused) {
-                        handleEmotionDetection(data.emotion);
-                    } else if (!data.detected && snapshotContainer.style.display !== 'none') {
-                        videoFeed.style.display = "block";
-                        snapshotContainer.style.display = "none";
-                    }
-                    }
+        if (data.forced_video && data.forced_video !== currentForcedVideoProcessed) {
+            currentForcedVideoProcessed = data.forced_video;
+            playSpecificVideo(data.forced_video);
+            return;
+        }
+
+        if (!currentForcedVideoProcessed) {
+            if(cameraReplacementDesactiveFirst === false && cameraReplacementActiveFirst === true){
+                if (data.detected && !isAudioPlaying && interactionVideo.paused && randomEventVideo.paused) {
+                    handleEmotionDetection(data.emotion);
+                } else if (!data.detected && snapshotContainer.style.display !== 'none') {
+                    videoFeed.style.display = "block";
+                    snapshotContainer.style.display = "none";
                 }
-            }).catch(err => console.error("Polling error:", err));
+            }
+        }
+    }
 
+    // Canal push: el servidor envía cada cambio en cuanto ocurre.
+    function subscribeToServerEvents() {
+        const source = new EventSource('/events');
+        const on = (type, handler) => source.addEventListener(type, e => handler(JSON.parse(e.data)));
+        on('video_loop_camera', applyVideoLoopCameraState);
+        on('predete_emotion', applyPredeteEmotion);
+        on('video_loop', applyVideoLoopState);
+        on('detection', data => applyDetectionStatus({ detected: true, emotion: data.emotion }));
+        on('forced_video', data => applyDetectionStatus({ detected: false, forced_video: data.video }));
+        on('restart', () => applyDetectionStatus({ restart_requested: true }));
+        on('face_box', drawFaceBox);
+        // EventSource se reconecta solo enviando Last-Event-ID, y el servidor reanuda desde ese evento.
+        source.onerror = () => console.warn("Conexión de eventos perdida, reintentando...");
+    }
 
+    // Sondeo de respaldo (comportamiento anterior) para navegadores sin EventSource.
+    function pollDetectionStatus() {
+        const getJson = url => fetch(url).then(res => res.ok ? res.json() : Promise.reject(res.status));
+        getJson('/get_video_loop_camera_state').then(applyVideoLoopCameraState);
+        getJson('/get_predete_emotion').then(applyPredeteEmotion);
+        getJson('/get_video_loop_state').then(applyVideoLoopState);
+        getJson('/detection_status').then(applyDetectionStatus).catch(err => console.error("Polling error:", err));
     }
 
     function handleEmotionDetection(emotion) {
@@ -402,8 +506,11 @@ document.addEventListener("DOMContentLoaded", function () {
     function triggerAudio(emotion) {
         if (isAudioPlaying) return;
         const audioEmotion = ["disgust", "no_face"].includes(emotion) || !emotion ? "neutral" : emotion;
-        fetch(`/get_random_audio?emotion=${audioEmotion}`)
-            .then(res => res.ok ? res.json() : Promise.reject())
+        const prefetchedUrl = takeNextMedia('audio', audioEmotion);
+        const request = prefetchedUrl
+            ? Promise.resolve({ audio_url: prefetchedUrl })
+            : fetch(`/get_random_audio?emotion=${audioEmotion}`).then(res => res.ok ? res.json() : Promise.reject());
+        request
             .then(data => {
                 if (data.audio_url) {
                     showReplacementVideo(false)
@@ -419,7 +526,11 @@ document.addEventListener("DOMContentLoaded", function () {
 
     function triggerVideo() {
         if (currentForcedVideoProcessed) return;
-        fetch('/get_random_video').then(res => res.ok ? res.json() : Promise.reject())
+        const prefetchedUrl = takeNextMedia('video');
+        const request = prefetchedUrl
+            ? Promise.resolve({ video_url: prefetchedUrl })
+            : fetch('/get_random_video').then(res => res.ok ? res.json() : Promise.reject());
+        request
             .then(data => {
                 if (data.video_url) {
                     playSpecificVideo(data.video_url);
@@ -444,6 +555,8 @@ document.addEventListener("DOMContentLoaded", function () {
                 faceCanvas.style.display = 'block';
                 currentForcedVideoProcessed = null;
                 document.getElementById("power-button-comment").style.display = "none";
+                // El evento especial no recarga la página: se avisa al servidor que terminó la interacción.
+                fetch('/interaction_done', { method: 'POST' }).catch(() => {});
 
                 // if (looping) {
                 //     triggerVideo();
@@ -491,7 +604,17 @@ document.addEventListener("DOMContentLoaded", function () {
     window.addEventListener('resize', resizeCanvasAndRedraw);
     // 3. Iniciar el bucle de animación.
     animateFace();
-    // 4. Iniciar el sondeo del estado del servidor.
-    setInterval(pollDetectionStatus, 500);
+    // 3b. Precargar los próximos clips de audio y video elegidos por el servidor.
+    refreshNextMedia();
+    // 4. Recibir el estado del servidor por eventos push (o sondeo si el navegador no soporta EventSource).
+    if (window.EventSource) {
+        subscribeToServerEvents();
+    } else {
+        setInterval(pollDetectionStatus, 500);
+        // En modo passthrough, actualizar el recuadro de la cara sobre la vista previa.
+        if (window.CAMERA_PASSTHROUGH) {
+            setInterval(pollFaceBox, 100);
+        }
+    }
 
 });
\ No newline at end of file
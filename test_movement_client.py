@@ -0,0 +1,100 @@
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+
+from movement_client import MovementClient, MovementUnavailable  # noqa: E402
+
+# Ruta del servidor simulado -> (código de respuesta, segundos que tarda en responder).
+STUB_ROUTES = {
+    "/ok": (200, 0),
+    "/busy": (409, 0),
+    "/broken": (500, 0),
+    "/slow": (200, 1.0),
+}
+
+
+class StubMovementHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, como el servidor real
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.hits[self.path] = self.server.hits.get(self.path, 0) + 1
+        status, delay = STUB_ROUTES[self.path]
+        time.sleep(delay)
+        body = json.dumps({"status": "ok" if status == 200 else "error"}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubMovementHandler)
+    server.hits = {}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def client_for(server, **kwargs):
+    kwargs.setdefault("retry_delay", 0.01)
+    return MovementClient(f"http://127.0.0.1:{server.server_port}", **kwargs)
+
+
+def drain(client, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while client.stats()["_pending"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.2)  # el último envío puede seguir en curso aunque la cola esté vacía
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_post_returns_any_http_reply_and_records_errors(stub):
+    client = client_for(stub)
+    assert client.post("/ok").status_code == 200
+    assert client.post("/busy").status_code == 409
+    assert client.post("/broken").status_code == 500
+    assert client.reachable is True
+    stats = client.stats()
+    assert stats["/ok"]["errors"] == 0 and "p50_ms" in stats["/ok"]
+    assert stats["/busy"]["last_error"].startswith("409")
+    assert stats["/broken"]["last_error"].startswith("500")
+
+
+def test_send_never_retries_a_reply_or_a_read_timeout(stub):
+    client = client_for(stub, read_timeout=0.2, retries=2)
+    for path in ("/ok", "/busy", "/broken", "/slow"):
+        assert client.send(path)
+    drain(client)
+    time.sleep(1.0)  # /slow sigue respondiendo en el servidor después del timeout del cliente
+    assert stub.hits == {"/ok": 1, "/busy": 1, "/broken": 1, "/slow": 1}
+    assert client.reachable is False  # el último envío (/slow) no tuvo respuesta
+
+
+def test_connection_errors_are_retried_and_reported():
+    client = MovementClient(f"http://127.0.0.1:{free_port()}", retries=2, retry_delay=0.01)
+    with pytest.raises(MovementUnavailable) as info:
+        client.post("/ok")
+    assert info.value.retryable
+    assert client.reachable is False
+
+    client.send("/ok")
+    drain(client)
+    assert client.stats()["/ok"]["calls"] == 1 + 3
@@ -0,0 +1,293 @@
+import itertools
+import json
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+
+RENDITIONS_FOLDER = "renditions"   # static/renditions/<carpeta de origen>/<nombre>.mp4
+VIDEO_SOURCE_FOLDERS = ("video", "video_upload", "special")
+MAX_WIDTH = int(os.environ.get("TRANSCODE_MAX_WIDTH", 1280))    # Resolución de la pantalla del kiosco.
+MAX_HEIGHT = int(os.environ.get("TRANSCODE_MAX_HEIGHT", 720))
+VIDEO_CODEC = os.environ.get("TRANSCODE_VIDEO_CODEC", "libx264")  # p. ej. h264_v4l2m2m para el codificador de la Pi.
+CRF = 23
+PRESET = "veryfast"
+WORKERS = 1            # La Pi también corre la detección: un solo ffmpeg a la vez, con prioridad baja.
+MAX_PENDING = 64
+NICE = 10
+JOB_HISTORY = 100      # Trabajos terminados que se conservan para /transcode_jobs.
+FAILED_FILE = ".failed.json"  # En static/renditions/: originales que ffmpeg no pudo convertir (no se reintentan).
+
+
+def rendition_relpath(source_relpath):
+    """
+    'video/clip.mov' -> 'renditions/video/clip.mov.mp4'. Conserva el nombre completo del original, así dos
+    originales nunca comparten versión (clip.mov y clip-mov.mp4, clip.mov y clip.MOV).
+    """
+    folder, filename = os.path.split(source_relpath)
+    return f"{RENDITIONS_FOLDER}/{folder}/{filename}.mp4"
+
+
+def ffmpeg_command(ffmpeg, source, output):
+    """H.264 + AAC a la resolución de la pantalla como máximo, con el átomo moov al inicio (faststart)."""
+    scale = (f"scale='min({MAX_WIDTH},iw)':'min({MAX_HEIGHT},ih)'"
+             ":force_original_aspect_ratio=decrease:force_divisible_by=2")
+    return [
+        ffmpeg, "-hide_banner", "-nostdin", "-loglevel", "error", "-y", "-i", source,
+        "-map", "0:v:0", "-map", "0:a:0?", "-vf", scale,
+        "-c:v", VIDEO_CODEC, "-preset", PRESET, "-crf", str(CRF), "-profile:v", "high", "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-b:a", "128k", "-ac", "2",
+        "-movflags", "+faststart", "-f", "mp4", output,
+    ]
+
+
+class TranscodePool:
+    """
+    Cola acotada de conversiones a la versión para el kiosco de cada video subido.
+    upload_server.py encola cada video al guardarlo; los hilos de trabajo corren ffmpeg con prioridad baja,
+    escriben en '<nombre>.mp4.part' y lo renombran al terminar, así app.py nunca ve una conversión a medias.
+    Sin ffmpeg no se genera nada: app.py entrega el original mientras no exista su versión.
+    Los originales que ffmpeg no puede convertir quedan en static/renditions/.failed.json y backfill() no
+    los vuelve a encolar hasta que cambien.
+    """
+
+    def __init__(self, static_folder, workers=WORKERS, max_pending=MAX_PENDING):
+        self.static_folder = static_folder
+        self.workers = workers
+        self.ffmpeg = shutil.which("ffmpeg")
+        # La prioridad baja se pide con 'nice' y no con preexec_fn, que no es seguro en un proceso con hilos.
+        self.nice = shutil.which("nice")
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._jobs = {}        # id -> estado
+        self._queued = {}      # ruta de origen -> id del trabajo en cola (evita convertir dos veces lo mismo)
+        self._processes = {}   # id -> ffmpeg en curso
+        self._ids = itertools.count(1)
+        self._failed = self._load_failed()   # ruta de origen -> {"mtime_ns", "size", "error"}
+        self._threads = []
+        self._running = False
+
+    def start(self):
+        if self._threads:
+            return
+        if self.ffmpeg is None:
+            print("TRANSCODE WARNING: ffmpeg no está instalado; el kiosco recibirá los originales sin convertir.")
+        self._running = True
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"transcode-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def shutdown(self):
+        self._running = False
+        with self._lock:
+            processes = list(self._processes.values())
+        for process in processes:
+            process.terminate()
+        for _ in self._threads:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                pass
+
+    def submit(self, source_relpath, block=False):
+        """
+        Encola la conversión de 'source_relpath' (relativo a static/). La versión anterior, si existe, se borra
+        de inmediato para que no se entregue contenido viejo. Devuelve el estado del trabajo.
+        """
+        with self._lock:
+            job_id = self._queued.get(source_relpath)
+            if job_id is not None:
+                return dict(self._jobs[job_id])
+            job = {"id": next(self._ids), "source": source_relpath, "rendition": rendition_relpath(source_relpath),
+                   "status": "queued", "error": None, "queued_at": time.time(), "started_at": None,
+                   "finished_at": None}
+            self._jobs[job["id"]] = job
+            self._queued[source_relpath] = job["id"]
+        self._remove_file(job["rendition"])
+        try:
+            self._queue.put(job["id"], block=block)
+        except queue.Full:
+            self._finish(job, "failed", "Cola de conversión llena; se reintentará al reiniciar el servidor.")
+        return dict(job)
+
+    def remove(self, source_relpath):
+        """Borra la versión para el kiosco de un video eliminado."""
+        self._remove_file(rendition_relpath(source_relpath))
+        self._forget_failure(source_relpath)
+
+    def backfill(self, folders=VIDEO_SOURCE_FOLDERS, extensions=None):
+        """
+        Encola los videos existentes sin versión para el kiosco o con una más vieja que el original, salvo los
+        que ya fallaron sin cambiar desde entonces, y borra las versiones que ya no corresponden a ningún original.
+        """
+        if self.ffmpeg is None:
+            return
+        count = 0
+        for folder in folders:
+            source_dir = os.path.join(self.static_folder, folder)
+            if not os.path.isdir(source_dir):
+                continue
+            expected = set()
+            for filename in sorted(os.listdir(source_dir)):
+                source = os.path.join(source_dir, filename)
+                if not os.path.isfile(source):
+                    continue
+                if extensions and os.path.splitext(filename)[1].lower().lstrip(".") not in extensions:
+                    continue
+                relpath = f"{folder}/{filename}"
+                expected.add(os.path.basename(rendition_relpath(relpath)))
+                rendition = os.path.join(self.static_folder, rendition_relpath(relpath))
+                if os.path.exists(rendition) and os.path.getmtime(rendition) >= os.path.getmtime(source):
+                    continue
+                if self._failed_unchanged(relpath, source):
+                    continue
+                self.submit(relpath, block=True)
+                count += 1
+            self._prune(folder, expected)
+        if count:
+            print(f"TRANSCODE: {count} videos existentes encolados para conversión.")
+
+    def jobs(self):
+        with self._lock:
+            return [dict(job) for job in sorted(self._jobs.values(), key=lambda j: j["id"], reverse=True)]
+
+    def job(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _prune(self, folder, expected):
+        """Borra de renditions/<folder>/ lo que no es la versión de un original actual (p. ej. nombres viejos)."""
+        rendition_dir = os.path.join(self.static_folder, RENDITIONS_FOLDER, folder)
+        if not os.path.isdir(rendition_dir):
+            return
+        with self._lock:
+            running = {os.path.basename(job["rendition"]) for job in self._jobs.values() if job["finished_at"] is None}
+        for name in os.listdir(rendition_dir):
+            if name.endswith(".part") or name in expected or name in running:
+                continue
+            if not os.path.isfile(os.path.join(rendition_dir, name)):
+                continue
+            self._remove_file(f"{RENDITIONS_FOLDER}/{folder}/{name}")
+
+    def _failed_path(self):
+        return os.path.join(self.static_folder, RENDITIONS_FOLDER, FAILED_FILE)
+
+    def _load_failed(self):
+        try:
+            with open(self._failed_path()) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_failed(self):
+        """Con el lock tomado."""
+        path = self._failed_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            json.dump(self._failed, f)
+        os.replace(path + ".tmp", path)
+
+    def _failed_unchanged(self, relpath, source):
+        with self._lock:
+            failure = self._failed.get(relpath)
+        if failure is None:
+            return False
+        st = os.stat(source)
+        return (failure["mtime_ns"], failure["size"]) == (st.st_mtime_ns, st.st_size)
+
+    def _record_failure(self, job, source, error):
+        try:
+            st = os.stat(source)
+        except OSError:
+            return
+        with self._lock:
+            self._failed[job["source"]] = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "error": error}
+            self._save_failed()
+
+    def _forget_failure(self, relpath):
+        with self._lock:
+            if self._failed.pop(relpath, None) is not None:
+                self._save_failed()
+
+    def _remove_file(self, relpath):
+        try:
+            os.remove(os.path.join(self.static_folder, relpath))
+        except FileNotFoundError:
+            pass
+
+    def _finish(self, job, status, error=None):
+        with self._lock:
+            job.update(status=status, error=error, finished_at=time.time())
+            if self._queued.get(job["source"]) == job["id"]:
+                del self._queued[job["source"]]
+            finished = [j for j in self._jobs.values() if j["finished_at"] is not None]
+            for old in sorted(finished, key=lambda j: j["id"])[:-JOB_HISTORY]:
+                del self._jobs[old["id"]]
+
+    def _worker_loop(self):
+        while self._running:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    continue
+                # Desde aquí una nueva subida del mismo archivo crea otro trabajo en lugar de sumarse a este.
+                if self._queued.get(job["source"]) == job_id:
+                    del self._queued[job["source"]]
+                job.update(status="running", started_at=time.time())
+            try:
+                self._transcode(job)
+            except (OSError, subprocess.SubprocessError) as e:
+                self._finish(job, "failed", str(e))
+                print(f"TRANSCODE ERROR: {job['source']}: {e}")
+                continue
+            if job["status"] == "running":
+                self._finish(job, "done")
+                print(f"TRANSCODE: {job['rendition']} lista en {job['finished_at'] - job['started_at']:.1f}s.")
+
+    def _transcode(self, job):
+        source = os.path.join(self.static_folder, job["source"])
+        output = os.path.join(self.static_folder, job["rendition"])
+        partial = output + ".part"
+        if not os.path.isfile(source):
+            self._finish(job, "failed", "El archivo original ya no existe.")
+            return
+        if self.ffmpeg is None:
+            # Copiar el original solo duplicaría el espacio en la tarjeta: app.py ya lo entrega tal cual.
+            self._finish(job, "skipped", "ffmpeg no está instalado; se entrega el original.")
+            return
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        try:
+            command = ffmpeg_command(self.ffmpeg, source, partial)
+            if self.nice:
+                command = [self.nice, "-n", str(NICE)] + command
+            process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+            with self._lock:
+                self._processes[job["id"]] = process
+            try:
+                _, stderr = process.communicate()
+            finally:
+                with self._lock:
+                    self._processes.pop(job["id"], None)
+            if process.returncode != 0:
+                error = (stderr or "").strip()[-500:] or f"ffmpeg terminó con {process.returncode}"
+                self._finish(job, "failed", error)
+                # Un código negativo es una señal (p. ej. shutdown()): no dice nada del archivo.
+                if process.returncode > 0:
+                    self._record_failure(job, source, error)
+                return
+            # Si el original se borró o se reemplazó durante la conversión, el resultado ya no sirve.
+            if not os.path.isfile(source) or os.path.getmtime(source) > job["started_at"]:
+                self._finish(job, "failed", "El original cambió durante la conversión.")
+                return
+            os.replace(partial, output)
+            self._forget_failure(job["source"])
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
@@ -1,9 +1,16 @@
 import os
 import sys
 import json
+import threading
 from flask import Flask, request, render_template, redirect, url_for, flash, abort, jsonify, send_from_directory # MODIFICADO
 from werkzeug.utils import secure_filename
 import logging
+from media_catalog import MediaCatalog
+from media_server import MediaServer
+from chunked_upload import ChunkedUploads, UploadError, MAX_UPLOAD_BYTES
+from transcoder import TranscodePool, VIDEO_SOURCE_FOLDERS
+from audio_processing import AudioOptimizer
+import carousel_images
 
 # --- Configuración de Logging ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -22,6 +29,8 @@ CAROUSEL_FOLDER = os.path.join(STATIC_FOLDER, 'carousel_images')
 SPECIAL_FOLDER = os.path.join(STATIC_FOLDER, 'special') ### NUEVO ###
 CAMERA_VIDEO_FOLDER = os.path.join(STATIC_FOLDER, 'video_upload') ### NUEVO ###
 TEMPLATES_FOLDER = os.path.join(BASE_DIR, 'templates')
+# Archivos a medio subir; fuera de static/ pero en el mismo disco para que el os.replace final sea atómico.
+UPLOADS_WORK_FOLDER = os.path.join(BASE_DIR, '.uploads')
 
 ALLOWED_VIDEO_EXTENSIONS = {'mp4', 'webm', 'mov', 'avi'}
 ALLOWED_AUDIO_EXTENSIONS = {'mp3', 'wav'}
@@ -37,25 +46,97 @@ app.config['AUDIO_FOLDER'] = AUDIO_FOLDER
 app.config['CAROUSEL_FOLDER'] = CAROUSEL_FOLDER
 app.config['SPECIAL_FOLDER'] = SPECIAL_FOLDER ### NUEVO ###
 app.config['CAMERA_VIDEO_FOLDER'] = CAMERA_VIDEO_FOLDER ### NUEVO ###
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
 app.secret_key = 'super secret key'
 
+# Índice de static/ compartido con app.py; se actualiza de forma incremental al subir o borrar archivos.
+media_catalog = MediaCatalog(STATIC_FOLDER)
+# El kiosco carga las imágenes del carrusel desde este servidor: mismas reglas de caché que app.py.
+media_server = MediaServer(STATIC_FOLDER)
+app.view_functions['static'] = media_server.send
+chunked_uploads = ChunkedUploads(UPLOADS_WORK_FOLDER)
+# Cada video subido se convierte en segundo plano a la versión para el kiosco (static/renditions/).
+transcoder = TranscodePool(STATIC_FOLDER)
+
+
+def catalog_folder(folder_path):
+    """Convierte una ruta absoluta dentro de static/ en la clave del catálogo (p. ej. 'audio/happy')."""
+    return os.path.relpath(folder_path, STATIC_FOLDER).replace(os.sep, '/')
+
+
+def audio_optimized(folder_path, old_name, new_name):
+    """Un WAV optimizado se reemplaza por un MP3 con otro nombre: el catálogo tiene que reflejarlo."""
+    folder = catalog_folder(folder_path)
+    if old_name != new_name:
+        media_catalog.remove(folder, old_name)
+    media_catalog.add(folder, new_name)
+
+
+# Cada audio subido se recorta, normaliza y recodifica en segundo plano (ver audio_processing.py).
+audio_optimizer = AudioOptimizer(AUDIO_FOLDER, on_done=audio_optimized)
+
+
+def media_added(folder, filename):
+    """
+    Registra un archivo nuevo en el catálogo; si es un video encola su conversión para el kiosco y si es
+    un audio, su optimización.
+    """
+    media_catalog.add(folder, filename)
+    if folder in VIDEO_SOURCE_FOLDERS:
+        transcoder.submit(f"{folder}/{filename}")
+    elif folder.startswith('audio/'):
+        audio_optimizer.submit(os.path.join(STATIC_FOLDER, folder, filename))
+
+
+def media_removed(folder, filename):
+    media_catalog.remove(folder, filename)
+    if folder in VIDEO_SOURCE_FOLDERS:
+        transcoder.remove(f"{folder}/{filename}")
+
 
 def update_carousel_json():
-    """Escanea la carpeta del carrusel y guarda la lista de imágenes en un archivo JSON."""
+    """
+    Escanea la carpeta del carrusel, genera los derivados (WebP, JPEG y marcador de posición) de las imágenes
+    nuevas o modificadas y guarda la lista en un archivo JSON. 'images' conserva las URLs de los originales;
+    'items' describe cada imagen con sus derivados, dimensiones y hashes (lo usa app.py).
+    """
     try:
         carousel_folder_path = app.config['CAROUSEL_FOLDER']
-        files = sorted([
-            f for f in os.listdir(carousel_folder_path) 
-            if f.lower().endswith(('.png', '.jpg', '.jpeg', '.gif'))
-        ])
+        derived_dir = os.path.join(carousel_folder_path, carousel_images.DERIVED_FOLDER)
+        files = media_catalog.files('carousel_images', ('.png', '.jpg', '.jpeg', '.gif'))
         
         image_urls = [f"/static/carousel_images/{f}" for f in files]
         json_path = os.path.join(carousel_folder_path, 'carousel_data.json')
+
+        previous = {}
+        try:
+            with open(json_path) as f:
+                data = json.load(f)
+            # 'skipped' recuerda los originales que OpenCV no puede leer, para no reintentarlos en cada cambio.
+            previous = {item['name']: item for item in data.get('items', []) + data.get('skipped', [])}
+        except (OSError, ValueError):
+            pass
+
+        items = []
+        skipped = []
+        for filename in files:
+            source_path = os.path.join(carousel_folder_path, filename)
+            item = previous.get(filename)
+            if item is None or not carousel_images.is_current(item, source_path, derived_dir):
+                item = carousel_images.build_derivatives(source_path, derived_dir, '/static/carousel_images')
+                if item is None:
+                    continue
+                if 'skipped' in item:
+                    logging.warning(f"No se pudieron generar derivados de '{filename}' ({item['skipped']}); se usará el original.")
+            (skipped if 'skipped' in item else items).append(item)
+        carousel_images.prune_derivatives(derived_dir, {name for item in items for name in carousel_images.derived_files(item)})
+
+        tmp_path = json_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'images': image_urls, 'items': items, 'skipped': skipped}, f)
+        os.replace(tmp_path, json_path)
         
-        with open(json_path, 'w') as f:
-            json.dump({'images': image_urls}, f)
-        
-        logging.info(f"Archivo 'carousel_data.json' actualizado con {len(image_urls)} imágenes.")
+        logging.info(f"Archivo 'carousel_data.json' actualizado con {len(image_urls)} imágenes ({len(items)} con derivados).")
 
     except Exception as e:
         logging.error(f"Error CRÍTICO al actualizar 'carousel_data.json': {e}")
@@ -135,12 +216,14 @@ def upload_file():
 
             # Forzar el nombre del archivo y eliminar cualquier otro archivo en la carpeta
             filename = SPECIAL_EVENT_FILENAME
-            for f in os.listdir(upload_folder):
+            for f in media_catalog.files('special'):
                 os.remove(os.path.join(upload_folder, f))
+                media_removed('special', f)
             
             filepath = os.path.join(upload_folder, filename)
             try:
                 file.save(filepath)
+                media_added('special', filename)
                 return jsonify({'status': 'success', 'message': f'{file_type} actualizado correctamente.'}), 200
             except Exception as e:
                 return jsonify({'error': f'Error al guardar el archivo de evento: {e}'}), 500
@@ -153,6 +236,7 @@ def upload_file():
             filepath = os.path.join(upload_folder, filename)
             try:
                 file.save(filepath)
+                media_added(catalog_folder(upload_folder), filename)
                 
                 if update_json_flag:
                     update_carousel_json()
@@ -163,22 +247,20 @@ def upload_file():
         elif file:
             return jsonify({'error': f'Tipo de archivo no permitido. Permitidas: {", ".join(allowed_extensions)}'}), 400
 
-    video_files = sorted([f for f in os.listdir(app.config['VIDEO_FOLDER']) if os.path.isfile(os.path.join(app.config['VIDEO_FOLDER'], f))])
-    carousel_images = sorted([f for f in os.listdir(app.config['CAROUSEL_FOLDER']) if f.lower().endswith(('.png', '.jpg', '.jpeg', '.gif'))])
+    video_files = media_catalog.files('video')
+    carousel_images = media_catalog.files('carousel_images', ('.png', '.jpg', '.jpeg', '.gif'))
     
     ### NUEVO: Listar archivo de evento especial ###
     special_event_file = None
-    if os.path.exists(os.path.join(app.config['SPECIAL_FOLDER'], SPECIAL_EVENT_FILENAME)):
+    if media_catalog.exists('special', SPECIAL_EVENT_FILENAME):
         special_event_file = SPECIAL_EVENT_FILENAME
     
     ### NUEVO: Listar videos de cámara ###
-    camera_videos = sorted([f for f in os.listdir(app.config['CAMERA_VIDEO_FOLDER']) if f.lower().endswith('.mp4')])
+    camera_videos = media_catalog.files('video_upload', ('.mp4',))
 
     audio_files_by_emotion = {}
     for emotion in ALLOWED_EMOTION_FOLDERS:
-        emotion_folder_path = os.path.join(app.config['AUDIO_FOLDER'], emotion)
-        if os.path.isdir(emotion_folder_path):
-            audio_files_by_emotion[emotion] = sorted([f for f in os.listdir(emotion_folder_path) if os.path.isfile(os.path.join(emotion_folder_path, f))])
+        audio_files_by_emotion[emotion] = media_catalog.files(f'audio/{emotion}')
 
     ### MODIFICADO: Añade 'special_event_file' y 'camera_videos' al render_template ###
     return render_template('upload.html',
@@ -189,6 +271,93 @@ def upload_file():
                            camera_videos=camera_videos,
                            special_event_file=special_event_file)
 
+def upload_target(file_type, emotion=None):
+    """Carpeta destino, extensiones permitidas y etiqueta para cada tipo de archivo del formulario."""
+    if file_type == 'video':
+        return app.config['VIDEO_FOLDER'], ALLOWED_VIDEO_EXTENSIONS, "Video"
+    if file_type == 'audio':
+        if not emotion or emotion not in ALLOWED_EMOTION_FOLDERS:
+            raise UploadError(400, f'Emoción seleccionada inválida: "{emotion}".')
+        return os.path.join(app.config['AUDIO_FOLDER'], secure_filename(emotion)), ALLOWED_AUDIO_EXTENSIONS, "Audio"
+    if file_type == 'carousel_image':
+        return app.config['CAROUSEL_FOLDER'], ALLOWED_CAROUSEL_EXTENSIONS, "Imagen de Carrusel"
+    if file_type == 'camera_video':
+        return app.config['CAMERA_VIDEO_FOLDER'], ALLOWED_VIDEO_EXTENSIONS, "Video de Cámara"
+    if file_type == 'special_event':
+        return app.config['SPECIAL_FOLDER'], ALLOWED_VIDEO_EXTENSIONS, "Video de Evento Especial"
+    raise UploadError(400, 'Tipo de archivo no válido.')
+
+
+def finish_upload(file_type, folder, filename):
+    """Actualiza el catálogo (y el JSON del carrusel) cuando un archivo subido por trozos queda en su carpeta."""
+    if file_type == 'special_event':
+        for f in media_catalog.files('special'):
+            if f != filename:
+                os.remove(os.path.join(folder, f))
+                media_removed('special', f)
+    media_added(catalog_folder(folder), filename)
+    if file_type == 'carousel_image':
+        update_carousel_json()
+
+
+# --- Subidas por trozos (reanudables) ---
+# POST /uploads           {type, emotion?, filename, size, fingerprint?, sha256?} -> {upload_id, offset, chunk_size}
+# PUT  /uploads/<id>?offset=N   cuerpo = bytes del trozo -> {offset} o, al completarse, {complete, sha256}
+# GET  /uploads/<id>      -> {offset} para reanudar tras un corte
+# DELETE /uploads/<id>    cancela la subida
+
+@app.errorhandler(UploadError)
+def upload_error(e):
+    return jsonify(dict(e.extra, error=str(e))), e.status
+
+
+@app.route('/uploads', methods=['POST'])
+def create_upload():
+    data = request.get_json(silent=True) or {}
+    file_type = data.get('type')
+    folder, allowed_extensions, _ = upload_target(file_type, data.get('emotion'))
+    if file_type == 'special_event':
+        filename = SPECIAL_EVENT_FILENAME
+    else:
+        filename = secure_filename(data.get('filename') or '')
+        if not allowed_file(filename, allowed_extensions):
+            raise UploadError(400, f'Tipo de archivo no permitido. Permitidas: {", ".join(allowed_extensions)}')
+    try:
+        size = int(data.get('size'))
+    except (TypeError, ValueError):
+        raise UploadError(400, 'Falta el tamaño del archivo.')
+    upload = chunked_uploads.create(folder, filename, size, fingerprint=data.get('fingerprint'), sha256=data.get('sha256'),
+                                    meta={'type': file_type, 'emotion': data.get('emotion')})
+    return jsonify(upload), 200
+
+
+@app.route('/uploads/<upload_id>', methods=['GET'])
+def upload_status(upload_id):
+    return jsonify(chunked_uploads.status(upload_id))
+
+
+@app.route('/uploads/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    offset = request.args.get('offset', type=int)
+    if offset is None:
+        raise UploadError(400, 'Falta el parámetro offset.')
+    result = chunked_uploads.write_chunk(upload_id, offset, request.stream, request.content_length)
+    if not result['complete']:
+        return jsonify(result)
+    folder, filename = os.path.split(result.pop('path'))
+    file_type = result['meta']['type']
+    finish_upload(file_type, folder, filename)
+    _, _, label = upload_target(file_type, result['meta']['emotion'])
+    logging.info(f"{label} '{filename}' subido por trozos ({result['size']} bytes, sha256 {result['sha256'][:12]}).")
+    result['message'] = f'{label} "{filename}" subido correctamente a {catalog_folder(folder)}'
+    return jsonify(result)
+
+
+@app.route('/uploads/<upload_id>', methods=['DELETE'])
+def cancel_upload(upload_id):
+    chunked_uploads.abort(upload_id)
+    return jsonify({'status': 'ok'})
+
 @app.route('/delete/<type>/<subpath>/<path:filename>', methods=['POST'])
 def delete_file(type, subpath, filename):
     filename = secure_filename(filename)
@@ -219,6 +388,7 @@ def delete_file(type, subpath, filename):
 
     if os.path.isfile(filepath):
         os.remove(filepath)
+        media_removed(catalog_folder(base_folder), filename)
         flash(f'Archivo "{filename}" eliminado.', 'success')
         
         if update_json_flag:
@@ -253,8 +423,38 @@ def download_file(type, subpath, filename):
 
     return send_from_directory(directory, filename, as_attachment=True)
 
-if __name__ == '__main__':
+@app.route('/healthz')
+def healthz():
+    """Chequeo de disponibilidad para el supervisor (serve.py)."""
+    return jsonify({'status': 'ok'})
+
+@app.route('/transcode_jobs')
+def transcode_jobs():
+    """Estado de las conversiones: queued, running, done o failed (con el error de ffmpeg)."""
+    return jsonify({'ffmpeg': transcoder.ffmpeg is not None, 'jobs': transcoder.jobs()})
+
+@app.route('/transcode_jobs/<int:job_id>')
+def transcode_job(job_id):
+    job = transcoder.job(job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job)
+
+def start_background_tasks():
     update_carousel_json()
+    transcoder.start()
+    audio_optimizer.start()
+    # Los videos subidos antes de existir las conversiones (o mientras el servidor estaba caído) se encolan ahora.
+    threading.Thread(target=transcoder.backfill, kwargs={'extensions': ALLOWED_VIDEO_EXTENSIONS}, daemon=True).start()
+
+def shutdown():
+    transcoder.shutdown()
+
+if __name__ == '__main__':
+    start_background_tasks()
     print(f"Servidor de carga y gestión iniciado en http://0.0.0.0:{PORT}")
     print(f" - Sirviendo desde: {STATIC_FOLDER}")
-    app.run(host='0.0.0.0', port=PORT, debug=True, use_reloader=False)
\ No newline at end of file
+    try:
+        app.run(host='0.0.0.0', port=PORT, debug=True, use_reloader=False)
+    finally:
+        shutdown()